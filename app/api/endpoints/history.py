@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.cache import history_cache
+from app.services.history import HistoryQuery, check_query, encode_cursor, iter_history, read_page
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 10_000          # rows in one JSON page
+MAX_STREAM_SIZE = 1_000_000     # rows in one NDJSON or columnar response
+COLUMNAR_CHUNK_SIZE = 10_000    # rows per columnar chunk
+
+ORDER = Query("asc", pattern="^(asc|desc)$")
+FORMAT = Query("json", pattern="^(json|ndjson|columnar)$",
+               description="json: one page; ndjson: a row per line; columnar: a chunk of columns per line")
+LIMIT = Query(1000, ge=1, le=MAX_STREAM_SIZE)
+
+
+def stream_lines(request: HistoryQuery, limit: int, columnar: bool) -> Iterator[str]:
+    """
+    Rows as NDJSON, or as chunks of up to COLUMNAR_CHUNK_SIZE rows in
+    column form ({"columns": {"timestamp": [...], ...}, "rows": n}). The
+    last line is always {"next_cursor": ...}.
+    """
+    pairs = iter_history(request, limit)
+    chunk, last_key, next_cursor = [], None, None
+    try:
+        for count, (item, key) in enumerate(pairs):
+            if count == limit:
+                next_cursor = encode_cursor(last_key)
+                break
+            last_key = key
+            if not columnar:
+                yield json.dumps(item) + "\n"
+                continue
+            chunk.append(item)
+            if len(chunk) == COLUMNAR_CHUNK_SIZE:
+                yield _columns(chunk)
+                chunk = []
+    finally:
+        pairs.close()
+    if chunk:
+        yield _columns(chunk)
+    yield json.dumps({"next_cursor": next_cursor}) + "\n"
+
+
+def _columns(rows: list) -> str:
+    return json.dumps({"columns": {name: [row[name] for row in rows] for name in rows[0]}, "rows": len(rows)}) + "\n"
+
+
+def serve_history(request: HistoryQuery, limit: int, format: str):
+    try:
+        check_query(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format != "json":
+        return StreamingResponse(stream_lines(request, limit, format == "columnar"),
+                                 media_type="application/x-ndjson")
+    if limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit is at most {MAX_PAGE_SIZE} for JSON pages; "
+                                                    "use format=ndjson or format=columnar for more")
+    key = (request, limit)
+    page = history_cache.get(key)
+    if page is None:
+        page = read_page(request, limit)
+        # Only pages new rows can change are dropped on ingestion; complete pages just age out
+        mutable = request.mutable or page.next_cursor is None
+        history_cache.set(key, page, (request.source, request.symbol) if mutable else None)
+    return {"items": page.items, "next_cursor": page.next_cursor}
+
+
+@router.get("/prices", tags=["History"])
+def get_prices(symbol: Optional[str] = None, resolution: int = Query(0, ge=0),
+               start: Optional[datetime] = None, end: Optional[datetime] = None, cursor: Optional[str] = None,
+               order: str = ORDER, limit: int = LIMIT, format: str = FORMAT):
+    """
+    WAP history, oldest first (or newest first with `order=desc`). With
+    `resolution` (seconds) the rows are OHLC bars read from `price_bars`;
+    it must be a multiple of a stored bar length and needs a `symbol`.
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    """
+    request = HistoryQuery("prices", symbol.upper() if symbol else None, resolution, start, end, cursor,
+                           order == "desc")
+    return serve_history(request, limit, format)
+
+
+@router.get("/signals", tags=["History"])
+def get_signals(symbol: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                cursor: Optional[str] = None, order: str = ORDER, limit: int = LIMIT, format: str = FORMAT):
+    """Recorded trading signals, paginated like `/prices`."""
+    request = HistoryQuery("signals", symbol.upper() if symbol else None, 0, start, end, cursor, order == "desc")
+    return serve_history(request, limit, format)
@@ -1,40 +1,55 @@
 
 from fastapi import APIRouter
-import psutil
-import redis
 
 from app.core.redis_client import redis_client
+from app.core.system_stats import system_stats
 
 router = APIRouter()
 
+COUNTER_KEYS = ('message_count', 'latency_sum', 'error_count', 'data_loss_count')
+
 @router.get("/metrics", tags=["Metrics"])
-def get_metrics():
+def get_metrics(averages: bool = False):
     """
     Return a JSON with application performance metrics:
       - Average latency per operation
       - CPU and memory usage
+      - Process RSS, thread count and ingestion thread CPU
       - Error and data loss counts
+    System stats come from the background sampler, and the counters from a
+    single Redis MGET, so the request never waits on a measurement. With
+    `averages=true`, 1m/5m/15m means of the system stats are included.
     """
     try:
-        msg_count = float(redis_client.get('message_count') or 0)
-        latency_sum = float(redis_client.get('latency_sum') or 0)
+        values = redis_client.mget(COUNTER_KEYS)
+        msg_count, latency_sum, error_count, data_loss_count = (float(value or 0) for value in values)
         avg_latency = latency_sum / msg_count if msg_count > 0 else 0.0
-        error_count = int(redis_client.get('error_count') or 0)
-        data_loss_count = int(redis_client.get('data_loss_count') or 0)
+        error_count, data_loss_count = int(error_count), int(data_loss_count)
     except Exception:
         avg_latency = -1
         error_count = -1
         data_loss_count = -1
+        msg_count = -1
 
-    cpu_usage = psutil.cpu_percent(interval=1)
-    mem = psutil.virtual_memory()
-    memory_usage = mem.percent
+    stats = system_stats.latest() or system_stats.sample()
 
-    return {
+    response = {
         "average_latency": avg_latency,
-        "cpu_usage_percent": cpu_usage,
-        "memory_usage_percent": memory_usage,
+        "cpu_usage_percent": stats.cpu_percent,
+        "memory_usage_percent": stats.memory_percent,
         "error_count": error_count,
         "data_loss_count": data_loss_count,
-        "message_count": msg_count
+        "message_count": msg_count,
+        "process": {
+            "rss_bytes": stats.rss_bytes,
+            "threads": stats.threads,
+        },
+        "sampled_at": stats.time,
     }
+    if stats.ingestion_threads is not None:
+        # Not tracked with INGESTION_MODE=process: ingestion runs in the worker processes
+        response["process"].update(ingestion_threads=stats.ingestion_threads,
+                                   ingestion_cpu_percent=stats.ingestion_cpu_percent)
+    if averages:
+        response["averages"] = system_stats.averages()
+    return response
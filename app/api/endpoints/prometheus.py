@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Response
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
-from app.core.metrics import registry
+from app.core.metrics import metrics_view
 
 router = APIRouter()
 
@@ -10,7 +10,8 @@ router = APIRouter()
 def prometheus_metrics():
     """
     Expose Prometheus-formatted metrics.
-    This endpoint can be scraped by Prometheus.
+    This endpoint can be scraped by Prometheus. In process mode it also
+    includes the metrics reported by every ingestion worker.
     """
-    metrics_data = generate_latest(registry)
+    metrics_data = generate_latest(metrics_view)
     return Response(content=metrics_data, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.live_feed import TOPICS, Subscription, live_feed
+
+router = APIRouter()
+
+SSE_HEARTBEAT = 15.0   # seconds between keep-alive comments on an idle SSE stream
+
+
+def parse_filters(topics: str, symbols: str) -> (List[str], Optional[List[str]]):
+    topic_list = [topic.strip() for topic in topics.split(",") if topic.strip()]
+    unknown = set(topic_list) - set(TOPICS)
+    if unknown or not topic_list:
+        raise ValueError(f"topics must be a comma-separated subset of {', '.join(TOPICS)}")
+    symbol_list = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    return topic_list, symbol_list or None
+
+
+async def sse_events(subscription: Subscription, heartbeat: float = SSE_HEARTBEAT) -> AsyncIterator[str]:
+    """Server-Sent Events framing of a subscription, with keep-alive comments while idle."""
+    try:
+        yield "retry: 1000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                if subscription.evicted:
+                    yield "event: evicted\ndata: {}\n\n"
+                return
+            yield f"event: {event[0]}\ndata: {event[1]}\n\n"
+    finally:
+        subscription.close()
+
+
+@router.websocket("/stream/ws")
+async def stream_websocket(websocket: WebSocket, topics: str = ",".join(TOPICS), symbols: str = ""):
+    """
+    Live WAP ticks (with the signal's SMA pair) and trading signals as JSON
+    text messages. Filter with `topics=tick,signal` and `symbols=BTCUSDT,...`.
+    A client that falls too far behind is disconnected with code 1013.
+    """
+    try:
+        topic_list, symbol_list = parse_filters(topics, symbols)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    subscription = live_feed.subscribe(topic_list, symbol_list)
+    await websocket.accept()
+
+    async def watch_disconnect():
+        # Ends the subscription as soon as the client goes away, even while no events arrive
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            subscription.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            event = await subscription.get()
+            if event is None:
+                if subscription.evicted:
+                    await websocket.close(code=1013, reason="Subscriber fell behind the live stream")
+                return
+            await websocket.send_text(event[1])
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        subscription.close()
+
+
+@router.get("/stream/sse", tags=["Stream"])
+async def stream_sse(topics: str = ",".join(TOPICS), symbols: str = ""):
+    """
+    The live stream as Server-Sent Events: `event: tick` or `event: signal`
+    with the JSON in `data`. An `evicted` event ends the stream of a client
+    that fell too far behind.
+    """
+    try:
+        topic_list, symbol_list = parse_filters(topics, symbols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = live_feed.subscribe(topic_list, symbol_list)
+    return StreamingResponse(sse_events(subscription), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
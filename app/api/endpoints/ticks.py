@@ -0,0 +1,30 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.config import TICK_STORE_PATH
+from app.services.tick_store import TickStore
+
+router = APIRouter()
+
+# The symbol names a directory under TICK_STORE_PATH, so nothing else may reach os.path.join
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9]+$")
+
+@router.get("/ticks/{symbol}", tags=["Ticks"])
+def get_ticks(symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              limit: int = Query(10000, ge=1, le=1_000_000)):
+    """
+    Raw WAP ticks of a symbol from the tick store, as columns:
+      - timestamp: microseconds since the epoch (UTC)
+      - wap: weighted average price
+    `start` is inclusive and `end` exclusive; at most `limit` ticks are returned.
+    """
+    if not TICK_STORE_PATH:
+        raise HTTPException(status_code=404, detail="The tick store is not enabled (set TICK_STORE_PATH).")
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol {symbol!r}: letters and digits only.")
+    ticks = TickStore(TICK_STORE_PATH).read(symbol, start, end, limit)
+    return {"symbol": symbol, "timestamp": ticks["timestamp"].tolist(), "wap": ticks["wap"].tolist()}
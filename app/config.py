@@ -5,3 +5,81 @@ import os
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
+
+# "thread" runs websocket-client in a background thread; "async" runs the
+# ingestion loop inside the uvicorn event loop with async Redis and DB clients;
+# "process" shards symbols across INGESTION_WORKERS worker processes.
+INGESTION_MODE = os.getenv("INGESTION_MODE", "thread")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", os.cpu_count() or 1))
+
+
+def _async_database_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+# Connection pools: DB_POOL_SIZE connections are kept open per engine, plus up
+# to DB_MAX_OVERFLOW on demand. A checkout gives up after DB_POOL_TIMEOUT
+# seconds and a new connection after DB_CONNECT_TIMEOUT, so a saturated or
+# unreachable database fails fast (and ingestion spools) instead of stalling.
+# API reads use a separate read-only engine on DATABASE_READ_URL, e.g. a
+# replica, which defaults to DATABASE_URL with its own DB_READ_POOL_SIZE pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5.0))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 1000))
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", 5))
+
+# Hot-path counters are aggregated in-process and pushed to Redis in one
+# pipeline every METRICS_FLUSH_INTERVAL seconds or METRICS_FLUSH_EVERY increments.
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))
+METRICS_FLUSH_EVERY = int(os.getenv("METRICS_FLUSH_EVERY", 1000))
+
+# Host/process stats for /metrics are sampled in the background at this period
+SYSTEM_STATS_INTERVAL = float(os.getenv("SYSTEM_STATS_INTERVAL", 1.0))
+
+# Live tick/signal stream: events buffered per subscriber before it is
+# disconnected, and the Redis pub/sub channel that shares events between
+# processes and instances ("" keeps them in-process)
+LIVE_FEED_BUFFER_SIZE = int(os.getenv("LIVE_FEED_BUFFER_SIZE", 256))
+LIVE_FEED_REDIS_CHANNEL = os.getenv("LIVE_FEED_REDIS_CHANNEL", "")
+
+# /prices and /signals pages kept in memory; pages that new rows could change
+# are also dropped when this process ingests such rows, at most once per TTL.
+# Ingestion workers (INGESTION_MODE=process) cannot reach the API's cache, so
+# there its pages only expire after HISTORY_CACHE_TTL
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", 1024))
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", 5.0))
+
+# When set, raw depth messages and snapshots are recorded here for offline replay
+RECORD_PATH = os.getenv("RECORD_PATH", "")
+
+# Periodic snapshot of per-symbol price history, preferred over the prices
+# table when the ingestion state is rehydrated on startup
+STATE_SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH", "")
+
+# Directory of the append-only binary tick store (app.services.tick_store),
+# written by ingestion next to the prices table and read by /ticks and backtests
+TICK_STORE_PATH = os.getenv("TICK_STORE_PATH", "")
+
+# Directory of the write-ahead spool ({symbols} is substituted): ticks, bars
+# and signals the database cannot take are appended there and replayed in
+# order once it recovers, instead of being retried on the ingestion path
+SPOOL_PATH = os.getenv("SPOOL_PATH", "")
+
+# Price tick retention: daily partitions on PostgreSQL, created this many days
+# ahead; days older than PRICE_RETENTION_DAYS (0 keeps everything) are
+# archived to PRICE_ARCHIVE_DIR, if set, and removed. The job runs every
+# PRICE_MAINTENANCE_INTERVAL seconds in the API process (0 leaves it to cron).
+PRICE_RETENTION_DAYS = int(os.getenv("PRICE_RETENTION_DAYS", 30))
+PRICE_ARCHIVE_DIR = os.getenv("PRICE_ARCHIVE_DIR", "")
+PRICE_PARTITION_DAYS_AHEAD = int(os.getenv("PRICE_PARTITION_DAYS_AHEAD", 7))
+PRICE_MAINTENANCE_INTERVAL = float(os.getenv("PRICE_MAINTENANCE_INTERVAL", 6 * 3600))
@@ -0,0 +1,9 @@
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.config import ASYNC_DATABASE_URL
+from app.core.db import engine_options, instrument_pool
+
+# Only imported in async ingestion mode, so the async drivers stay optional otherwise
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, "async", is_async=True))
+instrument_pool(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
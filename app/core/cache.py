@@ -0,0 +1,84 @@
+
+
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.config import HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL
+
+_MISSING = object()
+
+Tag = Tuple[str, Optional[str]]  # (table, symbol); a None symbol covers queries across symbols
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries can carry a tag. `invalidate` drops every entry with a given tag,
+    so the ingestion pipeline can drop the cached pages a write just made
+    stale without touching the rest. Untagged entries only age out. A tag is
+    dropped at most once per `ttl`: a rare write (a signal) shows up at once,
+    while ticks flushed every half second do not empty the cache on every
+    flush; their pages are never more than `ttl` seconds stale either way.
+
+    The cache is per process. With INGESTION_MODE=process the writes happen
+    in worker processes, whose invalidations cannot reach the API's cache,
+    so there the API's pages only age out after `ttl`.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Optional[Tag], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidated: Dict[Tag, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < monotonic():
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value, tag: Optional[Tag] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, tag, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table: str, symbols: Iterable[Optional[str]]) -> None:
+        """
+        Drop the entries tagged with `table` and any of `symbols`, and those
+        across all symbols, skipping tags already dropped in the last `ttl`.
+        """
+        tags = {(table, None)} | {(table, symbol) for symbol in symbols}
+        with self._lock:
+            if not self._entries:
+                return
+            now = monotonic()
+            tags = {tag for tag in tags if self._invalidated.get(tag, now - self.ttl) <= now - self.ttl}
+            if not tags:
+                return
+            for tag in tags:
+                self._invalidated[tag] = now
+            for key in [key for key, entry in self._entries.items() if entry[1] in tags]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+
+
+history_cache = TTLCache(HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL)
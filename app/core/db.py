@@ -1,9 +1,145 @@
 
-from sqlalchemy import create_engine
+
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import (
+    DATABASE_URL, DATABASE_READ_URL, DB_CONNECT_TIMEOUT, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE,
+    DB_POOL_TIMEOUT, DB_READ_POOL_SIZE, DB_STATEMENT_CACHE_SIZE
+)
+from app.core.metrics import (
+    prom_db_pool_checked_out, prom_db_pool_checkout, prom_db_pool_timeout_count, prom_db_pool_wait
+)
+
+
+class _TimedCheckout:
+    """Records how long each checkout waited for a connection; the pool's logging name labels the metrics."""
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            prom_db_pool_timeout_count.labels(self.logging_name).inc()
+            raise
+        finally:
+            prom_db_pool_wait.labels(self.logging_name).observe(perf_counter() - start)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, name: str, pool_size: int = DB_POOL_SIZE, read_only: bool = False,
+                   is_async: bool = False) -> dict:
+    """
+    Keyword arguments for create_engine/create_async_engine: an explicit,
+    instrumented pool with pre-ping and recycling, bounded checkout and
+    connect waits, and a larger compiled statement cache (plus asyncpg's
+    prepared statement cache). SQLite keeps its default pool.
+    """
+    url = make_url(url)
+    options = {"query_cache_size": DB_STATEMENT_CACHE_SIZE, "pool_pre_ping": True, "pool_logging_name": name}
+    if url.get_backend_name() == "sqlite":
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    driver = url.get_driver_name()
+    if driver == "asyncpg":
+        options["connect_args"] = {"timeout": DB_CONNECT_TIMEOUT,
+                                   "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    elif driver in ("psycopg2", "psycopg"):
+        options["connect_args"] = {"connect_timeout": DB_CONNECT_TIMEOUT}
+        if read_only:
+            options["connect_args"]["options"] = "-c default_transaction_read_only=on"
+    return options
+
 
-engine = create_engine(DATABASE_URL)
+def instrument_pool(engine, name: str) -> None:
+    """Track how many connections are checked out of the engine's pool and for how long."""
+    checked_out: Dict[object, float] = {}
+    gauge, held = prom_db_pool_checked_out.labels(name), prom_db_pool_checkout.labels(name)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out[connection_record] = perf_counter()
+        gauge.set(len(checked_out))
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        start = checked_out.pop(connection_record, None)
+        if start is not None:
+            held.observe(perf_counter() - start)
+            gauge.set(len(checked_out))
+
+
+def create_pooled_engine(url: str, name: str, pool_size: int = DB_POOL_SIZE, read_only: bool = False):
+    engine = create_engine(url, **engine_options(url, name, pool_size, read_only))
+    instrument_pool(engine, name)
+    return engine
+
+
+class UnitOfWork:
+    """
+    One Session per thread, reused for every message instead of built per
+    call. Entering it starts a unit of work; a nested entry on the same
+    thread joins it rather than checking out a second connection, and only
+    the outermost one commits (or rolls back) and hands the connection back
+    to the pool. A failure inside a nested block must propagate to the
+    outermost one, which rolls the whole unit back.
+    """
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._local = threading.local()
+
+    @contextmanager
+    def __call__(self):
+        local = self._local
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = self.session_factory()
+            local.depth = 0
+        if local.depth:
+            local.depth += 1
+            try:
+                yield session
+            finally:
+                local.depth -= 1
+            return
+        local.depth = 1
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            local.depth = 0
+            # Releases the connection and empties the identity map; the Session stays reusable
+            session.close()
+
+
+engine = create_pooled_engine(DATABASE_URL, "write")
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+unit_of_work = UnitOfWork(SessionLocal)
+
+# API reads: a replica when DATABASE_READ_URL is set, never the ingestion pool
+read_engine = create_pooled_engine(DATABASE_READ_URL or DATABASE_URL, "read", DB_READ_POOL_SIZE, read_only=True)
+
 Base = declarative_base()
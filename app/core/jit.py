@@ -0,0 +1,18 @@
+
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """
+        Stand-in for `numba.njit` when Numba is not installed: kernels are
+        returned unchanged and run as plain Python. Signatures and options
+        are ignored, so both `@njit` and `@njit(sig, cache=True)` work.
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
@@ -0,0 +1,239 @@
+
+
+import json
+import queue
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from app.config import LIVE_FEED_BUFFER_SIZE, LIVE_FEED_REDIS_CHANNEL
+from app.core.metrics import prom_live_bridge_dropped_count, prom_live_evicted_count, prom_live_subscribers
+from app.core.redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("tick", "signal")
+
+Event = Tuple[str, str]  # (topic, JSON text)
+
+
+class Subscription:
+    """
+    One subscriber's bounded buffer of events, consumed on the event loop.
+    `get` returns None once the subscription has ended, either because the
+    subscriber fell `maxsize` events behind and was evicted, or because it
+    was closed.
+    """
+    def __init__(self, feed: "LiveFeed", topics: Iterable[str], symbols: Optional[Iterable[str]], maxsize: int):
+        self.topics = frozenset(topics)
+        self.symbols = frozenset(symbol.upper() for symbol in symbols) if symbols else None
+        self.evicted = False
+        self.closed = False
+        self._feed = feed
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize + 1)   # one slot kept for the end marker
+        self._maxsize = maxsize
+
+    def wants(self, topic: str, symbol: str) -> bool:
+        return topic in self.topics and (self.symbols is None or symbol in self.symbols)
+
+    async def get(self) -> Optional[Event]:
+        return None if self.closed and self._queue.empty() else await self._queue.get()
+
+    def offer(self, event: Event) -> bool:
+        """Queue an event without waiting; False if the buffer is full."""
+        if self._queue.qsize() >= self._maxsize:
+            return False
+        self._queue.put_nowait(event)
+        return True
+
+    def close(self) -> None:
+        self._feed.unsubscribe(self)
+
+    def _end(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.evicted:
+            # Nothing queued is worth delivering after a gap
+            while not self._queue.empty():
+                self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+
+class LiveFeed:
+    """
+    In-process pub/sub that fans computed ticks and signals out to API clients.
+
+    Publishers (the ingestion thread, or the async ingestion task) only append
+    to a pending deque and, at most once per batch, schedule a drain on the
+    subscribers' event loop, so publishing costs microseconds and never
+    blocks. With no subscribers and no bridge it returns at once. The drain
+    serialises each event to JSON once and offers it to every matching
+    subscriber. A subscriber whose buffer is full is evicted rather than
+    slowing down the others or the publisher.
+
+    With `redis_channel` set, every event is also published to Redis from a
+    background thread, and events published by other processes (such as
+    `INGESTION_MODE=process` workers or other API instances) are fed to the
+    local subscribers.
+    """
+    def __init__(self, buffer_size: int = 256, redis_channel: str = "", client=None, async_client=None):
+        self.buffer_size = buffer_size
+        self.redis_channel = redis_channel
+        self.client = client
+        self.async_client = async_client
+        self.origin = uuid4().hex
+        self._subscribers: List[Subscription] = []   # replaced, never mutated, so drains can iterate freely
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: deque = deque(maxlen=100_000)
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._outbound: "queue.Queue" = queue.Queue(maxsize=100_000)
+        self._forwarder: Optional[threading.Thread] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers) or bool(self.redis_channel)
+
+    def subscribe(self, topics: Iterable[str] = TOPICS, symbols: Optional[Iterable[str]] = None) -> Subscription:
+        """Register a subscriber; must be called on the event loop that will consume it."""
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, topics, symbols, self.buffer_size)
+        with self._lock:
+            if self._loop is not loop:
+                if self._subscribers:
+                    raise RuntimeError("All live feed subscribers must share one event loop")
+                self._loop = loop
+                self._listener = None
+            self._subscribers = self._subscribers + [subscription]
+            prom_live_subscribers.set(len(self._subscribers))
+        if self.redis_channel and self._listener is None:
+            self._listener = loop.create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers = [other for other in self._subscribers if other is not subscription]
+                prom_live_subscribers.set(len(self._subscribers))
+        subscription._end()
+
+    def publish(self, topic: str, symbol: str, data: dict) -> None:
+        if self._subscribers:
+            self._pending.append((topic, symbol, data))
+            # The drain clears the flag before emptying the deque, so no event is left behind
+            if not self._scheduled:
+                self._scheduled = True
+                try:
+                    self._loop.call_soon_threadsafe(self._drain)
+                except RuntimeError:
+                    self._scheduled = False   # the loop has shut down
+        if self.redis_channel:
+            self._forward(topic, symbol, data)
+
+    def publish_tick(self, symbol: str, wap_price: float, sma_short, sma_long) -> None:
+        """Publish a tick's WAP with the current value of the signal's fast/slow feature pair."""
+        if not self.active:
+            return
+        self.publish("tick", symbol, {
+            "type": "tick",
+            "symbol": symbol,
+            "wap": wap_price,
+            "sma_short": float(sma_short[-1]),
+            "sma_long": float(sma_long[-1]),
+            "timestamp": datetime.utcnow().isoformat(),
+        })
+
+    def publish_signal(self, signal_data: dict) -> None:
+        if not self.active:
+            return
+        self.publish("signal", signal_data["symbol"], {"type": "signal", **signal_data})
+
+    def close(self) -> None:
+        if self._forwarder is not None:
+            self._outbound.put(None)
+            self._forwarder.join(5.0)
+            self._forwarder = None
+        if self._listener is not None and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._listener.cancel)
+            self._listener = None
+
+    def _drain(self) -> None:
+        self._scheduled = False
+        while self._pending:
+            topic, symbol, data = self._pending.popleft()
+            self._dispatch(topic, symbol, json.dumps(data))
+
+    def _dispatch(self, topic: str, symbol: str, text: str) -> None:
+        event = (topic, text)
+        for subscription in self._subscribers:
+            if subscription.wants(topic, symbol) and not subscription.offer(event):
+                subscription.evicted = True
+                self.unsubscribe(subscription)
+                prom_live_evicted_count.inc()
+
+    # Redis bridge
+
+    def _forward(self, topic: str, symbol: str, data: dict) -> None:
+        if self._forwarder is None:
+            with self._lock:
+                if self._forwarder is None:
+                    self._forwarder = threading.Thread(target=self._run_forwarder, name="live-feed-bridge",
+                                                       daemon=True)
+                    self._forwarder.start()
+        try:
+            self._outbound.put_nowait((topic, symbol, data))
+        except queue.Full:
+            prom_live_bridge_dropped_count.inc()
+
+    def _run_forwarder(self) -> None:
+        client = self.client or redis_client
+        redis_down = False
+        while True:
+            batch = [self._outbound.get()]
+            while len(batch) < 1000 and not self._outbound.empty():
+                batch.append(self._outbound.get_nowait())
+            stop = None in batch
+            batch = [item for item in batch if item is not None]
+            try:
+                pipe = client.pipeline(transaction=False)
+                for topic, symbol, data in batch:
+                    pipe.publish(self.redis_channel, f"{self.origin} {topic} {symbol} {json.dumps(data)}")
+                pipe.execute()
+                redis_down = False
+            except Exception as e:
+                prom_live_bridge_dropped_count.inc(len(batch))
+                if not redis_down:
+                    logger.warning("Live feed could not publish to Redis, dropping events: %s", e)
+                    redis_down = True
+            if stop:
+                return
+
+    async def _listen(self) -> None:
+        client = self.async_client or async_redis_client
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.redis_channel)
+                try:
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        origin, topic, symbol, text = message["data"].split(" ", 3)
+                        if origin != self.origin:
+                            self._dispatch(topic, symbol, text)
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Live feed Redis subscription failed, retrying: %s", e)
+                await asyncio.sleep(1.0)
+
+
+live_feed = LiveFeed(LIVE_FEED_BUFFER_SIZE, LIVE_FEED_REDIS_CHANNEL)
@@ -1,5 +1,7 @@
 
-from prometheus_client import CollectorRegistry, Counter, Histogram
+from threading import Lock
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.metrics_core import Metric
 
 registry = CollectorRegistry()
 
@@ -18,3 +20,180 @@ prom_error_count = Counter(
     "Number of errors encountered", 
     registry=registry
 )
+prom_book_resync_count = Counter(
+    "ws_book_resync_count",
+    "Number of order book resyncs caused by depth stream gaps",
+    registry=registry
+)
+prom_tick_queue_depth = Gauge(
+    "tick_writer_queue_depth",
+    "Price ticks waiting to be persisted",
+    registry=registry
+)
+prom_tick_dropped_count = Counter(
+    "tick_writer_dropped_count",
+    "Price ticks dropped because the write queue was full or a flush failed",
+    registry=registry
+)
+prom_tick_batch_size = Histogram(
+    "tick_writer_batch_size",
+    "Number of price ticks written per flush",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+    registry=registry
+)
+prom_tick_flush_latency = Histogram(
+    "tick_writer_flush_latency_seconds",
+    "Time taken to bulk insert one batch of price ticks",
+    registry=registry
+)
+
+prom_receive_queue_depth = Gauge(
+    "ws_receive_queue_depth",
+    "Websocket messages received but not yet processed",
+    registry=registry
+)
+prom_receive_queue_wait = Histogram(
+    "ws_receive_queue_wait_seconds",
+    "Time a websocket message waited in the receive queue",
+    registry=registry
+)
+prom_receive_dropped_count = Counter(
+    "ws_receive_dropped_count",
+    "Websocket messages dropped because the receive queue was full",
+    registry=registry
+)
+prom_receive_coalesced_count = Counter(
+    "ws_receive_coalesced_count",
+    "Depth events merged into a pending event because the receive queue was full",
+    registry=registry
+)
+prom_stage_latency = Histogram(
+    "ws_stage_latency_seconds",
+    "Time spent in each stage of the message pipeline",
+    ["stage", "symbol"],
+    buckets=(1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0),
+    registry=registry
+)
+prom_startup_import_seconds = Gauge(
+    "startup_import_seconds",
+    "Time from process start until kernel warmup began (interpreter start-up and imports)",
+    registry=registry
+)
+prom_kernel_warmup_seconds = Gauge(
+    "startup_kernel_warmup_seconds",
+    "Time taken to warm up each group of Numba kernels (compile or load from cache)",
+    ["kernel"],
+    registry=registry
+)
+prom_kernel_signatures = Gauge(
+    "startup_kernel_signatures",
+    "Numba kernel signatures loaded from the on-disk cache or compiled in this process",
+    ["source"],
+    registry=registry
+)
+
+prom_live_subscribers = Gauge(
+    "live_feed_subscribers",
+    "Clients subscribed to the live tick and signal stream",
+    registry=registry
+)
+prom_live_evicted_count = Counter(
+    "live_feed_evicted_count",
+    "Live stream subscribers disconnected because their buffer overflowed",
+    registry=registry
+)
+prom_live_bridge_dropped_count = Counter(
+    "live_feed_bridge_dropped_count",
+    "Live stream events that could not be published to the Redis bridge",
+    registry=registry
+)
+
+prom_spool_size_bytes = Gauge(
+    "db_spool_size_bytes",
+    "Bytes of spooled database writes on disk, replayed or not",
+    registry=registry
+)
+prom_spool_lag_seconds = Gauge(
+    "db_spool_lag_seconds",
+    "Age of the oldest spooled database write not yet replayed",
+    registry=registry
+)
+prom_spool_written_count = Counter(
+    "db_spool_written_count",
+    "Records written to the spool instead of the database",
+    ["kind"],
+    registry=registry
+)
+prom_spool_replayed_count = Counter(
+    "db_spool_replayed_count",
+    "Spooled records replayed into the database",
+    ["kind"],
+    registry=registry
+)
+
+prom_db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time a checkout waited for a pooled connection, including opening a new one",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+    registry=registry
+)
+prom_db_pool_checkout = Histogram(
+    "db_pool_checkout_seconds",
+    "Time a connection was held before being returned to its pool",
+    ["pool"],
+    registry=registry
+)
+prom_db_pool_checked_out = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of each pool",
+    ["pool"],
+    registry=registry
+)
+prom_db_pool_timeout_count = Counter(
+    "db_pool_timeout_count",
+    "Checkouts that gave up waiting for a free connection",
+    ["pool"],
+    registry=registry
+)
+
+
+class ShardedMetricsView:
+    """
+    Exposition view over this process's registry plus snapshots reported by
+    ingestion worker processes. Without workers it is identical to `registry`;
+    with workers every sample gains a `worker` label ("main" for this process)
+    so families with the same name are merged instead of duplicated.
+    """
+    def __init__(self, local_registry: CollectorRegistry):
+        self._registry = local_registry
+        self._snapshots = {}
+        self._lock = Lock()
+
+    def update_worker(self, worker_id: str, families: list) -> None:
+        with self._lock:
+            self._snapshots[worker_id] = families
+
+    def remove_worker(self, worker_id: str) -> None:
+        with self._lock:
+            self._snapshots.pop(worker_id, None)
+
+    def collect(self):
+        with self._lock:
+            snapshots = list(self._snapshots.items())
+        if not snapshots:
+            yield from self._registry.collect()
+            return
+
+        merged = {}
+        for worker_id, families in [("main", list(self._registry.collect()))] + snapshots:
+            for family in families:
+                target = merged.get(family.name)
+                if target is None:
+                    target = merged[family.name] = Metric(family.name, family.documentation, family.type, family.unit)
+                for sample in family.samples:
+                    target.samples.append(sample._replace(labels={**sample.labels, "worker": worker_id}))
+        yield from merged.values()
+
+
+metrics_view = ShardedMetricsView(registry)
@@ -0,0 +1,140 @@
+
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+
+from app.config import METRICS_FLUSH_INTERVAL, METRICS_FLUSH_EVERY
+from app.core.redis_client import metrics_redis_client
+
+logger = logging.getLogger(__name__)
+
+Number = Union[int, float]
+
+
+def _queue_increments(pipe, counts: Dict[str, Number]) -> None:
+    for key, amount in counts.items():
+        if isinstance(amount, float):
+            pipe.incrbyfloat(key, amount)
+        else:
+            pipe.incrby(key, amount)
+
+
+class MetricsAggregator:
+    """
+    Accumulates Redis counters in-process and flushes them in one MULTI/EXEC.
+
+    `incr`/`incrbyfloat` only touch a local dict under a lock, so the ingestion
+    hot path never waits on Redis. A background thread flushes every
+    `flush_interval` seconds, or sooner once `flush_every` increments are
+    pending, and no latency leaks into the caller.
+
+    Each flush first PINGs Redis. If Redis cannot be reached, nothing was
+    sent, so the counts are folded back and retried on the next flush. A
+    failure after the MULTI/EXEC went out (e.g. a timeout reading its reply)
+    is ambiguous, because Redis may already have applied it. Those counts are
+    dropped and logged rather than re-sent, so the counters are at most once:
+    an outage can under-count them but never double-count. The client must
+    not retry commands on its own for the same reason.
+    """
+    def __init__(self, client=None, flush_interval: float = 1.0, flush_every: int = 1000):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._counts: Dict[str, Number] = {}
+        self._events = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._redis_down = False
+
+    def incr(self, key: str, amount: int = 1) -> None:
+        self._add(key, amount)
+
+    def incrbyfloat(self, key: str, amount: float) -> None:
+        self._add(key, float(amount))
+
+    def _add(self, key: str, amount: Number) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+            self._events += 1
+            if self._events >= self.flush_every:
+                self._wake.set()
+
+    def pending(self) -> Dict[str, Number]:
+        with self._lock:
+            return dict(self._counts)
+
+    def start(self) -> None:
+        """Start the background flusher (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and push whatever is still pending."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    @contextmanager
+    def detached(self):
+        """Discard counts instead of publishing them, e.g. while replaying a recording."""
+        client, self.client = self.client, None
+        try:
+            yield self
+        finally:
+            self._take()
+            self.client = client
+
+    def flush(self) -> bool:
+        counts = self._take()
+        if not counts or self.client is None:
+            return True
+        try:
+            self.client.ping()
+        except Exception as e:
+            self._restore(counts, e)
+            return False
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            _queue_increments(pipe, counts)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Metrics flush failed after it was sent; dropping %s, which Redis may already "
+                           "have applied: %s", counts, e)
+            return False
+        self._redis_down = False
+        return True
+
+    def _take(self) -> Dict[str, Number]:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._events = 0
+        return counts
+
+    def _restore(self, counts: Dict[str, Number], error: Exception) -> None:
+        with self._lock:
+            for key, amount in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + amount
+        if not self._redis_down:
+            # Log once per outage rather than on every flush attempt
+            logger.warning("Failed to flush metrics to Redis, keeping them locally: %s", error)
+            self._redis_down = True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+metrics_aggregator = MetricsAggregator(metrics_redis_client, METRICS_FLUSH_INTERVAL, METRICS_FLUSH_EVERY)
@@ -1,10 +1,25 @@
 
+import logging
 import redis
+import redis.asyncio
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 from app.config import REDIS_HOST, REDIS_PORT
 
 redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+# For code running on the asyncio event loop; connects lazily on first command
+async_redis_client = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+# For counter flushes, which must not be re-sent: a MULTI/EXEC whose reply was lost may already have been applied
+metrics_redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True,
+                                   retry=Retry(NoBackoff(), 0))
+
+logger = logging.getLogger(__name__)
 
 # Initialize counters if they are not already set
-for key in ['message_count', 'latency_sum', 'error_count', 'data_loss_count']:
-    if redis_client.get(key) is None:
-        redis_client.set(key, 0)
+try:
+    for key in ['message_count', 'latency_sum', 'error_count', 'data_loss_count']:
+        if redis_client.get(key) is None:
+            redis_client.set(key, 0)
+except redis.exceptions.ConnectionError as e:
+    # Counters are created by the first flush; offline tools such as replay run without Redis
+    logger.warning("Redis unavailable, skipping counter initialization: %s", e)
@@ -0,0 +1,116 @@
+
+
+import logging
+import threading
+from collections import deque
+from time import time
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+import psutil
+
+from app.config import INGESTION_MODE, SYSTEM_STATS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Threads that do ingestion work: the websocket-client loop and its processor,
+# the tick writer, and the async mode's CPU executor
+INGESTION_THREAD_PREFIXES = ("ws-", "tick-writer", "ingest-cpu")
+WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class SystemSample(NamedTuple):
+    time: float                    # Unix time of the sample
+    cpu_percent: float             # Host CPU since the previous sample
+    memory_percent: float          # Host memory in use
+    rss_bytes: int                 # Resident memory of this process
+    threads: int                   # Threads of this process
+    ingestion_threads: Optional[int] # Live threads named with INGESTION_THREAD_PREFIXES (None when not tracked)
+    ingestion_cpu_percent: Optional[float] # Their CPU time since the previous sample, in % of one core
+
+
+class SystemStatsSampler:
+    """
+    Samples host and process stats in a background thread into a ring buffer.
+
+    Each sample is cheap and non-blocking. CPU figures are deltas since the
+    previous sample rather than measured over a sleep, so readers such as
+    `/metrics` never wait: they take `latest()` and, if asked, `averages()`
+    over the buffered window (15 minutes by default).
+
+    Ingestion threads are only found in this process, so with
+    `track_ingestion` off (INGESTION_MODE=process, where ingestion runs in
+    worker processes) the ingestion fields are None instead of a misleading 0.
+    """
+    def __init__(self, interval: float = 1.0, history: float = 900.0, track_ingestion: bool = True):
+        self.interval = interval
+        self.track_ingestion = track_ingestion
+        self._samples: Deque[SystemSample] = deque(maxlen=max(1, int(history / interval)))
+        self._process = psutil.Process()
+        self._thread_cpu: Dict[int, float] = {}
+        self._last_time: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> SystemSample:
+        with self._lock:
+            now = time()
+            thread_cpu, ingestion_cpu_percent = {}, None
+            if self.track_ingestion:
+                ingestion_ids = {thread.native_id for thread in threading.enumerate()
+                                 if thread.name.startswith(INGESTION_THREAD_PREFIXES)}
+                thread_cpu = {thread.id: thread.user_time + thread.system_time for thread in self._process.threads()
+                              if thread.id in ingestion_ids}
+                busy = sum(cpu - self._thread_cpu.get(thread_id, cpu) for thread_id, cpu in thread_cpu.items())
+                elapsed = now - self._last_time if self._last_time is not None else 0.0
+                ingestion_cpu_percent = 100.0 * busy / elapsed if elapsed > 0 else 0.0
+            sample = SystemSample(
+                time=now,
+                cpu_percent=psutil.cpu_percent(interval=None),
+                memory_percent=psutil.virtual_memory().percent,
+                rss_bytes=self._process.memory_info().rss,
+                threads=self._process.num_threads(),
+                ingestion_threads=len(thread_cpu) if self.track_ingestion else None,
+                ingestion_cpu_percent=ingestion_cpu_percent,
+            )
+            self._thread_cpu, self._last_time = thread_cpu, now
+            self._samples.append(sample)
+            return sample
+
+    def latest(self) -> Optional[SystemSample]:
+        return self._samples[-1] if self._samples else None
+
+    def averages(self, windows: Dict[str, float] = WINDOWS) -> Dict[str, Dict[str, float]]:
+        """Mean of every tracked field over the samples of each window, e.g. {"1m": {...}}."""
+        samples: Tuple[SystemSample, ...] = tuple(self._samples)
+        now = time()
+        result = {}
+        for name, seconds in windows.items():
+            recent = [sample for sample in samples if sample.time >= now - seconds]
+            if recent:
+                result[name] = {field: sum(getattr(sample, field) for sample in recent) / len(recent)
+                                for field in SystemSample._fields[1:] if getattr(recent[0], field) is not None}
+        return result
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Prime the CPU counters so the first buffered sample has a baseline
+        self.sample()
+        self._samples.clear()
+        self._thread = threading.Thread(target=self._run, name="system-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except psutil.Error as e:
+                logger.warning("System stats sample failed: %s", e)
+
+
+system_stats = SystemStatsSampler(SYSTEM_STATS_INTERVAL, track_ingestion=INGESTION_MODE != "process")
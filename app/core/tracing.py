@@ -0,0 +1,108 @@
+
+
+import json
+import logging
+import threading
+from time import perf_counter_ns, time
+from typing import List, Optional, Tuple
+
+from app.core.metrics import prom_stage_latency
+
+logger = logging.getLogger(__name__)
+
+
+class MessageTrace:
+    """
+    Stage timeline of one message. `mark(stage)` closes the stage that has
+    been running since the previous mark (or since the trace began), so each
+    stage costs a single clock read.
+    """
+    __slots__ = ("started_ns", "last_ns", "laps", "symbol")
+
+    def __init__(self, started_ns: Optional[int] = None):
+        self.started_ns = started_ns or perf_counter_ns()
+        self.last_ns = self.started_ns
+        self.laps: List[Tuple[str, int]] = []
+        self.symbol = ""
+
+    def mark(self, stage: str) -> None:
+        now = perf_counter_ns()
+        self.laps.append((stage, now - self.last_ns))
+        self.last_ns = now
+
+    def add(self, stage: str, duration_ns: int) -> None:
+        """Record a stage that was timed elsewhere, e.g. time spent queued before the trace began."""
+        self.laps.append((stage, duration_ns))
+
+    @property
+    def total_ns(self) -> int:
+        return sum(duration for _, duration in self.laps)
+
+    def breakdown(self) -> str:
+        return ", ".join(f"{stage}={duration / 1000:.1f}us" for stage, duration in self.laps)
+
+
+class _NullTrace:
+    """Stand-in used when a caller does not trace; marks are ignored."""
+    symbol = ""
+
+    def mark(self, stage: str) -> None:
+        pass
+
+    def add(self, stage: str, duration_ns: int) -> None:
+        pass
+
+
+NO_TRACE = _NullTrace()
+
+
+class PipelineTracer:
+    """
+    Turns finished message traces into per-stage latency histograms
+    (labelled by stage and symbol). It can also write a sample of messages as
+    span timelines to a JSON-lines file, and it logs the stage breakdown of
+    any message slower than `slow_threshold` seconds.
+    """
+    def __init__(self, sample_rate: float = 0.0, trace_path: str = "", slow_threshold: float = 0.0):
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        # Every Nth message is sampled; counting is cheaper and steadier than a random draw
+        self.sample_every = int(round(1.0 / sample_rate)) if sample_rate > 0 and trace_path else 0
+        self._file = open(trace_path, "a", encoding="utf-8") if self.sample_every else None
+        self._seen = 0
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def begin(self) -> MessageTrace:
+        return MessageTrace()
+
+    def finish(self, trace: MessageTrace) -> None:
+        symbol = trace.symbol
+        for stage, duration in trace.laps:
+            child = self._children.get((stage, symbol))
+            if child is None:
+                child = self._children[(stage, symbol)] = prom_stage_latency.labels(stage, symbol)
+            child.observe(duration / 1e9)
+
+        total = trace.total_ns
+        if self.slow_threshold_ns and total > self.slow_threshold_ns:
+            logger.warning("Slow message for %s: %.1fms (%s)", symbol or "?", total / 1e6, trace.breakdown())
+
+        if self.sample_every:
+            self._seen += 1
+            if self._seen % self.sample_every == 0:
+                self._write(trace, total)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+
+    def _write(self, trace: MessageTrace, total: int) -> None:
+        spans, offset = [], 0
+        for stage, duration in trace.laps:
+            spans.append({"stage": stage, "start_us": offset / 1000, "duration_us": duration / 1000})
+            offset += duration
+        line = json.dumps({"ts": time(), "symbol": trace.symbol, "total_us": total / 1000, "spans": spans})
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
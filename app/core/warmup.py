@@ -0,0 +1,132 @@
+
+
+import argparse
+import logging
+import os
+from time import perf_counter, time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import psutil
+
+from app.core.jit import NUMBA_AVAILABLE
+from app.core.metrics import prom_kernel_signatures, prom_kernel_warmup_seconds, prom_startup_import_seconds
+
+logger = logging.getLogger(__name__)
+
+_DEPTH_MESSAGE = ('{"stream":"btcusdt@depth","data":{"e":"depthUpdate","E":1,"s":"BTCUSDT","U":1,"u":2,'
+                  '"b":[["100.10","1.5"],["100.00","0"]],"a":[["100.20","2.0"]]}}')
+
+
+def _warm_indicator() -> None:
+    from app.services.indicator import calculate_depth_volume, calculate_last_two_sma, calculate_wap
+    bids = np.array([[100.0, 1.0], [99.0, 2.0]])
+    asks = np.array([[101.0, 1.0], [102.0, 2.0]])
+    calculate_wap(bids, asks, 2)
+    calculate_depth_volume(bids, asks, 2)
+    calculate_last_two_sma(np.arange(1.0, 11.0), 5)
+
+
+def _warm_rolling_sma() -> None:
+    from app.services.rolling_sma import _push_price
+    buf, state = np.zeros(4), np.zeros(2, dtype=np.int64)
+    windows = np.array([2, 3], dtype=np.int64)
+    sums, comps, smas = np.zeros(2), np.zeros(2), np.zeros((2, 2))
+    for price in (1.0, 2.0, 3.0, 4.0, 5.0):
+        _push_price(buf, state, price, windows, sums, comps, smas, True)
+
+
+def _warm_streaming_indicators() -> None:
+    from app.services.streaming_indicators import INDICATORS, FeatureEngine
+    params = {"bollinger": ":3:2"}
+    engine = FeatureEngine([kind + params.get(kind, ":3") for kind in INDICATORS])
+    for price in (1.0, 2.0, 3.0, 2.0, 1.0):
+        engine.update(price, 1.0)
+
+
+def _warm_order_book() -> None:
+    from app.services.order_book import OrderBook
+    book = OrderBook(4)
+    book.load_snapshot({"lastUpdateId": 1, "bids": [["100.0", "1.0"]], "asks": [["101.0", "1.0"]]})
+    book.apply_updates(np.array([[100.5, 1.0], [100.0, 0.0]]), np.array([[101.5, 2.0]]))
+
+
+def _warm_depth_decoder() -> None:
+    from app.services.depth_decoder import DepthDecoder
+    decoder = DepthDecoder(capacity=1)
+    decoder.decode(_DEPTH_MESSAGE)
+    decoder.decode(_DEPTH_MESSAGE.encode())
+
+
+def _warm_backtest() -> None:
+    from app.services.backtest import sweep_sma_crossovers
+    sweep_sma_crossovers(np.linspace(100.0, 110.0, 16), [2], [4], chunk_size=8)
+
+
+# (name, warmup, needed by live ingestion). The backtest kernel is only warmed
+# at image build time, so its cache is ready without slowing service start-up.
+KERNELS: List[Tuple[str, Callable[[], None], bool]] = [
+    ("indicator", _warm_indicator, True),
+    ("rolling_sma", _warm_rolling_sma, True),
+    ("streaming_indicators", _warm_streaming_indicators, True),
+    ("order_book", _warm_order_book, True),
+    ("depth_decoder", _warm_depth_decoder, True),
+    ("backtest", _warm_backtest, False),
+]
+
+
+def kernel_cache_stats() -> Dict[str, int]:
+    """Count kernel signatures loaded from the on-disk cache vs compiled in this process."""
+    counts = {"cache": 0, "compiled": 0}
+    if not NUMBA_AVAILABLE:
+        return counts
+    from numba.core.dispatcher import Dispatcher
+    from app.services import backtest, depth_decoder, indicator, order_book, rolling_sma, streaming_indicators
+    for module in (indicator, rolling_sma, streaming_indicators, order_book, depth_decoder, backtest):
+        for value in vars(module).values():
+            if isinstance(value, Dispatcher) and value.__module__ == module.__name__:
+                counts["cache"] += sum(value.stats.cache_hits.values())
+                counts["compiled"] += sum(value.stats.cache_misses.values())
+    return counts
+
+
+def warmup_kernels(include_offline: bool = False) -> Dict[str, float]:
+    """
+    Run every kernel once with the argument types used in production, so
+    compilation (or loading from the on-disk cache) happens here rather than
+    on the first message. Times are exported as Prometheus gauges.
+    """
+    prom_startup_import_seconds.set(max(time() - psutil.Process(os.getpid()).create_time(), 0.0))
+    timings = {}
+    started = perf_counter()
+    for name, warm, online in KERNELS:
+        if not (online or include_offline):
+            continue
+        start = perf_counter()
+        warm()
+        timings[name] = perf_counter() - start
+        prom_kernel_warmup_seconds.labels(name).set(timings[name])
+
+    stats = kernel_cache_stats()
+    for source, count in stats.items():
+        prom_kernel_signatures.labels(source).set(count)
+    logger.info("Kernel warmup took %.2fs (%d signatures from cache, %d compiled%s).",
+                perf_counter() - started, stats["cache"], stats["compiled"],
+                "" if NUMBA_AVAILABLE else "; Numba unavailable, using the NumPy fallback")
+    return timings
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compile the Numba kernels into the on-disk cache.")
+    parser.add_argument("--online-only", action="store_true", help="skip kernels not used by live ingestion")
+    args = parser.parse_args(argv)
+    timings = warmup_kernels(include_offline=not args.online_only)
+    stats = kernel_cache_stats()
+    for name, seconds in timings.items():
+        print(f"{name:<22}{seconds:8.3f}s")
+    print(f"signatures: {stats['cache']} from cache, {stats['compiled']} compiled")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
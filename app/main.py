@@ -1,11 +1,19 @@
 
+import asyncio
 import threading
 import logging
 import uvicorn
 
 from fastapi import FastAPI
-from app.api.endpoints import health, metrics, prometheus
-from app.websocket.run_websocket import run_websocket
+from app.api.endpoints import health, history, metrics, prometheus, stream, ticks
+from app.websocket.run_websocket import run_websocket, stop_websocket
+from app.core.warmup import warmup_kernels
+from app.core.system_stats import system_stats
+from app.core.live_feed import live_feed
+from app.config import (
+    INGESTION_MODE, INGESTION_WORKERS, PRICE_ARCHIVE_DIR, PRICE_MAINTENANCE_INTERVAL,
+    PRICE_PARTITION_DAYS_AHEAD, PRICE_RETENTION_DAYS
+)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -15,16 +23,69 @@ app = FastAPI()
 app.include_router(health.router)
 app.include_router(metrics.router)
 app.include_router(prometheus.router)
+app.include_router(ticks.router)
+app.include_router(stream.router)
+app.include_router(history.router)
 
 # Create database tables on startup (if they don’t exist)
 from app.core.db import engine, Base
+from app.services.retention import PriceRetention
+price_retention = PriceRetention(engine, PRICE_RETENTION_DAYS, PRICE_ARCHIVE_DIR, PRICE_PARTITION_DAYS_AHEAD)
+# On PostgreSQL `prices` is created partitioned, so it must exist before create_all
+price_retention.prepare()
 Base.metadata.create_all(bind=engine)
 
+ws_thread = None
+ws_task = None
+supervisor = None
+
 @app.on_event("startup")
-def startup_event():
-    ws_thread = threading.Thread(target=run_websocket, daemon=True)
+async def startup_event():
+    global ws_thread, ws_task, supervisor
+    system_stats.start()
+    if PRICE_MAINTENANCE_INTERVAL > 0:
+        price_retention.start(PRICE_MAINTENANCE_INTERVAL)
+    if INGESTION_MODE == "process":
+        from app.websocket.config import Config
+        from app.websocket.supervisor import IngestionSupervisor
+        supervisor = IngestionSupervisor(Config(), INGESTION_WORKERS)
+        # Workers warm their own kernels before connecting
+        supervisor.start()
+        logger.info("Started %d ingestion worker processes.", len(supervisor.shards))
+        return
+    # Compile (or load from cache) the kernels before the first message arrives
+    await asyncio.get_running_loop().run_in_executor(None, warmup_kernels)
+    if INGESTION_MODE == "async":
+        # Imported lazily so the async drivers are only needed in this mode
+        from app.websocket.run_websocket_async import run_websocket_async
+        ws_task = asyncio.create_task(run_websocket_async())
+        logger.info("WebSocket ingestion task started on the event loop.")
+        return
+    ws_thread = threading.Thread(target=run_websocket, name="ws-ingestion", daemon=True)
     ws_thread.start()
     logger.info("WebSocket ingestion thread started.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    price_retention.stop()
+    system_stats.stop()
+    live_feed.close()
+    if supervisor is not None:
+        await asyncio.get_running_loop().run_in_executor(None, supervisor.stop)
+        logger.info("Ingestion worker processes stopped.")
+        return
+    if ws_task is not None:
+        ws_task.cancel()
+        try:
+            await ws_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("WebSocket ingestion task stopped.")
+        return
+    stop_websocket()
+    if ws_thread is not None:
+        await asyncio.get_running_loop().run_in_executor(None, ws_thread.join, 15)
+    logger.info("WebSocket ingestion thread stopped.")
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,27 +1,60 @@
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, func
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, Index, func, text
 from app.core.db import Base
 
 class Price(Base):
     __tablename__ = 'prices'
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, default=func.now(), index=True)
+    symbol = Column(String)
     wap = Column(Float)
+    __table_args__ = (Index('ix_prices_symbol_timestamp', 'symbol', 'timestamp'),)
 
 class Order(Base):
     __tablename__ = 'orders'
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    symbol = Column(String)
     status = Column(String)  # e.g., "open", "closed"
     side = Column(String)    # e.g., "long" or "short"
     price = Column(Float)    # Execution price (or signal price)
     details = Column(String) # Any additional details
+    close_price = Column(Float)
+    closed_at = Column(DateTime)
+    __table_args__ = (
+        Index('ix_orders_symbol_status', 'symbol', 'status'),
+        # At most one open order per symbol, enforced across all instances
+        Index('uq_orders_open_symbol', 'symbol', unique=True,
+              postgresql_where=text("status = 'open'"), sqlite_where=text("status = 'open'")),
+    )
 
 class TradingSignal(Base):
     __tablename__ = 'trading_signals'
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, default=func.now(), index=True)
+    symbol = Column(String)
     signal_type = Column(String)  # e.g., "open", "close"
     price = Column(Float)
     details = Column(String)      # A JSON string with additional signal info
+    __table_args__ = (Index('ix_trading_signals_symbol_timestamp', 'symbol', 'timestamp'),)
+
+# WAP bars rolled up from `prices`: one row per symbol, resolution and bucket
+class PriceBar(Base):
+    __tablename__ = 'price_bars'
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    resolution = Column(Integer, nullable=False)  # bar length in seconds, e.g. 1, 60, 3600
+    bucket_start = Column(DateTime, nullable=False)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    tick_count = Column(Integer)
+    __table_args__ = (Index('uq_price_bars_symbol_resolution_bucket', 'symbol', 'resolution', 'bucket_start', unique=True),)
+
+# How far each spool segment has been replayed, committed with the rows it covers
+class SpoolCheckpoint(Base):
+    __tablename__ = 'spool_checkpoints'
+    segment = Column(String, primary_key=True)
+    byte_offset = Column(BigInteger, nullable=False)
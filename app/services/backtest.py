@@ -0,0 +1,236 @@
+
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.db import read_engine
+from app.core.jit import njit, prange
+from app.models.models import Price
+from app.services.tick_store import TickStore
+
+
+@njit(parallel=True, cache=True)
+def _sweep_chunk(window, csum, start, shorts, longs, position, entry, realized, trades, prev_diff):
+    """
+    Advance every (short, long) pair over window[start:].
+
+    `window` is the tail of earlier prices followed by the new chunk and
+    `csum` its cumulative sum (csum[0] == 0), so each SMA is a difference of
+    two prefix sums. Pairs are independent and run in parallel. The state
+    arrays carry each pair across chunks. Like the live SignalProcessor, a
+    pair opens a long when the short SMA crosses above the long SMA and closes
+    it on the cross back below, and it never holds more than one position.
+    """
+    n = window.shape[0]
+    for k in prange(shorts.shape[0]):
+        short = shorts[k]
+        long = longs[k]
+        pos = position[k]
+        entry_price = entry[k]
+        pnl = realized[k]
+        count = trades[k]
+        prev = prev_diff[k]
+        for t in range(max(start, long - 1), n):
+            diff = (csum[t + 1] - csum[t + 1 - short]) / short - (csum[t + 1] - csum[t + 1 - long]) / long
+            if not np.isnan(prev):
+                if pos == 0 and diff > 0 and prev <= 0:
+                    pos = 1
+                    entry_price = window[t]
+                    count += 1
+                elif pos == 1 and diff < 0 and prev >= 0:
+                    pos = 0
+                    pnl += window[t] - entry_price
+            prev = diff
+        position[k] = pos
+        entry[k] = entry_price
+        realized[k] = pnl
+        trades[k] = count
+        prev_diff[k] = prev
+
+
+def window_grid(shorts: Iterable[int], longs: Iterable[int]) -> np.ndarray:
+    """All (short, long) pairs with short < long, as an (n, 2) int64 array."""
+    pairs = [(s, l) for s in shorts for l in longs if 0 < s < l]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+@dataclass
+class SweepResult:
+    shorts: np.ndarray
+    longs: np.ndarray
+    trades: np.ndarray          # positions opened per pair
+    realized_pnl: np.ndarray    # PnL of closed positions, in quote units per unit held
+    unrealized_pnl: np.ndarray  # mark-to-market of the position still open at the last price
+    ticks: int
+
+    @property
+    def total_pnl(self) -> np.ndarray:
+        return self.realized_pnl + self.unrealized_pnl
+
+    def best(self, n: int = 10) -> List[dict]:
+        """The `n` pairs with the highest total PnL."""
+        order = np.argsort(-self.total_pnl, kind="stable")[:n]
+        return [{
+            "short": int(self.shorts[i]),
+            "long": int(self.longs[i]),
+            "trades": int(self.trades[i]),
+            "realized_pnl": float(self.realized_pnl[i]),
+            "total_pnl": float(self.total_pnl[i]),
+        } for i in order]
+
+
+class SMASweep:
+    """
+    Streaming backtest of SMA crossovers for a whole grid of window pairs.
+
+    Prices are fed in chunks with `update`. Only the last max(long) - 1 prices
+    and a few scalars per pair are kept between chunks. Memory therefore
+    scales with the chunk size and the grid size, not with the series length.
+    """
+    def __init__(self, pairs: np.ndarray):
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        if len(pairs) and not (pairs[:, 0] < pairs[:, 1]).all():
+            raise ValueError("Each pair needs short < long")
+        self.shorts = np.ascontiguousarray(pairs[:, 0])
+        self.longs = np.ascontiguousarray(pairs[:, 1])
+        self._history = int(self.longs.max()) - 1 if len(pairs) else 0
+        self._tail = np.zeros(0, dtype=np.float64)
+        self._position = np.zeros(len(pairs), dtype=np.int8)
+        self._entry = np.zeros(len(pairs), dtype=np.float64)
+        self._realized = np.zeros(len(pairs), dtype=np.float64)
+        self._trades = np.zeros(len(pairs), dtype=np.int64)
+        self._prev_diff = np.full(len(pairs), np.nan)
+        self._ticks = 0
+        self._offset = None
+
+    def update(self, prices) -> None:
+        prices = np.asarray(prices, dtype=np.float64)
+        if not len(prices):
+            return
+        if self._offset is None:
+            # Prefix sums are taken around the first price so they stay small
+            self._offset = float(prices[0])
+        window = np.concatenate((self._tail, prices))
+        csum = np.zeros(len(window) + 1, dtype=np.float64)
+        np.cumsum(window - self._offset, out=csum[1:])
+        _sweep_chunk(window, csum, len(self._tail), self.shorts, self.longs,
+                     self._position, self._entry, self._realized, self._trades, self._prev_diff)
+        self._tail = window[len(window) - min(len(window), self._history):].copy()
+        self._ticks += len(prices)
+
+    def result(self) -> SweepResult:
+        last = self._tail[-1] if len(self._tail) else np.nan
+        unrealized = np.where(self._position == 1, last - self._entry, 0.0)
+        return SweepResult(self.shorts.copy(), self.longs.copy(), self._trades.copy(),
+                           self._realized.copy(), unrealized, self._ticks)
+
+
+def sweep_sma_crossovers(prices, shorts: Iterable[int], longs: Iterable[int],
+                         chunk_size: int = 1_000_000) -> SweepResult:
+    """
+    Backtest every short/long SMA window pair over `prices`. `prices` is an
+    array or an iterable of array chunks, e.g. from `load_db_prices`.
+    """
+    sweep = SMASweep(window_grid(shorts, longs))
+    if isinstance(prices, (np.ndarray, list, tuple)):
+        prices = np.asarray(prices, dtype=np.float64)
+        chunks = (prices[i:i + chunk_size] for i in range(0, len(prices), chunk_size))
+    else:
+        chunks = prices
+    for chunk in chunks:
+        sweep.update(chunk)
+    return sweep.result()
+
+
+def crossover_signals(prices, short: int, long: int) -> np.ndarray:
+    """
+    Open/close signals for a single pair as an (n, 2) array of
+    [tick index, +1 open / -1 close], using the same rules as the sweep.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) <= long:
+        return np.zeros((0, 2), dtype=np.int64)
+    csum = np.concatenate(([0.0], np.cumsum(prices - prices[0])))
+    diff = (csum[long:] - csum[long - short:-short]) / short - (csum[long:] - csum[:-long]) / long
+    up = np.flatnonzero((diff[1:] > 0) & (diff[:-1] <= 0)) + 1
+    down = np.flatnonzero((diff[1:] < 0) & (diff[:-1] >= 0)) + 1
+    events = np.concatenate((np.stack((up, np.ones_like(up)), axis=1),
+                             np.stack((down, -np.ones_like(down)), axis=1)))
+    events = events[np.argsort(events[:, 0], kind="stable")]
+    # Keep the alternation a single long position allows: open, close, open, ...
+    signals, holding = [], False
+    for index, kind in events:
+        if (kind == 1) != holding:
+            signals.append((index + long - 1, kind))
+            holding = kind == 1
+    return np.array(signals, dtype=np.int64).reshape(-1, 2)
+
+
+def load_db_prices(symbol: Optional[str] = None, bind=None, chunk_size: int = 1_000_000) -> Iterator[np.ndarray]:
+    """Stream WAP values from the `prices` table in timestamp order, chunk by chunk."""
+    query = select(Price.wap).order_by(Price.timestamp, Price.id)
+    if symbol is not None:
+        query = query.where(Price.symbol == symbol)
+    with (bind or read_engine).connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.partitions(chunk_size):
+            yield np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+
+
+def load_store_prices(path: str, symbol: str, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Iterator[np.ndarray]:
+    """WAP values from a tick store directory, one memory-mapped segment slice at a time."""
+    for records in TickStore(path).scan(symbol, start, end):
+        yield records["wap"]
+
+
+def load_replay_prices(path: str, symbol: str, config=None) -> np.ndarray:
+    """WAP series for `symbol` obtained by replaying a recording through the pipeline."""
+    from app.websocket.config import Config
+    from app.websocket.replay import MemorySink, ReplayEngine
+
+    sink = MemorySink()
+    ReplayEngine(config or Config(SYMBOLS=(symbol,)), path).run(sink=sink)
+    return np.array([wap for tick_symbol, wap in sink.ticks if tick_symbol == symbol.upper()], dtype=np.float64)
+
+
+def _window_range(text: str) -> range:
+    # "10:100:10" -> range(10, 101, 10); a single number is one window
+    parts = [int(part) for part in text.split(":")]
+    if len(parts) == 1:
+        return range(parts[0], parts[0] + 1)
+    return range(parts[0], parts[1] + 1, parts[2] if len(parts) > 2 else 1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Backtest a grid of SMA crossover windows.")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--recording", help="replay this recording instead of reading the prices table")
+    parser.add_argument("--store", help="read ticks from this tick store directory instead of the prices table")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="first UTC time read from --store")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="UTC time where reading from --store stops")
+    parser.add_argument("--shorts", type=_window_range, default=range(10, 101, 10), help="start:stop[:step]")
+    parser.add_argument("--longs", type=_window_range, default=range(50, 401, 50), help="start:stop[:step]")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.recording:
+        prices = load_replay_prices(args.recording, args.symbol)
+    elif args.store:
+        prices = load_store_prices(args.store, args.symbol, args.start, args.end)
+    else:
+        prices = load_db_prices(args.symbol, chunk_size=args.chunk_size)
+    result = sweep_sma_crossovers(prices, args.shorts, args.longs, chunk_size=args.chunk_size)
+    print(f"ticks: {result.ticks}, pairs: {len(result.shorts)}")
+    for row in result.best(args.top):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.db import engine
+from app.models.models import Price
+from app.services.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOLUTIONS = (1, 60, 3600)
+_EPOCH = datetime(1970, 1, 1)
+_US = 1_000_000
+
+
+class Bar(NamedTuple):
+    symbol: str
+    resolution: int  # seconds
+    bucket: int      # bucket index: start time in seconds // resolution
+    open: float
+    high: float
+    low: float
+    close: float
+    ticks: int
+
+    def merge(self, later: "Bar") -> "Bar":
+        """Combine with a bar for the same bucket that holds later ticks."""
+        return self._replace(high=max(self.high, later.high), low=min(self.low, later.low),
+                             close=later.close, ticks=self.ticks + later.ticks)
+
+    def as_row(self) -> dict:
+        return {"symbol": self.symbol, "resolution": self.resolution,
+                "bucket_start": _EPOCH + timedelta(seconds=self.bucket * self.resolution),
+                "open": self.open, "high": self.high, "low": self.low, "close": self.close,
+                "tick_count": self.ticks}
+
+
+def to_microseconds(timestamps: Sequence[datetime]) -> np.ndarray:
+    """Naive UTC datetimes (as stored in `prices`) to int64 microseconds since the epoch."""
+    return np.array(timestamps, dtype="datetime64[us]").astype(np.int64)
+
+
+class BarAggregator:
+    """
+    Builds OHLC bars of WAP at several resolutions from batches of ticks.
+
+    Each batch is grouped into buckets with NumPy (`reduceat`), so the cost
+    per tick is a few vector operations, not Python work. The last bucket per
+    symbol and resolution stays open in memory until a later tick falls into
+    a newer bucket; `add` returns only the bars that are finished. Ticks must
+    arrive in time order per symbol; a late tick counts towards the open bar.
+    """
+    def __init__(self, resolutions: Iterable[int] = DEFAULT_RESOLUTIONS):
+        self.resolutions = tuple(int(resolution) for resolution in resolutions)
+        self._open: Dict[Tuple[str, int], Bar] = {}
+
+    def add(self, symbol: str, times_us: np.ndarray, prices: np.ndarray) -> List[Bar]:
+        finished = []
+        if len(prices) == 0:
+            return finished
+        prices = np.asarray(prices, dtype=np.float64)
+        for resolution in self.resolutions:
+            pending = self._open.get((symbol, resolution))
+            buckets = np.asarray(times_us) // (resolution * _US)
+            if pending is not None:
+                buckets = np.maximum(buckets, pending.bucket)
+            buckets = np.maximum.accumulate(buckets)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            ends = np.concatenate((starts[1:], [len(prices)])) - 1
+            highs = np.maximum.reduceat(prices, starts)
+            lows = np.minimum.reduceat(prices, starts)
+            bars = [Bar(symbol, resolution, int(buckets[start]), float(prices[start]), float(high),
+                        float(low), float(prices[end]), int(end - start + 1))
+                    for start, end, high, low in zip(starts, ends, highs, lows)]
+
+            if pending is not None:
+                if pending.bucket == bars[0].bucket:
+                    bars[0] = pending.merge(bars[0])
+                else:
+                    finished.append(pending)
+            finished.extend(bars[:-1])
+            self._open[(symbol, resolution)] = bars[-1]
+        return finished
+
+    def add_rows(self, rows: Iterable[Tuple[datetime, Optional[str], float]]) -> List[Bar]:
+        """Feed tick-writer rows (timestamp, symbol, wap), possibly mixing symbols."""
+        by_symbol: Dict[str, Tuple[list, list]] = {}
+        for timestamp, symbol, wap in rows:
+            times, prices = by_symbol.setdefault(symbol or "", ([], []))
+            times.append(timestamp)
+            prices.append(wap)
+        finished = []
+        for symbol, (times, prices) in by_symbol.items():
+            finished.extend(self.add(symbol, to_microseconds(times), np.array(prices, dtype=np.float64)))
+        return finished
+
+    def drain(self) -> List[Bar]:
+        """Return the bars still open (partially filled) and forget them."""
+        bars = list(self._open.values())
+        self._open.clear()
+        return bars
+
+
+def _load_price_chunks(symbol: str, since: Optional[datetime], bind,
+                       chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    query = select(Price.timestamp, Price.wap).where(Price.symbol == symbol).order_by(Price.timestamp, Price.id)
+    if since is not None:
+        query = query.where(Price.timestamp >= since)
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.partitions(chunk_size):
+            yield to_microseconds([row[0] for row in rows]), np.array([row[1] for row in rows], dtype=np.float64)
+
+
+def backfill_bars(symbols: Optional[Iterable[str]] = None, resolutions: Iterable[int] = DEFAULT_RESOLUTIONS,
+                  since: Optional[datetime] = None, bind=None, chunk_size: int = 500_000) -> int:
+    """
+    Rebuild bars from the raw `prices` table, overwriting the bars it covers.
+    Ticks are streamed in timestamp order via ix_prices_symbol_timestamp, and
+    each chunk's finished bars are written in one bulk upsert. Returns the
+    number of bars written.
+    """
+    bind = bind or engine
+    if symbols is None:
+        with bind.connect() as conn:
+            symbols = [row[0] for row in conn.execute(select(Price.symbol).distinct()) if row[0] is not None]
+    if since is not None:
+        # Start on a boundary of the longest bar so the first bar is complete
+        longest = max(resolutions) * _US
+        since = _EPOCH + timedelta(microseconds=int(to_microseconds([since])[0]) // longest * longest)
+    written = 0
+    for symbol in symbols:
+        aggregator = BarAggregator(resolutions)
+        for times, prices in _load_price_chunks(symbol, since, bind, chunk_size):
+            bars = aggregator.add(symbol, times, prices)
+            DatabaseManager.upsert_price_bars([bar.as_row() for bar in bars], bind=bind, replace=True)
+            written += len(bars)
+        bars = aggregator.drain()
+        DatabaseManager.upsert_price_bars([bar.as_row() for bar in bars], bind=bind, replace=True)
+        written += len(bars)
+        logger.info("Backfilled bars for %s (%d so far).", symbol, written)
+    return written
+
+
+def rebuild_bars(rows: List[dict], bind=None) -> List[dict]:
+    """
+    Recompute bar rows (as from `Bar.as_row`) from the raw ticks in their
+    buckets, so they can be written with `replace=True` and writing them
+    twice is harmless. A bar with no ticks in `prices` keeps its values.
+    Duplicate keys collapse into one row.
+    """
+    bind = bind or engine
+    spans: Dict[str, Tuple[datetime, datetime, set]] = {}
+    for row in rows:
+        start, end = row["bucket_start"], row["bucket_start"] + timedelta(seconds=row["resolution"])
+        first, last, resolutions = spans.get(row["symbol"], (start, end, set()))
+        resolutions.add(row["resolution"])
+        spans[row["symbol"]] = (min(first, start), max(last, end), resolutions)
+
+    rebuilt = {}
+    with bind.connect() as conn:
+        for symbol, (start, end, resolutions) in spans.items():
+            ticks = conn.execute(select(Price.timestamp, Price.wap)
+                                 .where(Price.symbol == symbol, Price.timestamp >= start, Price.timestamp < end)
+                                 .order_by(Price.timestamp, Price.id)).all()
+            if not ticks:
+                continue
+            aggregator = BarAggregator(resolutions)
+            bars = aggregator.add(symbol, to_microseconds([tick[0] for tick in ticks]),
+                                  np.array([tick[1] for tick in ticks], dtype=np.float64))
+            for bar in bars + aggregator.drain():
+                row = bar.as_row()
+                rebuilt[(symbol, bar.resolution, row["bucket_start"])] = row
+    keyed = {(row["symbol"], row["resolution"], row["bucket_start"]): row for row in rows}
+    return [rebuilt.get(key, row) for key, row in keyed.items()]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the price_bars rollups from the raw prices table.")
+    parser.add_argument("--symbol", action="append", help="repeat for several symbols (default: all)")
+    parser.add_argument("--resolutions", default=",".join(map(str, DEFAULT_RESOLUTIONS)),
+                        help="comma-separated bar lengths in seconds")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rebuild bars from this UTC time on")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    args = parser.parse_args(argv)
+
+    resolutions = [int(value) for value in args.resolutions.split(",")]
+    written = backfill_bars(args.symbol, resolutions, args.since, chunk_size=args.chunk_size)
+    print(f"bars written: {written}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
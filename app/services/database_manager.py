@@ -1,33 +1,131 @@
 
 
+import io
 import json
-import backoff
-from contextlib import contextmanager
-from app.core.db import SessionLocal
-from app.models.models import Price, TradingSignal
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.core.db import engine, unit_of_work
+from app.models.models import Price, PriceBar, SpoolCheckpoint, TradingSignal
+
+_COPY_NULL = "\\N"  # NULL marker in PostgreSQL COPY text format
+_BAR_KEY = ("symbol", "resolution", "bucket_start")
+
+
+def _bar_upsert(dialect_name: str, replace: bool):
+    """
+    INSERT ... ON CONFLICT for price bars. By default a bar that already
+    exists is merged with the new one (keeps its open, widens high/low, takes
+    the new close and adds the tick counts). With `replace` it is overwritten.
+    """
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(PriceBar.__table__)
+    new, bars = stmt.excluded, PriceBar.__table__.c
+    if replace:
+        values = {name: new[name] for name in ("open", "high", "low", "close", "tick_count")}
+    else:
+        greatest, least = (func.greatest, func.least) if dialect_name == "postgresql" else (func.max, func.min)
+        values = {"high": greatest(bars.high, new.high), "low": least(bars.low, new.low),
+                  "close": new.close, "tick_count": bars.tick_count + new.tick_count}
+    return stmt.on_conflict_do_update(index_elements=list(_BAR_KEY), set_=values)
+
+
+def _checkpoint_upsert(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(SpoolCheckpoint.__table__)
+    return stmt.on_conflict_do_update(index_elements=["segment"], set_={"byte_offset": stmt.excluded.byte_offset})
 
 class DatabaseManager:
-    """Handles database operations with retry/backoff logic."""
+    """
+    Handles database operations. Nothing here retries or sleeps: callers on
+    the ingestion path hand failed writes to the spool (app.services.spool)
+    instead of waiting for the database to come back.
+    """
     
     @staticmethod
-    @contextmanager
     def get_session():
-        session = SessionLocal()
-        try:
-            yield session
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
-        finally:
-            session.close()
+        """The calling thread's reusable unit of work (see `app.core.db.UnitOfWork`)."""
+        return unit_of_work()
+
+    @staticmethod
+    def save_price_tick(session, wap_price: float, symbol: str = None):
+        session.add(Price(wap=wap_price, symbol=symbol))
+
+    @staticmethod
+    def save_trading_signal(session, signal_type: str, price: float, details: dict, symbol: str = None,
+                            timestamp: Optional[datetime] = None):
+        signal = TradingSignal(symbol=symbol, signal_type=signal_type, price=price, details=json.dumps(details))
+        if timestamp is not None:
+            signal.timestamp = timestamp
+        session.add(signal)
+
+    @staticmethod
+    def bulk_save_price_ticks(rows: list, bind=None, checkpoint: Optional[Tuple[str, int]] = None) -> None:
+        """
+        Insert many (timestamp, symbol, wap) rows in one round-trip.
+        Uses COPY on PostgreSQL and an executemany INSERT elsewhere. A spool
+        `checkpoint` (segment, offset) is saved in the same transaction.
+        """
+        if not rows:
+            return
+        bind = bind or engine
+        with bind.begin() as conn:
+            if bind.dialect.name == "postgresql":
+                buf = io.StringIO("".join(
+                    f"{ts.isoformat()}\t{symbol or _COPY_NULL}\t{wap!r}\n" for ts, symbol, wap in rows
+                ))
+                with conn.connection.cursor() as cursor:
+                    cursor.copy_expert(f"COPY {Price.__tablename__} (timestamp, symbol, wap) FROM STDIN", buf)
+            else:
+                conn.execute(Price.__table__.insert(), [{"timestamp": ts, "symbol": symbol, "wap": wap} for ts, symbol, wap in rows])
+            if checkpoint is not None:
+                DatabaseManager.save_spool_checkpoint(conn, *checkpoint)
+
+    @staticmethod
+    def save_spool_checkpoint(conn, segment: str, offset: int) -> None:
+        """Record, on a Connection or Session, how far a spool segment has been replayed."""
+        dialect = getattr(conn, "dialect", None) or conn.get_bind().dialect
+        conn.execute(_checkpoint_upsert(dialect.name), {"segment": segment, "byte_offset": offset})
+
+    @staticmethod
+    def load_spool_checkpoint(segment: str, bind=None) -> int:
+        """Offset saved by `save_spool_checkpoint` for the segment, or 0."""
+        with (bind or engine).connect() as conn:
+            return conn.scalar(select(SpoolCheckpoint.byte_offset).where(SpoolCheckpoint.segment == segment)) or 0
+
+    @staticmethod
+    def delete_spool_checkpoint(segment: str, bind=None) -> None:
+        with (bind or engine).begin() as conn:
+            conn.execute(SpoolCheckpoint.__table__.delete().where(SpoolCheckpoint.segment == segment))
+
+    @staticmethod
+    async def bulk_save_price_ticks_async(rows: list, bind) -> None:
+        """Async counterpart of `bulk_save_price_ticks` for an AsyncEngine."""
+        if not rows:
+            return
+        async with bind.begin() as conn:
+            if bind.dialect.name == "postgresql":
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Price.__tablename__, records=rows, columns=["timestamp", "symbol", "wap"]
+                )
+            else:
+                await conn.execute(Price.__table__.insert(), [{"timestamp": ts, "symbol": symbol, "wap": wap} for ts, symbol, wap in rows])
 
     @staticmethod
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-    def save_price_tick(session, wap_price: float):
-        session.add(Price(wap=wap_price))
+    def upsert_price_bars(bars: list, bind=None, replace: bool = False) -> None:
+        """Upsert PriceBar rows (dicts) in one statement; see `_bar_upsert` for how conflicts merge."""
+        if not bars:
+            return
+        bind = bind or engine
+        with bind.begin() as conn:
+            conn.execute(_bar_upsert(bind.dialect.name, replace), bars)
 
     @staticmethod
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-    def save_trading_signal(session, signal_type: str, price: float, details: dict):
-        session.add(TradingSignal(signal_type=signal_type, price=price, details=json.dumps(details)))
+    async def upsert_price_bars_async(bars: list, bind, replace: bool = False) -> None:
+        """Async counterpart of `upsert_price_bars` for an AsyncEngine."""
+        if not bars:
+            return
+        async with bind.begin() as conn:
+            await conn.execute(_bar_upsert(bind.dialect.name, replace), bars)
@@ -0,0 +1,212 @@
+
+
+import numpy as np
+from typing import Optional
+
+from app.core.jit import njit
+from app.services.order_book import DepthUpdate
+
+_QUOTE, _COMMA, _COLON, _DOT, _MINUS = 34, 44, 58, 46, 45
+_LBRACKET, _RBRACKET, _LBRACE = 91, 93, 123
+_KEY_S, _KEY_U, _KEY_LOWER_U, _KEY_B, _KEY_A = 115, 85, 117, 98, 97
+# Exactly representable powers of ten: mantissa / 10**k is then correctly rounded
+_POW10 = np.array([10.0 ** k for k in range(23)])
+# Mantissas up to 15 digits are exact in float64
+_MAX_DIGITS = 15
+
+OK = 0
+MALFORMED = 1
+OVERFLOW = 2  # more levels than the output buffers hold
+
+
+@njit(cache=True, inline="always")
+def _skip_ws(buf, i):
+    n = buf.shape[0]
+    while i < n and (buf[i] == 32 or buf[i] == 9 or buf[i] == 10 or buf[i] == 13):
+        i += 1
+    return i
+
+
+@njit(cache=True)
+def _parse_number(buf, i):
+    # Parses a decimal, quoted or not; returns (value, next index, ok)
+    n = buf.shape[0]
+    quoted = i < n and buf[i] == _QUOTE
+    if quoted:
+        i += 1
+    negative = i < n and buf[i] == _MINUS
+    if negative:
+        i += 1
+    mantissa = 0
+    digits = 0
+    frac = -1
+    while i < n:
+        c = buf[i]
+        if 48 <= c <= 57:
+            if digits > 0 or c != 48:
+                digits += 1
+            mantissa = mantissa * 10 + (c - 48)
+            if frac >= 0:
+                frac += 1
+        elif c == _DOT and frac < 0:
+            frac = 0
+        else:
+            break
+        i += 1
+    if quoted:
+        if i >= n or buf[i] != _QUOTE:
+            return 0.0, i, False
+        i += 1
+    if digits > _MAX_DIGITS or frac >= _POW10.shape[0]:
+        return 0.0, i, False
+    value = float(mantissa)
+    if frac > 0:
+        value = value / _POW10[frac]
+    return -value if negative else value, i, True
+
+
+@njit(cache=True)
+def _parse_levels(buf, i, out):
+    # Parses [["price","qty"], ...] starting at '['; returns (count, next index, ok)
+    n = buf.shape[0]
+    capacity = out.shape[0]
+    count = 0
+    i = _skip_ws(buf, i + 1)
+    if i < n and buf[i] == _RBRACKET:
+        return 0, i + 1, True
+    while i < n:
+        if buf[i] != _LBRACKET:
+            return count, i, False
+        price, i, ok = _parse_number(buf, _skip_ws(buf, i + 1))
+        if not ok:
+            return count, i, False
+        i = _skip_ws(buf, i)
+        if i >= n or buf[i] != _COMMA:
+            return count, i, False
+        qty, i, ok = _parse_number(buf, _skip_ws(buf, i + 1))
+        if not ok:
+            return count, i, False
+        i = _skip_ws(buf, i)
+        if i >= n or buf[i] != _RBRACKET:
+            return count, i, False
+        if count < capacity:
+            out[count, 0] = price
+            out[count, 1] = qty
+        count += 1
+        i = _skip_ws(buf, i + 1)
+        if i < n and buf[i] == _COMMA:
+            i = _skip_ws(buf, i + 1)
+        elif i < n and buf[i] == _RBRACKET:
+            return count, i + 1, True
+        else:
+            return count, i, False
+    return count, i, False
+
+
+@njit(cache=True)
+def _parse_depth(buf, bids, asks):
+    """
+    Scan a diff depth message (raw or combined-stream) for the keys s, U, u,
+    b and a, and write the levels into `bids`/`asks`. A key is a one-letter
+    string directly after '{' or ','. All other fields are skipped without
+    being parsed. Returns (status, n_bids, n_asks, first_id, last_id,
+    symbol_start, symbol_end).
+    """
+    n = buf.shape[0]
+    n_bids = n_asks = -1
+    first_id = last_id = -1
+    sym_start = sym_end = -1
+    prev = 0  # last non-whitespace byte outside strings we skipped
+    i = 0
+    while i < n:
+        c = buf[i]
+        if c == _QUOTE:
+            is_key = (prev == _LBRACE or prev == _COMMA) and i + 2 < n and buf[i + 2] == _QUOTE
+            key = buf[i + 1] if is_key else 0
+            if key == _KEY_S or key == _KEY_U or key == _KEY_LOWER_U or key == _KEY_B or key == _KEY_A:
+                j = _skip_ws(buf, i + 3)
+                if j >= n or buf[j] != _COLON:
+                    return MALFORMED, 0, 0, 0, 0, 0, 0
+                j = _skip_ws(buf, j + 1)
+                if key == _KEY_S:
+                    if j >= n or buf[j] != _QUOTE:
+                        return MALFORMED, 0, 0, 0, 0, 0, 0
+                    sym_start = j + 1
+                    j += 1
+                    while j < n and buf[j] != _QUOTE:
+                        j += 1
+                    sym_end = j
+                    j += 1
+                elif key == _KEY_U or key == _KEY_LOWER_U:
+                    value = 0
+                    start = j
+                    while j < n and 48 <= buf[j] <= 57:
+                        value = value * 10 + (buf[j] - 48)
+                        j += 1
+                    if j == start:
+                        return MALFORMED, 0, 0, 0, 0, 0, 0
+                    if key == _KEY_U:
+                        first_id = value
+                    else:
+                        last_id = value
+                else:
+                    if j >= n or buf[j] != _LBRACKET:
+                        return MALFORMED, 0, 0, 0, 0, 0, 0
+                    if key == _KEY_B:
+                        n_bids, j, ok = _parse_levels(buf, j, bids)
+                    else:
+                        n_asks, j, ok = _parse_levels(buf, j, asks)
+                    if not ok:
+                        return MALFORMED, 0, 0, 0, 0, 0, 0
+                prev = 0
+                i = j
+                continue
+            # Skip any other string, keys and values alike
+            i += 1
+            while i < n and buf[i] != _QUOTE:
+                if buf[i] == 92:  # backslash escape
+                    i += 1
+                i += 1
+            prev = _QUOTE
+            i += 1
+            continue
+        if c != 32 and c != 9 and c != 10 and c != 13:
+            prev = c
+        i += 1
+
+    if first_id < 0 or last_id < 0 or sym_start < 0:
+        return MALFORMED, 0, 0, 0, 0, 0, 0
+    n_bids = max(n_bids, 0)
+    n_asks = max(n_asks, 0)
+    status = OVERFLOW if n_bids > bids.shape[0] or n_asks > asks.shape[0] else OK
+    return status, n_bids, n_asks, first_id, last_id, sym_start, sym_end
+
+
+class DepthDecoder:
+    """
+    Decodes diff depth messages straight into preallocated float64 level
+    buffers, without building the intermediate dicts, lists and per-level
+    strings that `json.loads` + `np.array` would.
+
+    The returned DepthUpdate holds views of the decoder's buffers, which
+    are overwritten by the next `decode` call. Callers that keep an update
+    (the book sync buffer) must copy it. `decode` returns None for anything
+    it cannot parse, and the caller then falls back to `json.loads`.
+    """
+    def __init__(self, capacity: int = 1024):
+        self._bids = np.zeros((capacity, 2), dtype=np.float64)
+        self._asks = np.zeros((capacity, 2), dtype=np.float64)
+
+    def decode(self, message) -> Optional[DepthUpdate]:
+        raw = message.encode() if isinstance(message, str) else message
+        buf = np.frombuffer(raw, dtype=np.uint8)
+        status, n_bids, n_asks, first_id, last_id, sym_start, sym_end = _parse_depth(buf, self._bids, self._asks)
+        if status == OVERFLOW:
+            capacity = 2 * max(n_bids, n_asks)
+            self._bids = np.zeros((capacity, 2), dtype=np.float64)
+            self._asks = np.zeros((capacity, 2), dtype=np.float64)
+            status, n_bids, n_asks, first_id, last_id, sym_start, sym_end = _parse_depth(buf, self._bids, self._asks)
+        if status != OK:
+            return None
+        return DepthUpdate(first_id, last_id, self._bids[:n_bids], self._asks[:n_asks],
+                           raw[sym_start:sym_end].decode().upper())
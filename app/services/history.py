@@ -0,0 +1,174 @@
+
+
+import json
+import base64
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from app.core.db import read_engine
+from app.models.models import Price, PriceBar, TradingSignal
+from app.websocket.config import Config
+
+_EPOCH = datetime(1970, 1, 1)
+
+Key = Tuple[datetime, int]  # keyset position: (timestamp, id) of the last row read
+
+
+class Page(NamedTuple):
+    items: List[dict]
+    next_cursor: Optional[str]
+
+
+class HistoryQuery(NamedTuple):
+    """What to read: `table` is "prices" or "signals"; `resolution` (seconds) > 0 reads bars."""
+    table: str
+    symbol: Optional[str] = None
+    resolution: int = 0
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    cursor: Optional[str] = None
+    descending: bool = False
+
+    @property
+    def source(self) -> str:
+        """The table the rows come from: "prices", "price_bars" or "trading_signals"."""
+        if self.table == "signals":
+            return "trading_signals"
+        return "price_bars" if self.resolution else "prices"
+
+    @property
+    def mutable(self) -> bool:
+        """Whether newly ingested rows can still change this query's first page."""
+        return self.end is None and (self.descending or self.cursor is None)
+
+
+def encode_cursor(key: Key) -> str:
+    return base64.urlsafe_b64encode(json.dumps([key[0].isoformat(), key[1]]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Key:
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def bar_source(resolution: int, available: Iterable[int] = Config.BAR_RESOLUTIONS) -> int:
+    """The largest stored bar resolution that evenly divides `resolution`."""
+    sources = [stored for stored in available if stored > 0 and resolution % stored == 0]
+    if not sources:
+        raise ValueError(f"resolution must be a multiple of one of {sorted(available)} seconds")
+    return max(sources)
+
+
+def check_query(request: HistoryQuery) -> None:
+    """Raise ValueError for a query that cannot be served, before any row is streamed."""
+    if request.cursor is not None:
+        decode_cursor(request.cursor)
+    if request.source == "price_bars":
+        if request.symbol is None:
+            raise ValueError("symbol is required with a resolution")
+        bar_source(request.resolution)
+
+
+def _keyset(query, model, timestamp_column, request: HistoryQuery):
+    """Seek past the cursor instead of OFFSET, so every page is one index range scan."""
+    id_column = model.id
+    if request.symbol is not None:
+        query = query.where(model.symbol == request.symbol)
+    if request.start is not None:
+        query = query.where(timestamp_column >= request.start)
+    if request.end is not None:
+        query = query.where(timestamp_column < request.end)
+    if request.cursor is not None:
+        position = tuple_(timestamp_column, id_column)
+        key = decode_cursor(request.cursor)
+        query = query.where(position < key if request.descending else position > key)
+    if request.descending:
+        return query.order_by(timestamp_column.desc(), id_column.desc())
+    return query.order_by(timestamp_column, id_column)
+
+
+def _price_rows(conn, request: HistoryQuery, limit: int, chunk_size: int) -> Iterator[Tuple[dict, Key]]:
+    query = _keyset(select(Price.id, Price.timestamp, Price.symbol, Price.wap),
+                    Price, Price.timestamp, request).limit(limit)
+    for rows in _stream(conn, query, chunk_size):
+        for row_id, timestamp, symbol, wap in rows:
+            yield {"timestamp": timestamp.isoformat(), "symbol": symbol, "wap": wap}, (timestamp, row_id)
+
+
+def _signal_rows(conn, request: HistoryQuery, limit: int, chunk_size: int) -> Iterator[Tuple[dict, Key]]:
+    query = _keyset(select(TradingSignal.id, TradingSignal.timestamp, TradingSignal.symbol,
+                           TradingSignal.signal_type, TradingSignal.price, TradingSignal.details),
+                    TradingSignal, TradingSignal.timestamp, request).limit(limit)
+    for rows in _stream(conn, query, chunk_size):
+        for row_id, timestamp, symbol, signal_type, price, details in rows:
+            yield {"timestamp": timestamp.isoformat(), "symbol": symbol, "signal_type": signal_type,
+                   "price": price, "details": json.loads(details) if details else None}, (timestamp, row_id)
+
+
+def _bar_rows(conn, request: HistoryQuery, limit: int, chunk_size: int) -> Iterator[Tuple[dict, Key]]:
+    """
+    Bars at the requested resolution, merged from the stored resolution that
+    divides it. A group holds at most `factor` stored bars, so reading
+    `limit * factor` of them always completes the first `limit - 1` groups.
+    """
+    source = bar_source(request.resolution)
+    factor = request.resolution // source
+    query = _keyset(select(PriceBar.id, PriceBar.bucket_start, PriceBar.symbol, PriceBar.open, PriceBar.high,
+                           PriceBar.low, PriceBar.close, PriceBar.tick_count).where(PriceBar.resolution == source),
+                    PriceBar, PriceBar.bucket_start, request).limit(limit * factor)
+    group, group_key = [], None
+    for rows in _stream(conn, query, chunk_size):
+        for row in rows:
+            key = (row.symbol, int((row.bucket_start - _EPOCH).total_seconds()) // request.resolution)
+            if group and key != group_key:
+                yield _merge_bars(group, request), (group[-1].bucket_start, group[-1].id)
+                group = []
+            group.append(row)
+            group_key = key
+    if group:
+        yield _merge_bars(group, request), (group[-1].bucket_start, group[-1].id)
+
+
+def _merge_bars(group: list, request: HistoryQuery) -> dict:
+    if request.descending:
+        group = group[::-1]
+    first = group[0]
+    bucket = int((first.bucket_start - _EPOCH).total_seconds()) // request.resolution
+    return {
+        "timestamp": (_EPOCH + timedelta(seconds=bucket * request.resolution)).isoformat(),
+        "symbol": first.symbol,
+        "open": first.open,
+        "high": max(row.high for row in group),
+        "low": min(row.low for row in group),
+        "close": group[-1].close,
+        "ticks": sum(row.tick_count or 0 for row in group),
+    }
+
+
+def _stream(conn, query, chunk_size: int):
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+    yield from result.partitions(chunk_size)
+
+
+def iter_history(request: HistoryQuery, limit: int, bind=None,
+                 chunk_size: int = 10000) -> Iterator[Tuple[dict, Key]]:
+    """
+    Yield up to `limit + 1` (item, key) pairs in keyset order; the extra item
+    only tells whether another page follows. `key` is where the next page
+    starts if this item is the last one returned.
+    """
+    rows = {"prices": _price_rows, "price_bars": _bar_rows, "trading_signals": _signal_rows}[request.source]
+    with (bind or read_engine).connect() as conn:
+        yield from islice(rows(conn, request, limit + 1, chunk_size), limit + 1)
+
+
+def read_page(request: HistoryQuery, limit: int, bind=None) -> Page:
+    pairs = list(iter_history(request, limit, bind))
+    next_cursor = encode_cursor(pairs[limit - 1][1]) if len(pairs) > limit else None
+    return Page([item for item, _ in pairs[:limit]], next_cursor)
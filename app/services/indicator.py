@@ -1,12 +1,28 @@
 
 import numpy as np
-from numba import njit, float64, int64, optional
 
-@njit(float64[:](float64[:], int64), fastmath=True)
+from app.core.jit import NUMBA_AVAILABLE, njit
+
+if NUMBA_AVAILABLE:
+    from numba import float64, int64, optional
+    last_two_sig = float64[:](float64[:], int64)
+    wap_sig = [
+        float64(
+            float64[:, ::1],  # bids_arr: 2D C-contiguous array of float64
+            float64[:, ::1],  # asks_arr: 2D C-contiguous array of float64
+            optional(int64)  # levels: optional integer
+        )
+    ]
+else:
+    last_two_sig = wap_sig = None
+
+
+@njit(last_two_sig, fastmath=True, cache=True)
 def calculate_last_two_sma(arr: np.ndarray, window: int) -> np.ndarray:
     """
     Calculate only the last two Simple Moving Averages using Numba.
-    Pre-compiled for float64 arrays and int64 window size.
+    Compiled at import for float64 arrays and int64 window size; the
+    machine code is cached on disk, so later imports only load it.
     """
     n = len(arr)
     result = np.zeros(2, dtype=np.float64)
@@ -34,13 +50,6 @@ def calculate_sma(prices, window):
     return calculate_last_two_sma(np_prices, window)
 
 
-wap_sig = [
-    float64(
-        float64[:, ::1],  # bids_arr: 2D C-contiguous array of float64
-        float64[:, ::1],  # asks_arr: 2D C-contiguous array of float64
-        optional(int64)  # levels: optional integer
-    )
-]
 @njit(wap_sig, nopython=True, cache=True)
 def calculate_wap(bids_arr, asks_arr, levels=None):
     """
@@ -74,4 +83,50 @@ def calculate_wap(bids_arr, asks_arr, levels=None):
     if total_volume == 0:
         return 0.0
         
-    return total_value / total_volume
\ No newline at end of file
+    return total_value / total_volume
+
+
+@njit(wap_sig, cache=True)
+def calculate_depth_volume(bids_arr, asks_arr, levels=None):
+    """Total bid and ask quantity over the same levels `calculate_wap` uses."""
+    if levels is None:
+        levels = len(bids_arr)
+    total_volume = 0.0
+    for i in range(min(levels, len(bids_arr))):
+        total_volume += bids_arr[i, 1]
+    for i in range(min(levels, len(asks_arr))):
+        total_volume += asks_arr[i, 1]
+    return total_volume
+
+
+def _last_two_sma_numpy(arr, window):
+    arr = np.asarray(arr, dtype=np.float64)
+    n = len(arr)
+    result = np.zeros(2, dtype=np.float64)
+    if n < window:
+        return result
+    result[1] = arr[n - window:].sum() / window
+    result[0] = arr[n - window - 1:n - 1].sum() / window if n > window else result[1]
+    return result
+
+
+def _wap_numpy(bids_arr, asks_arr, levels=None):
+    bids = bids_arr[:levels] if levels is not None else bids_arr
+    asks = asks_arr[:levels] if levels is not None else asks_arr[:len(bids_arr)]
+    total_volume = bids[:, 1].sum() + asks[:, 1].sum()
+    if total_volume == 0:
+        return 0.0
+    return float((bids[:, 0] @ bids[:, 1] + asks[:, 0] @ asks[:, 1]) / total_volume)
+
+
+def _depth_volume_numpy(bids_arr, asks_arr, levels=None):
+    bids = bids_arr[:levels] if levels is not None else bids_arr
+    asks = asks_arr[:levels] if levels is not None else asks_arr[:len(bids_arr)]
+    return float(bids[:, 1].sum() + asks[:, 1].sum())
+
+
+if not NUMBA_AVAILABLE:
+    # The loops above would run as plain Python; vectorised NumPy is far faster
+    calculate_last_two_sma = _last_two_sma_numpy
+    calculate_wap = _wap_numpy
+    calculate_depth_volume = _depth_volume_numpy
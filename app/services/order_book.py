@@ -0,0 +1,262 @@
+
+
+import json
+import time
+import logging
+import urllib.request
+from collections import deque
+from typing import Callable, NamedTuple, Optional, Union
+
+import numpy as np
+
+from app.core.jit import njit
+from app.core.metrics import prom_book_resync_count
+from app.core.metrics_aggregator import metrics_aggregator
+from app.core.tracing import NO_TRACE
+
+logger = logging.getLogger(__name__)
+
+
+@njit(cache=True)
+def _apply_level(levels, count, price, qty, descending):
+    """
+    Insert, update or remove a single price level in a sorted ladder.
+
+    The ladder is a preallocated (capacity, 2) array of [price, qty] rows kept
+    sorted best-first; rows past `count` are always zero. The level is located
+    with a binary search and the tail is shifted in place, so no memory is
+    allocated. Returns the new number of populated rows.
+    """
+    lo = 0
+    hi = count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        p = levels[mid, 0]
+        if (p > price) if descending else (p < price):
+            lo = mid + 1
+        else:
+            hi = mid
+    found = lo < count and levels[lo, 0] == price
+
+    if qty == 0.0:
+        if not found:
+            return count
+        for i in range(lo, count - 1):
+            levels[i, 0] = levels[i + 1, 0]
+            levels[i, 1] = levels[i + 1, 1]
+        levels[count - 1, 0] = 0.0
+        levels[count - 1, 1] = 0.0
+        return count - 1
+
+    if found:
+        levels[lo, 1] = qty
+        return count
+
+    capacity = levels.shape[0]
+    if lo >= capacity:
+        # Worse than every retained level of a full ladder
+        return count
+    end = count if count < capacity else capacity - 1
+    for i in range(end, lo, -1):
+        levels[i, 0] = levels[i - 1, 0]
+        levels[i, 1] = levels[i - 1, 1]
+    levels[lo, 0] = price
+    levels[lo, 1] = qty
+    return end + 1
+
+
+@njit(cache=True)
+def _apply_levels(levels, count, updates, descending):
+    """Apply a (K, 2) array of [price, qty] updates to a sorted ladder."""
+    for i in range(updates.shape[0]):
+        count = _apply_level(levels, count, updates[i, 0], updates[i, 1], descending)
+    return count
+
+
+def _as_levels(levels) -> np.ndarray:
+    """Convert Binance [[price, qty], ...] string pairs into a (K, 2) float64 array."""
+    return np.array(levels, dtype=np.float64).reshape(-1, 2)
+
+
+class DepthUpdate(NamedTuple):
+    """A diff depth event with its levels already converted to (K, 2) float64 arrays."""
+    first_id: int
+    last_id: int
+    bids: np.ndarray
+    asks: np.ndarray
+    symbol: str = ""
+
+    @classmethod
+    def from_event(cls, event: dict) -> "DepthUpdate":
+        return cls(int(event["U"]), int(event["u"]), _as_levels(event.get("b", [])),
+                   _as_levels(event.get("a", [])), str(event.get("s", "")).upper())
+
+    def copy(self) -> "DepthUpdate":
+        """Detach the levels from any reusable decoder buffer."""
+        return self._replace(bids=self.bids.copy(), asks=self.asks.copy())
+
+
+class OrderBook:
+    """
+    Array-backed local order book for a single symbol.
+
+    `bids` (best/highest first) and `asks` (best/lowest first) are contiguous
+    (capacity, 2) float64 arrays with unused rows zeroed, so they can be handed
+    to `calculate_wap` directly without slicing or copying.
+    """
+    def __init__(self, capacity: int):
+        self.bids = np.zeros((capacity, 2), dtype=np.float64)
+        self.asks = np.zeros((capacity, 2), dtype=np.float64)
+        self.bid_count = 0
+        self.ask_count = 0
+        self.last_update_id: Optional[int] = None
+
+    def clear(self) -> None:
+        self.bids[:self.bid_count] = 0.0
+        self.asks[:self.ask_count] = 0.0
+        self.bid_count = 0
+        self.ask_count = 0
+        self.last_update_id = None
+
+    def load_snapshot(self, snapshot: dict) -> None:
+        """Replace the book contents with a REST depth snapshot."""
+        self.clear()
+        self.apply_updates(_as_levels(snapshot.get("bids", [])), _as_levels(snapshot.get("asks", [])))
+        self.last_update_id = int(snapshot["lastUpdateId"])
+
+    def apply_updates(self, bids: np.ndarray, asks: np.ndarray) -> None:
+        """Apply absolute level quantities; a quantity of zero removes the level."""
+        if len(bids):
+            self.bid_count = _apply_levels(self.bids, self.bid_count, bids, True)
+        if len(asks):
+            self.ask_count = _apply_levels(self.asks, self.ask_count, asks, False)
+
+    def is_crossed(self) -> bool:
+        return (self.bid_count > 0 and self.ask_count > 0
+                and self.bids[0, 0] >= self.asks[0, 0])
+
+
+class RestSnapshotSource:
+    """Fetches depth snapshots from the Binance REST API."""
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self) -> dict:
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+class FileSnapshotSource:
+    """Loads a depth snapshot from a local JSON fixture."""
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self) -> dict:
+        with open(self.path) as f:
+            return json.load(f)
+
+
+def snapshot_source_from_config(config, symbol: str) -> Callable[[], dict]:
+    if config.SNAPSHOT_FIXTURE:
+        return FileSnapshotSource(config.SNAPSHOT_FIXTURE.format(symbol=symbol))
+    return RestSnapshotSource(config.SNAPSHOT_URL.format(symbol=symbol))
+
+
+class OrderBookSync:
+    """
+    Keeps an OrderBook in sync with the Binance diff depth stream.
+
+    Follows the documented procedure: buffer diff events, fetch a snapshot,
+    drop events already contained in it (`u` <= lastUpdateId), start from the
+    event spanning lastUpdateId + 1, then require every following event to
+    start at the previous `u` + 1. A gap discards the book and triggers a resync.
+    """
+    def __init__(self, book: OrderBook, snapshot_source: Callable[[], dict],
+                 max_buffer: int = 1000, retry_delay: float = 1.0):
+        self.book = book
+        self.snapshot_source = snapshot_source
+        self.retry_delay = retry_delay
+        self.synced = False
+        self._buffer = deque(maxlen=max_buffer)
+        self._snapshot: Optional[dict] = None
+        self._next_snapshot_at = 0.0
+
+    def on_diff(self, event: Union[dict, DepthUpdate], trace=NO_TRACE) -> bool:
+        """
+        Feed one diff depth event, either as decoded JSON or as a DepthUpdate.
+        Returns True when the event was applied to an in-sync book.
+        """
+        if isinstance(event, dict):
+            event = DepthUpdate.from_event(event)
+            trace.mark("convert")
+        first_id, last_id = event.first_id, event.last_id
+        if not self.synced:
+            self._buffer.append(event.copy())
+            synced = self._try_sync()
+            trace.mark("sync")
+            return synced
+
+        if last_id <= self.book.last_update_id:
+            return False
+        if first_id != self.book.last_update_id + 1:
+            logger.warning("Depth stream gap: expected U=%s, got U=%s; resyncing.",
+                           self.book.last_update_id + 1, first_id)
+            metrics_aggregator.incr('data_loss_count')
+            self.resync()
+            self._buffer.append(event.copy())
+            self._try_sync()
+            trace.mark("sync")
+            return False
+        self._apply(event, trace)
+        return True
+
+    def resync(self) -> None:
+        prom_book_resync_count.inc()
+        self.synced = False
+        self.book.clear()
+        self._buffer.clear()
+        self._snapshot = None
+        self._next_snapshot_at = 0.0
+
+    def _apply(self, event: DepthUpdate, trace=NO_TRACE) -> None:
+        self.book.apply_updates(event.bids, event.asks)
+        self.book.last_update_id = event.last_id
+        trace.mark("apply")
+
+    def _try_sync(self) -> bool:
+        if self._snapshot is None:
+            now = time.monotonic()
+            if now < self._next_snapshot_at:
+                return False
+            self._next_snapshot_at = now + self.retry_delay
+            try:
+                self._snapshot = self.snapshot_source()
+            except Exception as e:
+                logger.error("Failed to fetch depth snapshot: %s", e)
+                return False
+
+        snapshot_id = int(self._snapshot["lastUpdateId"])
+        while self._buffer and self._buffer[0].last_id <= snapshot_id:
+            self._buffer.popleft()
+        if not self._buffer:
+            # Keep the snapshot until the event that bridges it arrives.
+            return False
+        if self._buffer[0].first_id > snapshot_id + 1:
+            # Snapshot is older than anything we buffered; fetch a newer one.
+            self._snapshot = None
+            return False
+
+        self.book.load_snapshot(self._snapshot)
+        self._snapshot = None
+        self.synced = True
+        events = list(self._buffer)
+        self._buffer.clear()
+        for event in events:
+            if event.first_id > self.book.last_update_id + 1:
+                logger.warning("Gap while replaying buffered depth events; resyncing.")
+                self.resync()
+                return False
+            self._apply(event)
+        logger.info("Order book synced at update id %s.", self.book.last_update_id)
+        return True
@@ -0,0 +1,318 @@
+
+
+import os
+import re
+import argparse
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, inspect, select, text
+
+from app.core.db import engine
+from app.models.models import Price
+
+logger = logging.getLogger(__name__)
+
+_PARTITION = re.compile(r"^prices_p(\d{8})$")
+
+# Catches ticks outside every daily partition (e.g. a spool replayed after an
+# outage longer than `days_ahead`), which would otherwise fail to insert
+DEFAULT_PARTITION = "prices_default"
+
+# Fresh PostgreSQL installs get `prices` as a table range-partitioned by day.
+# The primary key has to include the partition key; ids stay unique through
+# the shared sequence, which is all the ORM relies on.
+_PARTITIONED_PRICES_DDL = (
+    """
+    CREATE TABLE prices (
+        id BIGSERIAL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+        symbol VARCHAR,
+        wap DOUBLE PRECISION,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    """,
+    "CREATE INDEX ix_prices_timestamp ON prices (timestamp)",
+    "CREATE INDEX ix_prices_symbol_timestamp ON prices (symbol, timestamp)",
+)
+
+
+def partition_name(day: date) -> str:
+    return f"prices_p{day:%Y%m%d}"
+
+
+def partition_ddl(day: date) -> List[str]:
+    """
+    Statements that add the partition for `day` without blocking writers.
+    The table is created standalone with a CHECK matching the bounds, so
+    ATTACH PARTITION (SHARE UPDATE EXCLUSIVE on `prices`, which inserts do
+    not conflict with) can skip its validation scan. Rows of that day in the
+    default partition are moved into it first, as the attach would fail on
+    them; the default partition is then the only table it scans.
+    """
+    name, start, end = partition_name(day), day.isoformat(), (day + timedelta(days=1)).isoformat()
+    bounds = f"timestamp >= '{start}' AND timestamp < '{end}'"
+    return [
+        f"CREATE TABLE IF NOT EXISTS {name} (LIKE prices INCLUDING DEFAULTS)",
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds CHECK ({bounds})",
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {bounds} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE prices ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')",
+        f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds",
+    ]
+
+
+def expire_partition_ddl(name: str, server_version: Tuple[int, ...], attached: bool = True,
+                         pending: bool = False) -> List[str]:
+    """
+    Statements that detach and drop an expired partition, given its state.
+    PostgreSQL 14+ detaches CONCURRENTLY, which only briefly locks `prices`.
+    If that is cancelled (e.g. by lock_timeout) the partition is left
+    "pending detach", and only DETACH ... FINALIZE can complete it. Older
+    servers use a plain DETACH, bounded by lock_timeout like the rest. A table
+    that was detached but not dropped is just dropped.
+    """
+    if not attached:
+        detach = []
+    elif pending:
+        detach = [f"ALTER TABLE prices DETACH PARTITION {name} FINALIZE"]
+    elif server_version >= (14,):
+        detach = [f"ALTER TABLE prices DETACH PARTITION {name} CONCURRENTLY"]
+    else:
+        detach = [f"ALTER TABLE prices DETACH PARTITION {name}"]
+    return detach + [f"DROP TABLE {name}"]
+
+
+class PartitionState(NamedTuple):
+    name: str
+    attached: bool   # still a partition of `prices`
+    pending: bool    # left "pending detach" by a cancelled DETACH CONCURRENTLY
+
+
+def archive_rows(path: str, timestamps, symbols, waps) -> None:
+    """
+    Write ticks to a compressed columnar .npz file. Columns: `timestamp_us`
+    (int64), `symbol` (codes into `symbols`) and `wap` (float64).
+    """
+    names, codes = np.unique(np.array([symbol or "" for symbol in symbols], dtype=str), return_inverse=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, timestamp_us=np.array(timestamps, dtype="datetime64[us]").astype(np.int64),
+                            symbol=codes.astype(np.int32), symbols=names, wap=np.array(waps, dtype=np.float64))
+    os.replace(tmp_path, path)
+
+
+def read_archive(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {
+            "timestamp": data["timestamp_us"].astype("datetime64[us]"),
+            "symbol": data["symbols"][data["symbol"]],
+            "wap": data["wap"],
+        }
+
+
+class PriceRetention:
+    """
+    Maintenance job for the `prices` table (`retention_days=0` keeps everything).
+
+    On PostgreSQL it keeps daily partitions created `days_ahead` days in
+    advance, plus a default partition for ticks outside all of them. Days
+    found in the default partition are logged and moved into partitions of
+    their own, where they expire like any other day. Partitions older than `retention_days` are archived, detached
+    (CONCURRENTLY on PostgreSQL 14+) and dropped; see `expire_partition_ddl`
+    for how an interrupted earlier attempt is completed. Every statement runs
+    with a short `lock_timeout`, so the job gives up and retries on its next
+    run instead of queueing ahead of the tick writer. Other
+    databases have no partitions. There, expired days are archived and deleted
+    in small batches by primary key. Archives are written only when
+    `archive_dir` is set.
+    """
+    def __init__(self, bind=None, retention_days: int = 30, archive_dir: str = "",
+                 days_ahead: int = 7, batch_size: int = 10000, lock_timeout: str = "2s"):
+        self.bind = bind or engine
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.days_ahead = days_ahead
+        self.batch_size = batch_size
+        self.lock_timeout = lock_timeout
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def postgres(self) -> bool:
+        return self.bind.dialect.name == "postgresql"
+
+    def prepare(self, today: Optional[date] = None) -> None:
+        """Create the partitioned table on a fresh PostgreSQL database, then its upcoming partitions."""
+        if not self.postgres:
+            return
+        if not inspect(self.bind).has_table("prices"):
+            with self.bind.begin() as conn:
+                for statement in _PARTITIONED_PRICES_DDL:
+                    conn.execute(text(statement))
+        if self.is_partitioned():
+            with self.bind.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF prices DEFAULT"))
+            self.ensure_partitions(today)
+        else:
+            logger.info("prices is not partitioned; expired ticks will be deleted in batches.")
+
+    def is_partitioned(self) -> bool:
+        with self.bind.connect() as conn:
+            return conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('prices')")).first() is not None
+
+    def partitions(self) -> Dict[date, str]:
+        with self.bind.connect() as conn:
+            names = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass('prices')")).scalars()
+            return {datetime.strptime(match.group(1), "%Y%m%d").date(): match.group(0)
+                    for match in map(_PARTITION.match, names) if match}
+
+    def expired_partitions(self, cutoff: date) -> Dict[date, PartitionState]:
+        """
+        Daily tables older than `cutoff`: attached partitions, ones pending
+        detach, and ones a previous run detached but could not drop.
+        """
+        pending = "i.inhdetachpending" if self.bind.dialect.server_version_info >= (14,) else "false"
+        with self.bind.connect() as conn:
+            rows = conn.execute(text(
+                f"SELECT c.relname, i.inhrelid IS NOT NULL, COALESCE({pending}, false) FROM pg_class c "
+                "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = to_regclass('prices') "
+                "WHERE c.relkind = 'r' AND c.relname LIKE 'prices\\_p%' AND pg_table_is_visible(c.oid)")).fetchall()
+        states = {}
+        for name, attached, is_pending in rows:
+            match = _PARTITION.match(name)
+            if match:
+                day = datetime.strptime(match.group(1), "%Y%m%d").date()
+                if day < cutoff:
+                    states[day] = PartitionState(name, bool(attached), bool(is_pending))
+        return states
+
+    def default_partition_days(self) -> List[date]:
+        """Days with ticks in the default partition, which is normally empty."""
+        with self.bind.connect() as conn:
+            return sorted(conn.execute(text(
+                f"SELECT DISTINCT CAST(timestamp AS date) FROM {DEFAULT_PARTITION}")).scalars())
+
+    def ensure_partitions(self, today: Optional[date] = None) -> List[str]:
+        today = today or datetime.utcnow().date()
+        existing = self.partitions()
+        stray = self.default_partition_days()
+        if stray:
+            logger.warning("Ticks of %d day(s) landed in %s; moving them into daily partitions: %s",
+                           len(stray), DEFAULT_PARTITION, ", ".join(day.isoformat() for day in stray))
+        created = []
+        for day in sorted(set(stray) | {today + timedelta(days=offset) for offset in range(self.days_ahead + 1)}):
+            if day in existing:
+                continue
+            with self.bind.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+                for statement in partition_ddl(day):
+                    conn.execute(text(statement))
+            created.append(partition_name(day))
+        return created
+
+    def expire(self, today: Optional[date] = None) -> List[str]:
+        """Archive and remove every day older than the retention window; returns the days handled."""
+        if self.retention_days <= 0:
+            return []
+        today = today or datetime.utcnow().date()
+        cutoff = today - timedelta(days=self.retention_days)
+        if self.postgres and self.is_partitioned():
+            return [self._expire_partition(day, state)
+                    for day, state in sorted(self.expired_partitions(cutoff).items())]
+        return self._expire_rows(cutoff)
+
+    def run(self, today: Optional[date] = None) -> Dict[str, List[str]]:
+        summary = {"created": [], "expired": []}
+        if self.postgres and self.is_partitioned():
+            summary["created"] = self.ensure_partitions(today)
+        summary["expired"] = self.expire(today)
+        if summary["created"] or summary["expired"]:
+            logger.info("Price maintenance: created %s, expired %s.", summary["created"], summary["expired"])
+        return summary
+
+    def start(self, interval: float) -> None:
+        """Run the job every `interval` seconds in a daemon thread; failures are logged and retried."""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.run()
+                except Exception as e:
+                    logger.warning("Price maintenance failed; retrying in %ss: %s", interval, e)
+        self._thread = threading.Thread(target=loop, name="price-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _archive(self, day: date, query) -> None:
+        if not self.archive_dir:
+            return
+        with self.bind.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        if rows:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            timestamps, symbols, waps = zip(*rows)
+            archive_rows(os.path.join(self.archive_dir, f"prices_{day:%Y%m%d}.npz"), timestamps, symbols, waps)
+
+    def _expire_partition(self, day: date, state: PartitionState) -> str:
+        name = state.name
+        if state.attached and not state.pending:
+            # A retry finds the data already archived
+            self._archive(day, text(f"SELECT timestamp, symbol, wap FROM {name} ORDER BY timestamp, id"))
+        statements = expire_partition_ddl(name, self.bind.dialect.server_version_info, state.attached, state.pending)
+        # DETACH CONCURRENTLY/FINALIZE cannot run inside a transaction block
+        with self.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"SET lock_timeout = '{self.lock_timeout}'"))
+            for statement in statements:
+                conn.execute(text(statement))
+        return name
+
+    def _expire_rows(self, cutoff: date) -> List[str]:
+        cutoff_time = datetime.combine(cutoff, datetime.min.time())
+        with self.bind.connect() as conn:
+            oldest = conn.execute(select(func.min(Price.timestamp))).scalar()
+        expired = []
+        day = oldest.date() if oldest is not None else cutoff
+        while day < cutoff:
+            start = datetime.combine(day, datetime.min.time())
+            end = min(start + timedelta(days=1), cutoff_time)
+            in_day = (Price.timestamp >= start) & (Price.timestamp < end)
+            self._archive(day, select(Price.timestamp, Price.symbol, Price.wap).where(in_day)
+                          .order_by(Price.timestamp, Price.id))
+            while True:
+                # Short write transactions, so the tick writer is never blocked for long
+                with self.bind.begin() as conn:
+                    ids = select(Price.id).where(in_day).limit(self.batch_size).scalar_subquery()
+                    if conn.execute(delete(Price).where(Price.id.in_(ids))).rowcount < self.batch_size:
+                        break
+            expired.append(day.isoformat())
+            day += timedelta(days=1)
+        return expired
+
+
+def main(argv=None) -> None:
+    from app.config import PRICE_ARCHIVE_DIR, PRICE_PARTITION_DAYS_AHEAD, PRICE_RETENTION_DAYS
+    parser = argparse.ArgumentParser(description="Create upcoming price partitions and expire old ticks.")
+    parser.add_argument("--retention-days", type=int, default=PRICE_RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=PRICE_ARCHIVE_DIR, help="write expired days here as .npz")
+    parser.add_argument("--days-ahead", type=int, default=PRICE_PARTITION_DAYS_AHEAD)
+    args = parser.parse_args(argv)
+
+    job = PriceRetention(retention_days=args.retention_days, archive_dir=args.archive_dir, days_ahead=args.days_ahead)
+    job.prepare()
+    summary = job.run()
+    print(f"created: {', '.join(summary['created']) or '-'}")
+    print(f"expired: {', '.join(summary['expired']) or '-'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,49 @@
+
+
+from app.core.jit import njit
+
+# Layout of the int64 state vector: [next write position in the ring buffer,
+# number of prices pushed so far (not capped)]
+
+
+@njit(cache=True)
+def _push_price(buf, state, price, windows, sums, comps, smas, compensated):
+    """
+    Append one price to the ring buffer and update every registered window in O(1).
+
+    For each window the running sum gains the new price and loses the price
+    that falls out of the window. With `compensated` set, the update uses
+    Kahan summation so the running sums do not drift over long sessions.
+    smas[i, 0] / smas[i, 1] hold the previous / current SMA for windows[i],
+    matching `calculate_last_two_sma` on the last `len(buf)` prices.
+    """
+    capacity = buf.shape[0]
+    head = state[0]
+    count = state[1]
+    for i in range(windows.shape[0]):
+        window = windows[i]
+        delta = price
+        if count >= window:
+            delta -= buf[(head - window) % capacity]
+        if compensated:
+            y = delta - comps[i]
+            t = sums[i] + y
+            comps[i] = (t - sums[i]) - y
+            sums[i] = t
+        else:
+            sums[i] += delta
+
+        filled = min(count + 1, capacity)
+        if filled < window:
+            continue
+        sma = sums[i] / window
+        if filled == window:
+            smas[i, 0] = sma
+        else:
+            smas[i, 0] = smas[i, 1]
+        smas[i, 1] = sma
+
+    buf[head] = price
+    state[0] = (head + 1) % capacity
+    state[1] = count + 1
+
@@ -3,35 +3,118 @@
 import json
 import logging
 from datetime import datetime
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
 from app.services.database_manager import DatabaseManager
 from app.models.models import Order
+from app.services.signal_rules import CrossoverRule
+from app.services.spool import is_unavailable
 import numpy as np
-from app.core.redis_client import redis_client
+from app.core.cache import history_cache
+from app.core.live_feed import live_feed
+from app.core.metrics_aggregator import metrics_aggregator
 
 logger = logging.getLogger(__name__)
 
 class SignalProcessor:
-    """Detects and processes trading signals based on SMA crossover."""
-    def __init__(self, config, price_manager, order_state):
+    """Detects and processes trading signals based on a feature crossover (SMA by default)."""
+    def __init__(self, config, price_manager, order_state, rule=None, symbol=None, session_factory=None,
+                 spool=None):
         self.config = config
         self.price_manager = price_manager
         self.order_state = order_state
+        self.symbol = symbol or config.SYMBOLS[0]
+        self.rule = rule or CrossoverRule(config.SIGNAL_FAST, config.SIGNAL_SLOW)
+        # Context manager yielding a transactional session; replay swaps in an in-memory database
+        self.session_factory = session_factory
+        # Crossovers the database cannot take right away are spooled and replayed later
+        self.spool = spool
+        # Where committed signals are published; replay swaps in a private feed
+        self.feed = live_feed
     
+    def process_features(self, wap_price: float, features) -> None:
+        """Evaluate the configured rule against this tick's shared feature vector."""
+        fast, slow = self.rule.inputs(features)
+        self.process_signal(wap_price, fast, slow)
+
     def process_signal(self, wap_price: float, sma_short, sma_long) -> None:
-        if not self._valid_sma_values(sma_short, sma_long):
+        if not self.is_actionable(wap_price, sma_short, sma_long):
+            return
+        if self.spool_signal(wap_price, sma_short, sma_long):
+            return
+
+        session_factory = self.session_factory or DatabaseManager.get_session
+        try:
+            with session_factory() as session:
+                signal_data = self.apply_signal(session, wap_price, sma_short, sma_long)
+        except IntegrityError:
+            self.on_order_conflict()
             return
+        except Exception as e:
+            # The cache may already reflect a write that was rolled back
+            self.order_state.invalidate()
+            if self.spool_signal(wap_price, sma_short, sma_long, error=e):
+                return
+            raise
+        # Published only once the transaction has committed
+        if signal_data is not None:
+            self.on_signal_committed(signal_data)
+
+    def spool_signal(self, wap_price: float, sma_short, sma_long, error: Optional[Exception] = None) -> bool:
+        """
+        Spool an actionable crossover instead of applying it: while the spool
+        still holds earlier writes, or after `error` if that means the
+        database is unreachable. Replay decides against the orders as they are
+        then, so the cached order state is reloaded once writes go direct again.
+        """
+        if self.spool is None:
+            return False
+        signal_type = "open" if self._is_open_signal(sma_short, sma_long) else "close"
+        record = {"symbol": self.symbol, "signal_type": signal_type, "price": wap_price,
+                  "details": self._create_signal_data(signal_type, wap_price, sma_short, sma_long)}
+        if error is None:
+            if not self.spool.append_if_active("signal", record):
+                return False
+        elif is_unavailable(error):
+            logger.warning("Database unavailable, spooling %s %s signal: %s", self.symbol, signal_type, error)
+            self.spool.append("signal", record)
+        else:
+            return False
+        self.order_state.invalidate()
+        return True
+
+    def on_signal_committed(self, signal_data: dict) -> None:
+        history_cache.invalidate("trading_signals", [self.symbol])
+        self.feed.publish_signal(signal_data)
+
+    def on_order_conflict(self) -> None:
+        """Another instance opened this symbol's order first; reload the cache on the next signal."""
+        logger.info("Open order for %s already exists elsewhere; reloading order state.", self.symbol)
+        self.order_state.invalidate()
+
+    def is_actionable(self, wap_price: float, sma_short, sma_long) -> bool:
+        """Validate the inputs and report whether they form an open or close crossover."""
+        if not self._valid_sma_values(sma_short, sma_long):
+            return False
 
         if wap_price is None or wap_price <= 0 or not np.isfinite(wap_price) \
             or np.isnan(wap_price):
             logger.error("Invalid price value: %s", wap_price)
-            redis_client.incr('data_loss_count')
-            return
-        
-        with DatabaseManager.get_session() as session:
-            if self._is_open_signal(sma_short, sma_long):
-                self._handle_open_signal(session, wap_price, sma_short, sma_long)
-            elif self._is_close_signal(sma_short, sma_long):
-                self._handle_close_signal(session, wap_price, sma_short, sma_long)
+            metrics_aggregator.incr('data_loss_count')
+            return False
+
+        return self._is_open_signal(sma_short, sma_long) or self._is_close_signal(sma_short, sma_long)
+
+    def apply_signal(self, session, wap_price: float, sma_short, sma_long) -> Optional[dict]:
+        """
+        Record the crossover and open/close the order within the given session.
+        Returns the signal data, or None when no signal was recorded.
+        """
+        if self._is_open_signal(sma_short, sma_long):
+            return self._handle_open_signal(session, wap_price, sma_short, sma_long)
+        if self._is_close_signal(sma_short, sma_long):
+            return self._handle_close_signal(session, wap_price, sma_short, sma_long)
+        return None
 
     def _valid_sma_values(self, sma_short, sma_long) -> bool:
         # Expect each SMA array to have at least two values
@@ -48,46 +131,57 @@ class SignalProcessor:
     def _is_close_signal(self, sma_short, sma_long) -> bool:
         return sma_short[-1] < sma_long[-1] and sma_short[-2] >= sma_long[-2]
 
-    def _handle_open_signal(self, session, wap_price: float, sma_short: np.ndarray, sma_long: np.ndarray) -> None:
-        # Check in the shared database if an open order already exists.
-        # This query is executed within the same transaction so that concurrent attempts
-        # are serialized by the database.
-        existing_order = session.query(Order).filter(Order.status == "open").first()
-        if existing_order is not None:
+    def _sync_order_state(self, session, reload: bool = False) -> None:
+        # The one read query: only until the cache is seeded, or after a conflict
+        if reload or not self.order_state.synced:
+            open_order = session.query(Order).filter(Order.symbol == self.symbol, Order.status == "open").first()
+            self.order_state.seed(open_order.id if open_order is not None else None)
+
+    def _handle_open_signal(self, session, wap_price: float, sma_short: np.ndarray,
+                            sma_long: np.ndarray) -> Optional[dict]:
+        self._sync_order_state(session)
+        if self.order_state.current_order_id is not None:
             # An open order exists, so we do not open another one.
-            return
-        # No open order exists, so proceed to create one.
+            return None
+        # The partial unique index on open orders rejects this insert if another
+        # instance opened one since the cache was seeded (IntegrityError).
         signal_data = self._create_signal_data("open", wap_price, sma_short, sma_long)
-        DatabaseManager.save_trading_signal(session, "open", wap_price, signal_data)
-        new_order = Order(status="open", side="long", price=wap_price, details="Opened on SMA crossover")
+        DatabaseManager.save_trading_signal(session, "open", wap_price, signal_data, symbol=self.symbol)
+        new_order = Order(symbol=self.symbol, status="open", side="long", price=wap_price, details="Opened on SMA crossover")
         session.add(new_order)
         session.flush()  # flush to assign new_order.id from the DB
-        self.order_state.current_order_id = new_order.id
+        self.order_state.seed(new_order.id)
         logger.info("Signal JSON: %s", json.dumps(signal_data))
+        return signal_data
+
+    def _handle_close_signal(self, session, wap_price: float, sma_short: np.ndarray,
+                             sma_long: np.ndarray) -> Optional[dict]:
+        self._sync_order_state(session)
+        for attempt in range(2):
+            order_id = self.order_state.current_order_id
+            if order_id is None:
+                # No open order to close, avoid duplicate close actions across instances
+                return None
+            # Compare-and-set on the status: exactly one instance can close the order
+            closed = session.query(Order).filter(Order.id == order_id, Order.status == "open").update(
+                {"status": "closed", "close_price": wap_price, "closed_at": datetime.utcnow()},
+                synchronize_session=False)
+            if closed:
+                break
+            # Closed elsewhere since it was cached; another order may be open now
+            self._sync_order_state(session, reload=True)
+        else:
+            return None
 
-    def _handle_close_signal(self, session, wap_price: float, sma_short: np.ndarray, sma_long: np.ndarray) -> None:
-        # Fetch the currently open order within the same transaction to ensure atomicity
-        open_order = session.query(Order).filter(Order.status == "open").with_for_update(skip_locked=True).first()
-    
-        if open_order is None:
-            # No open order to close, avoid duplicate close actions across instances
-            print('No open order to close, avoid duplicate close actions across instances')
-            return
-    
-        # Proceed with closing the order
         signal_data = self._create_signal_data("close", wap_price, sma_short, sma_long)
-        DatabaseManager.save_trading_signal(session, "close", wap_price, signal_data)
-        
-        open_order.status = "closed"
-        open_order.close_price = wap_price
-        open_order.closed_at = datetime.utcnow()
-        
-        session.flush()  # Ensure changes are written before releasing the lock
-        self.order_state.current_order_id = None
-        logger.info("Closed order ID %s at price %s", open_order.id, wap_price)
+        DatabaseManager.save_trading_signal(session, "close", wap_price, signal_data, symbol=self.symbol)
+        self.order_state.seed(None)
+        logger.info("Closed %s order ID %s at price %s", self.symbol, order_id, wap_price)
+        return signal_data
 
     def _create_signal_data(self, signal_type: str, price: float, sma_short, sma_long) -> dict:
         return {
+            "symbol": self.symbol,
             "signal": signal_type,
             "price": price,
             "sma_short": float(sma_short[-1]),
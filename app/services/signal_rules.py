@@ -0,0 +1,27 @@
+
+
+import numpy as np
+
+
+class CrossoverRule:
+    """
+    Fires when a fast feature crosses a slow one, e.g. "sma:50" over "sma:200".
+
+    `inputs` fills preallocated [previous, current] pairs from a FeatureEngine,
+    in the layout SignalProcessor.process_signal expects.
+    """
+    def __init__(self, fast: str, slow: str):
+        self.fast = fast
+        self.slow = slow
+        self._fast = np.full(2, np.nan)
+        self._slow = np.full(2, np.nan)
+
+    @property
+    def features(self):
+        return (self.fast, self.slow)
+
+    def inputs(self, engine) -> (np.ndarray, np.ndarray):
+        fast, slow = engine.index[self.fast], engine.index[self.slow]
+        self._fast[0], self._fast[1] = engine.previous[fast], engine.current[fast]
+        self._slow[0], self._slow[1] = engine.previous[slow], engine.current[slow]
+        return self._fast, self._slow
@@ -0,0 +1,350 @@
+
+
+import os
+import json
+import zlib
+import struct
+import logging
+import threading
+from datetime import datetime
+from time import time, time_ns
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError, DisconnectionError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.cache import history_cache
+from app.core.metrics import (
+    prom_error_count, prom_spool_lag_seconds, prom_spool_replayed_count, prom_spool_size_bytes,
+    prom_spool_written_count
+)
+from app.core.metrics_aggregator import metrics_aggregator
+from app.models.models import Order
+from app.services.bars import rebuild_bars
+from app.services.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".spool"
+CHECKPOINT_SUFFIX = ".offset"
+_FRAME = struct.Struct("<II")  # payload length, CRC32 of the payload
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """Whether a failed write means the database could not be reached, rather than that it rejected the data."""
+    if isinstance(error, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError, OSError)):
+        return True
+    if isinstance(error, IntegrityError):
+        # PostgreSQL raises check_violation when no partition of `prices`
+        # accepts the row; the tick is fine and fits once maintenance adds it
+        sqlstate = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+        return sqlstate == "23514" and "no partition of relation" in str(error.orig)
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+
+class Spool:
+    """
+    Append-only write-ahead log of database writes that could not be made.
+
+    Records are length- and CRC-framed JSON appended to numbered segment
+    files, rotated at `segment_bytes`. Once a record has been spooled the
+    spool is `active`, and every later write goes to it too (through
+    `append_if_active`) until SpoolReplayer has drained it into the
+    database, so replayed rows land in the order they were produced. A
+    torn or corrupt tail, e.g. after a crash mid-write, ends a segment.
+    Segments are numbered by their creation time in microseconds, so a
+    segment name is never reused and can key its database checkpoint.
+    """
+    def __init__(self, directory: str, segment_bytes: int = 16 << 20, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[str] = None
+        segments = self.segments()
+        self._next_number = int(os.path.basename(segments[-1])[:-len(SEGMENT_SUFFIX)]) + 1 if segments else 0
+        self._size = sum(os.path.getsize(path) for path in segments)
+        self._active = bool(segments)
+        self.oldest_time: Optional[float] = None
+        if segments:
+            # Left over from the previous run; replayed before anything new reaches the database
+            first = next(self.read(segments[0], self.checkpoint(segments[0])), None)
+            self.oldest_time = first[1]["time"] if first is not None else time()
+        self._update_gauges()
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def lag(self) -> float:
+        """Seconds since the oldest record not yet replayed was spooled (0 when drained)."""
+        oldest = self.oldest_time
+        return max(0.0, time() - oldest) if oldest is not None else 0.0
+
+    def segments(self) -> List[str]:
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def append(self, kind: str, record: dict) -> None:
+        """Spool a record of the given kind ("ticks", "bars" or "signal")."""
+        with self._lock:
+            self._write(kind, record)
+
+    def append_if_active(self, kind: str, record: dict) -> bool:
+        """Spool the record only if earlier records are still pending; False means write it directly."""
+        if not self._active:
+            return False
+        with self._lock:
+            if not self._active:
+                return False
+            self._write(kind, record)
+            return True
+
+    def _write(self, kind: str, record: dict) -> None:
+        now = time()
+        payload = json.dumps({"kind": kind, "time": now, **record}, default=_encode).encode()
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._open_segment()
+        self._file.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += _FRAME.size + len(payload)
+        if not self._active:
+            self._active = True
+            self.oldest_time = now
+        prom_spool_written_count.labels(kind).inc()
+        self._update_gauges()
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        number = max(self._next_number, time_ns() // 1000)
+        self._path = os.path.join(self.directory, f"{number:020d}{SEGMENT_SUFFIX}")
+        self._next_number = number + 1
+        self._file = open(self._path, "ab")
+
+    def seal(self) -> List[str]:
+        """Close the segment being written, so new records start another one, and list the sealed segments."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file, self._path = None, None
+            return self.segments()
+
+    def finish(self) -> bool:
+        """Deactivate the spool if nothing was appended since the last `seal`; True when fully drained."""
+        with self._lock:
+            if self._file is not None or self.segments():
+                return False
+            self._active = False
+            self.oldest_time = None
+            self._update_gauges()
+            return True
+
+    @staticmethod
+    def read(path: str, offset: int = 0) -> Iterator[Tuple[int, dict]]:
+        """Yield (offset after the record, record) from `offset` up to the end or a torn/corrupt frame."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_FRAME.size)
+                if len(header) < _FRAME.size:
+                    return
+                length, crc = _FRAME.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning("Spool segment %s ends with a torn or corrupt record at byte %d", path, offset)
+                    return
+                offset += _FRAME.size + length
+                yield offset, json.loads(payload)
+
+    @staticmethod
+    def checkpoint(path: str) -> int:
+        """Offset up to which the segment has been replayed."""
+        try:
+            with open(path + CHECKPOINT_SUFFIX) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def set_checkpoint(path: str, offset: int) -> None:
+        tmp = path + CHECKPOINT_SUFFIX + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, path + CHECKPOINT_SUFFIX)
+
+    def remove(self, path: str) -> None:
+        """Delete a sealed segment once it has been replayed."""
+        size = os.path.getsize(path)
+        os.remove(path)
+        if os.path.exists(path + CHECKPOINT_SUFFIX):
+            os.remove(path + CHECKPOINT_SUFFIX)
+        with self._lock:
+            self._size -= size
+            self._update_gauges()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file, self._path = None, None
+
+    def _update_gauges(self) -> None:
+        prom_spool_size_bytes.set(self._size)
+        prom_spool_lag_seconds.set(self.lag())
+
+
+class SpoolReplayer:
+    """
+    Background thread that drains a Spool into the database, oldest segment
+    first. Consecutive tick (and bar) records are written in one bulk
+    statement of up to `batch_rows` rows; each signal is applied in its own
+    transaction against the orders as they are now, so a crossover that no
+    longer applies (the order was opened or closed elsewhere) is skipped.
+    When the database is still unreachable it waits `interval` seconds and
+    retries.
+
+    Replay is idempotent, so a crash between a write and its file checkpoint
+    does not duplicate anything: tick and signal writes save the segment's
+    checkpoint in the spool_checkpoints table in the same transaction, and
+    replay resumes from the later of the two checkpoints. Bars are rebuilt
+    from the replayed ticks and overwrite the stored ones instead of
+    merging into them.
+    """
+    def __init__(self, spool: Spool, bind=None, session_factory=None, interval: float = 1.0,
+                 batch_rows: int = 5000):
+        self.spool = spool
+        self.bind = bind
+        self.session_factory = session_factory or DatabaseManager.get_session
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            prom_spool_lag_seconds.set(self.spool.lag())
+            if self.spool.active:
+                self.drain()
+
+    def drain(self) -> bool:
+        """Replay everything spooled so far; False if the database became unreachable again."""
+        while self.spool.active and not self._stop.is_set():
+            for path in self.spool.seal():
+                try:
+                    self._replay_segment(path)
+                    # The file checkpoint is at the end now, so losing this row on a crash is harmless
+                    DatabaseManager.delete_spool_checkpoint(path, bind=self.bind)
+                except Exception as e:
+                    if not is_unavailable(e):
+                        raise
+                    logger.warning("Database still unavailable, %d spooled bytes pending: %s",
+                                   self.spool.size_bytes, e)
+                    return False
+                self.spool.remove(path)
+            if self.spool.finish():
+                logger.info("Spool drained; writing to the database directly again.")
+        return not self.spool.active
+
+    def _replay_segment(self, path: str) -> None:
+        end = max(self.spool.checkpoint(path), DatabaseManager.load_spool_checkpoint(path, bind=self.bind))
+        group, rows = [], 0
+        for offset, record in self.spool.read(path, end):
+            if group and (record["kind"] != group[0]["kind"] or record["kind"] == "signal"
+                          or rows >= self.batch_rows):
+                self._apply(group, (path, end))
+                self.spool.set_checkpoint(path, end)
+                group, rows = [], 0
+            if not group:
+                self.spool.oldest_time = record["time"]
+            group.append(record)
+            rows += len(record.get("rows", ()))
+            end = offset
+        if group:
+            self._apply(group, (path, end))
+            self.spool.set_checkpoint(path, end)
+
+    def _apply(self, group: list, checkpoint: Tuple[str, int]) -> None:
+        kind = group[0]["kind"]
+        try:
+            if kind == "ticks":
+                rows = [(datetime.fromisoformat(ts), symbol, wap) for record in group for ts, symbol, wap in record["rows"]]
+                DatabaseManager.bulk_save_price_ticks(rows, bind=self.bind, checkpoint=checkpoint)
+                history_cache.invalidate("prices", {symbol for _, symbol, _ in rows})
+            elif kind == "bars":
+                rows = [{**row, "bucket_start": datetime.fromisoformat(row["bucket_start"])}
+                        for record in group for row in record["rows"]]
+                DatabaseManager.upsert_price_bars(rebuild_bars(rows, bind=self.bind), bind=self.bind, replace=True)
+                history_cache.invalidate("price_bars", {row["symbol"] for row in rows})
+            else:
+                with self.session_factory() as session:
+                    replay_signal(session, group[0])
+                    DatabaseManager.save_spool_checkpoint(session, *checkpoint)
+                history_cache.invalidate("trading_signals", [group[0]["symbol"]])
+        except IntegrityError as e:
+            if is_unavailable(e):
+                raise
+            logger.info("Spooled %s signal for %s conflicts with an order opened elsewhere; skipped.",
+                        group[0].get("signal_type"), group[0].get("symbol"))
+        except Exception as e:
+            if is_unavailable(e):
+                raise
+            # Retrying a record the database rejects would block the spool forever
+            logger.error("Dropping %d spooled %s records the database rejected: %s", len(group), kind, e)
+            prom_error_count.inc()
+            metrics_aggregator.incr('data_loss_count', len(group))
+            return
+        prom_spool_replayed_count.labels(kind).inc(len(group))
+
+
+def replay_signal(session, record: dict) -> bool:
+    """
+    Apply a spooled crossover with its original timestamp, the way
+    SignalProcessor would have: open only if the symbol has no open order,
+    close only the one that is open. Returns whether a signal was recorded.
+    """
+    symbol, price, details = record["symbol"], record["price"], record["details"]
+    timestamp = datetime.fromisoformat(details["timestamp"])
+    open_order = session.query(Order).filter(Order.symbol == symbol, Order.status == "open").first()
+    if record["signal_type"] == "open":
+        if open_order is not None:
+            return False
+        session.add(Order(symbol=symbol, status="open", side="long", price=price,
+                          details="Opened on SMA crossover", created_at=timestamp))
+    else:
+        if open_order is None:
+            return False
+        closed = session.query(Order).filter(Order.id == open_order.id, Order.status == "open").update(
+            {"status": "closed", "close_price": price, "closed_at": timestamp}, synchronize_session=False)
+        if not closed:
+            return False
+    DatabaseManager.save_trading_signal(session, record["signal_type"], price, details, symbol=symbol,
+                                        timestamp=timestamp)
+    return True
@@ -0,0 +1,279 @@
+
+
+import math
+import numpy as np
+
+from app.core.jit import njit
+from app.services.rolling_sma import _push_price
+
+INDICATORS = {}
+
+
+def register_indicator(kind: str):
+    """Class decorator that makes an indicator available to `create_indicator`."""
+    def decorator(cls):
+        cls.kind = kind
+        INDICATORS[kind] = cls
+        return cls
+    return decorator
+
+
+def create_indicator(spec: str, compensated: bool = True):
+    """
+    Build an indicator from a spec string such as "ema:20" or "bollinger:20:2".
+    The first field selects the registered kind, the rest are its parameters.
+    `compensated` selects Kahan summation for indicators that keep running sums.
+    """
+    kind, *params = spec.split(":")
+    if kind not in INDICATORS:
+        raise ValueError(f"Unknown indicator '{kind}' in spec '{spec}'")
+    indicator = INDICATORS[kind](spec, *params)
+    indicator.compensated = compensated
+    return indicator
+
+
+@njit(cache=True)
+def _ema_update(state, price, period, out, offset):
+    # state: [value, samples]
+    alpha = 2.0 / (period + 1.0)
+    if state[1] == 0:
+        state[0] = price
+    else:
+        state[0] += alpha * (price - state[0])
+    state[1] += 1
+    out[offset] = state[0] if state[1] >= period else np.nan
+
+
+@njit(cache=True)
+def _wma_update(buf, state, price, out, offset):
+    # state: [sum, weighted_sum, samples]; weights are 1..period, newest heaviest
+    period = buf.shape[0]
+    samples = int(state[2])
+    pos = samples % period
+    if samples >= period:
+        state[1] += period * price - state[0]
+        state[0] += price - buf[pos]
+    else:
+        state[1] += (samples + 1) * price
+        state[0] += price
+    buf[pos] = price
+    state[2] = samples + 1
+    if samples + 1 >= period:
+        out[offset] = state[1] / (period * (period + 1) / 2.0)
+    else:
+        out[offset] = np.nan
+
+
+@njit(cache=True)
+def _bollinger_update(buf, state, price, width, out, offset):
+    # state: [mean, m2, samples]; sliding-window Welford keeps the variance stable
+    period = buf.shape[0]
+    samples = int(state[2])
+    pos = samples % period
+    if samples >= period:
+        old = buf[pos]
+        old_mean = state[0]
+        state[0] = old_mean + (price - old) / period
+        state[1] += (price - old) * (price - state[0] + old - old_mean)
+    else:
+        delta = price - state[0]
+        state[0] += delta / (samples + 1)
+        state[1] += delta * (price - state[0])
+    buf[pos] = price
+    state[2] = samples + 1
+    if samples + 1 >= period:
+        std = math.sqrt(max(state[1], 0.0) / period)
+        out[offset] = state[0]
+        out[offset + 1] = state[0] + width * std
+        out[offset + 2] = state[0] - width * std
+    else:
+        out[offset] = np.nan
+        out[offset + 1] = np.nan
+        out[offset + 2] = np.nan
+
+
+@njit(cache=True)
+def _rsi_update(state, price, period, out, offset):
+    # state: [previous price, average gain, average loss, changes seen]
+    changes = state[3]
+    if changes < 0:
+        state[0] = price
+        state[3] = 0
+        out[offset] = np.nan
+        return
+    change = price - state[0]
+    gain = change if change > 0 else 0.0
+    loss = -change if change < 0 else 0.0
+    state[0] = price
+    if changes < period:
+        # Simple average over the first `period` changes, then Wilder smoothing
+        state[1] += gain / period
+        state[2] += loss / period
+    else:
+        state[1] = (state[1] * (period - 1) + gain) / period
+        state[2] = (state[2] * (period - 1) + loss) / period
+    state[3] = changes + 1
+    if changes + 1 < period:
+        out[offset] = np.nan
+    elif state[2] == 0.0:
+        out[offset] = 100.0
+    else:
+        out[offset] = 100.0 - 100.0 / (1.0 + state[1] / state[2])
+
+
+@njit(cache=True)
+def _vwap_update(buf, state, price, volume, out, offset):
+    # buf rows: [price * volume, volume]; state: [value sum, volume sum, samples]
+    period = buf.shape[0]
+    samples = int(state[2])
+    pos = samples % period
+    value = price * volume
+    if samples >= period:
+        state[0] -= buf[pos, 0]
+        state[1] -= buf[pos, 1]
+    state[0] += value
+    state[1] += volume
+    buf[pos, 0] = value
+    buf[pos, 1] = volume
+    state[2] = samples + 1
+    out[offset] = state[0] / state[1] if state[1] > 0 else np.nan
+
+
+class StreamingIndicator:
+    """
+    Base class for indicators with O(1) streaming updates.
+
+    Subclasses hold their state in preallocated arrays and delegate `update`
+    to a Numba kernel that writes into the shared feature vector at `offset`.
+    Values are NaN until the indicator has seen enough samples.
+    """
+    kind = ""
+    outputs = ("",)
+    compensated = True
+    uses_volume = False
+
+    def __init__(self, spec: str):
+        self.spec = spec
+
+    @property
+    def feature_names(self):
+        return tuple(f"{self.spec}.{name}" if name else self.spec for name in self.outputs)
+
+    def update(self, price: float, volume: float, out: np.ndarray, offset: int) -> None:
+        raise NotImplementedError
+
+
+@register_indicator("sma")
+class SMAIndicator(StreamingIndicator):
+    def __init__(self, spec: str, period: str):
+        super().__init__(spec)
+        self.period = int(period)
+        self._buf = np.zeros(self.period, dtype=np.float64)
+        self._state = np.zeros(2, dtype=np.int64)
+        self._windows = np.array([self.period], dtype=np.int64)
+        self._sums = np.zeros(1, dtype=np.float64)
+        self._comps = np.zeros(1, dtype=np.float64)
+        self._smas = np.zeros((1, 2), dtype=np.float64)
+
+    def update(self, price, volume, out, offset):
+        _push_price(self._buf, self._state, price, self._windows,
+                    self._sums, self._comps, self._smas, self.compensated)
+        out[offset] = self._smas[0, 1] if self._state[1] >= self.period else np.nan
+
+
+@register_indicator("ema")
+class EMAIndicator(StreamingIndicator):
+    def __init__(self, spec: str, period: str):
+        super().__init__(spec)
+        self.period = int(period)
+        self._state = np.zeros(2, dtype=np.float64)
+
+    def update(self, price, volume, out, offset):
+        _ema_update(self._state, price, self.period, out, offset)
+
+
+@register_indicator("wma")
+class WMAIndicator(StreamingIndicator):
+    def __init__(self, spec: str, period: str):
+        super().__init__(spec)
+        self._buf = np.zeros(int(period), dtype=np.float64)
+        self._state = np.zeros(3, dtype=np.float64)
+
+    def update(self, price, volume, out, offset):
+        _wma_update(self._buf, self._state, price, out, offset)
+
+
+@register_indicator("bollinger")
+class BollingerIndicator(StreamingIndicator):
+    outputs = ("middle", "upper", "lower")
+
+    def __init__(self, spec: str, period: str, width: str = "2"):
+        super().__init__(spec)
+        self.width = float(width)
+        self._buf = np.zeros(int(period), dtype=np.float64)
+        self._state = np.zeros(3, dtype=np.float64)
+
+    def update(self, price, volume, out, offset):
+        _bollinger_update(self._buf, self._state, price, self.width, out, offset)
+
+
+@register_indicator("rsi")
+class RSIIndicator(StreamingIndicator):
+    def __init__(self, spec: str, period: str = "14"):
+        super().__init__(spec)
+        self.period = int(period)
+        self._state = np.array([0.0, 0.0, 0.0, -1.0])
+
+    def update(self, price, volume, out, offset):
+        _rsi_update(self._state, price, self.period, out, offset)
+
+
+@register_indicator("vwap")
+class VWAPIndicator(StreamingIndicator):
+    """
+    Prices weighted by the volume passed to `update`. The live pipeline has
+    no trade stream, so that is the order-book depth quantity over the WAP
+    levels (`calculate_depth_volume`), not traded volume: this is a
+    depth-weighted average price.
+    """
+    uses_volume = True
+
+    def __init__(self, spec: str, period: str):
+        super().__init__(spec)
+        self._buf = np.zeros((int(period), 2), dtype=np.float64)
+        self._state = np.zeros(3, dtype=np.float64)
+
+    def update(self, price, volume, out, offset):
+        _vwap_update(self._buf, self._state, price, volume, out, offset)
+
+
+class FeatureEngine:
+    """
+    Computes every configured indicator once per tick into a shared vector.
+
+    `current` holds the latest value of each feature and `previous` the value
+    from the tick before, so crossover-style rules can read both without the
+    indicators being recomputed per strategy. A NaN volume means it is
+    unknown (e.g. when replaying stored prices), and volume-weighted
+    indicators skip that tick rather than weighting it arbitrarily.
+    """
+    def __init__(self, specs=(), compensated: bool = True):
+        self.indicators = [create_indicator(spec, compensated) for spec in dict.fromkeys(specs)]
+        self.index = {}
+        self._offsets = []
+        for indicator in self.indicators:
+            self._offsets.append(len(self.index))
+            for name in indicator.feature_names:
+                self.index[name] = len(self.index)
+        self.current = np.full(len(self.index), np.nan)
+        self.previous = np.full(len(self.index), np.nan)
+        self._all = list(zip(self.indicators, self._offsets))
+        self._price_only = [(indicator, offset) for indicator, offset in self._all if not indicator.uses_volume]
+
+    def update(self, price: float, volume: float = 1.0) -> None:
+        np.copyto(self.previous, self.current)
+        for indicator, offset in (self._all if volume == volume else self._price_only):
+            indicator.update(price, volume, self.current, offset)
+
+    def get(self, name: str) -> float:
+        return float(self.current[self.index[name]])
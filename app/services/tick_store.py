@@ -0,0 +1,198 @@
+
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# One fixed-width record per tick. The symbol is the directory a segment lives
+# in, so records do not repeat it.
+TICK_DTYPE = np.dtype([("timestamp", "<i8"), ("wap", "<f8")])  # microseconds since the epoch (UTC), WAP
+_DATA_SUFFIX = ".ticks"
+_INDEX_SUFFIX = ".idx"
+
+TimeBound = Union[None, int, datetime, np.datetime64]
+
+
+def to_microseconds(value: TimeBound) -> Optional[int]:
+    """A naive UTC datetime (or an int already in microseconds) as epoch microseconds."""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return int(np.datetime64(value, "us").astype(np.int64))
+
+
+class _Appender:
+    """Open data and index files of a symbol's newest segment."""
+    def __init__(self, data_path: str, count: int, last: int, stride: int):
+        self.data_path = data_path
+        self.count = count
+        self.last = last
+        self.data = open(data_path, "ab", buffering=0)
+        self.index = open(data_path[:-len(_DATA_SUFFIX)] + _INDEX_SUFFIX, "ab", buffering=0)
+        self.stride = stride
+
+    def write(self, records: np.ndarray) -> None:
+        # Data before index, so an index entry never points past the data
+        self.data.write(records.tobytes())
+        first = -self.count % self.stride
+        self.index.write(np.ascontiguousarray(records["timestamp"][first::self.stride]).tobytes())
+        self.count += len(records)
+        self.last = int(records["timestamp"][-1])
+
+    def close(self) -> None:
+        self.data.close()
+        self.index.close()
+
+
+class TickStore:
+    """
+    Append-only binary store of WAP ticks, one directory per symbol.
+
+    Ticks are appended as fixed-width TICK_DTYPE records to segment files
+    named after their first timestamp; a segment is closed once it holds
+    `segment_ticks` records. Next to each segment, a sparse index keeps the
+    timestamp of every `index_stride`-th record, so a range lookup reads the
+    small index and a single block of the segment. `scan` returns read-only
+    `np.memmap` views of the records in range, without copying them.
+
+    Timestamps must not go backwards per symbol; a late tick is stored with
+    the previous timestamp. One process should write a symbol at a time, but
+    any number of readers can map the files while it appends: they only see
+    whole records, and a partial record left by a crash is cut off when the
+    symbol is reopened for writing. Readers must use the writer's
+    `index_stride`.
+    """
+    def __init__(self, root: str, segment_ticks: int = 1 << 20, index_stride: int = 1024):
+        self.root = root
+        self.segment_ticks = segment_ticks
+        self.index_stride = index_stride
+        self._appenders: Dict[str, _Appender] = {}
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def segments(self, symbol: str) -> List[Tuple[int, str]]:
+        """(first timestamp, data file path) of every segment, oldest first."""
+        directory = os.path.join(self.root, symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted((int(name[:-len(_DATA_SUFFIX)]), os.path.join(directory, name))
+                      for name in os.listdir(directory) if name.endswith(_DATA_SUFFIX))
+
+    # Writing
+
+    def append(self, symbol: str, times_us: np.ndarray, waps: np.ndarray) -> None:
+        if len(waps) == 0:
+            return
+        appender = self._appenders.get(symbol) or self._resume(symbol)
+        records = np.empty(len(waps), dtype=TICK_DTYPE)
+        records["timestamp"] = np.maximum.accumulate(np.asarray(times_us, dtype=np.int64))
+        if appender is not None:
+            np.maximum(records["timestamp"], appender.last, out=records["timestamp"])
+        records["wap"] = waps
+        while len(records):
+            if appender is None or appender.count >= self.segment_ticks:
+                appender = self._roll(symbol, int(records["timestamp"][0]))
+            room = self.segment_ticks - appender.count
+            appender.write(records[:room])
+            records = records[room:]
+
+    def append_rows(self, rows: Iterable[Tuple[datetime, Optional[str], float]]) -> None:
+        """Append tick-writer rows (timestamp, symbol, wap), possibly mixing symbols."""
+        by_symbol: Dict[str, Tuple[list, list]] = {}
+        for timestamp, symbol, wap in rows:
+            times, waps = by_symbol.setdefault(symbol or "_", ([], []))
+            times.append(timestamp)
+            waps.append(wap)
+        for symbol, (times, waps) in by_symbol.items():
+            times_us = np.array(times, dtype="datetime64[us]").astype(np.int64)
+            self.append(symbol, times_us, np.array(waps, dtype=np.float64))
+
+    def close(self) -> None:
+        for appender in self._appenders.values():
+            appender.close()
+        self._appenders.clear()
+
+    def _roll(self, symbol: str, first: int) -> _Appender:
+        previous = self._appenders.pop(symbol, None)
+        if previous is not None:
+            previous.close()
+        directory = os.path.join(self.root, symbol)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{first:020d}{_DATA_SUFFIX}")
+        appender = self._appenders[symbol] = _Appender(path, 0, first, self.index_stride)
+        return appender
+
+    def _resume(self, symbol: str) -> Optional[_Appender]:
+        """Reopen the newest segment after a restart, repairing what a crash may have left."""
+        segments = self.segments(symbol)
+        if not segments:
+            return None
+        data_path = segments[-1][1]
+        count = os.path.getsize(data_path) // TICK_DTYPE.itemsize
+        if count == 0:
+            return self._roll(symbol, segments[-1][0])
+        with open(data_path, "r+b") as f:
+            f.truncate(count * TICK_DTYPE.itemsize)
+        times = np.memmap(data_path, dtype=TICK_DTYPE, mode="r", shape=(count,))["timestamp"]
+        index = np.ascontiguousarray(times[::self.index_stride])
+        index.tofile(data_path[:-len(_DATA_SUFFIX)] + _INDEX_SUFFIX)
+        appender = self._appenders[symbol] = _Appender(data_path, count, int(times[-1]), self.index_stride)
+        return appender
+
+    # Reading
+
+    def scan(self, symbol: str, start: TimeBound = None, end: TimeBound = None) -> Iterator[np.ndarray]:
+        """
+        Yield zero-copy views of the records with start <= timestamp < end,
+        one per segment in time order. Bounds are naive UTC datetimes or
+        epoch microseconds; None leaves that side open.
+        """
+        start, end = to_microseconds(start), to_microseconds(end)
+        segments = self.segments(symbol)
+        for i, (first, data_path) in enumerate(segments):
+            if end is not None and first >= end:
+                return
+            if start is not None and i + 1 < len(segments) and segments[i + 1][0] < start:
+                continue
+            count = os.path.getsize(data_path) // TICK_DTYPE.itemsize
+            if count == 0:
+                continue
+            records = np.memmap(data_path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+            index = self._read_index(data_path, count)
+            lo = 0 if start is None else self._bound(records["timestamp"], index, start)
+            hi = count if end is None else self._bound(records["timestamp"], index, end)
+            if lo < hi:
+                yield records[lo:hi]
+
+    def read(self, symbol: str, start: TimeBound = None, end: TimeBound = None,
+             limit: Optional[int] = None) -> np.ndarray:
+        """The records in range as one array; a view when they sit in a single segment."""
+        parts, total = [], 0
+        for part in self.scan(symbol, start, end):
+            if limit is not None and total + len(part) >= limit:
+                parts.append(part[:limit - total])
+                break
+            parts.append(part)
+            total += len(part)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=TICK_DTYPE)
+
+    def _read_index(self, data_path: str, count: int) -> np.ndarray:
+        try:
+            index = np.fromfile(data_path[:-len(_DATA_SUFFIX)] + _INDEX_SUFFIX, dtype=np.int64)
+        except FileNotFoundError:
+            index = np.zeros(0, dtype=np.int64)
+        # The index may run ahead of the data if a write was cut short
+        return index[:(count + self.index_stride - 1) // self.index_stride]
+
+    def _bound(self, times: np.ndarray, index: np.ndarray, value: int) -> int:
+        """Position of the first timestamp >= value, reading one index block of `times`."""
+        i = int(np.searchsorted(index, value, "left"))
+        lo = max(i - 1, 0) * self.index_stride
+        hi = len(times) if i >= len(index) else min(i * self.index_stride + 1, len(times))
+        return lo + int(np.searchsorted(times[lo:hi], value, "left"))
@@ -0,0 +1,303 @@
+
+
+import queue
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from time import monotonic, perf_counter
+from typing import Optional
+
+from app.core.cache import history_cache
+from app.core.metrics_aggregator import metrics_aggregator
+from app.core.metrics import (
+    prom_tick_queue_depth, prom_tick_dropped_count,
+    prom_tick_batch_size, prom_tick_flush_latency, prom_error_count
+)
+from app.services.bars import BarAggregator
+from app.services.database_manager import DatabaseManager
+from app.services.spool import Spool, is_unavailable
+from app.services.tick_store import TickStore
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TickWriter:
+    """
+    Background stage that persists price ticks in bulk batches.
+
+    The websocket thread only enqueues into a bounded queue and never waits on
+    the database. A writer thread flushes whenever `batch_size` ticks are
+    pending or `flush_interval` seconds have passed since the first pending
+    tick, whichever comes first. When the queue is full new ticks are dropped
+    and counted rather than blocking the caller. With a BarAggregator, each
+    flushed batch also updates the OHLC bars, and finished bars are upserted
+    right after the ticks; bars still open are written on stop. With a
+    TickStore, each batch is appended to it as well, or only to it when
+    `save_to_db` is False. With a Spool, batches and bars the database cannot
+    take right away are spooled instead of retried or dropped, and so are all
+    later ones until the spool has been replayed.
+    """
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, bind=None, bars: Optional[BarAggregator] = None,
+                 store: Optional[TickStore] = None, save_to_db: bool = True, spool: Optional[Spool] = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.bind = bind
+        self.bars = bars
+        self.store = store
+        self.save_to_db = save_to_db
+        self.spool = spool
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="tick-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, wap_price: float, timestamp: Optional[datetime] = None, symbol: Optional[str] = None) -> bool:
+        """Enqueue a tick without blocking. Returns False if it had to be dropped."""
+        try:
+            self._queue.put_nowait((timestamp or datetime.utcnow(), symbol, wap_price))
+        except queue.Full:
+            prom_tick_dropped_count.inc()
+            metrics_aggregator.incr('data_loss_count')
+            return False
+        prom_tick_queue_depth.set(self._queue.qsize())
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Tick writer queue still full after %ss; pending ticks may be lost.", timeout)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                if self.bars is not None:
+                    self._write_bars(self.bars.drain())
+                if self.store is not None:
+                    self.store.close()
+                return
+            if item is not None:
+                if not batch:
+                    deadline = monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            self._flush(batch)
+            batch = []
+            deadline = None
+
+    def _flush(self, batch: list) -> None:
+        prom_tick_queue_depth.set(self._queue.qsize())
+        if not batch:
+            return
+        start_time = perf_counter()
+        saved = False
+        try:
+            if self.store is not None:
+                self._append_to_store(batch)
+            if self.save_to_db:
+                saved = self._write_or_spool("ticks", batch, DatabaseManager.bulk_save_price_ticks)
+        except Exception as e:
+            logger.error("Failed to flush %d price ticks: %s", len(batch), e)
+            prom_error_count.inc()
+            prom_tick_dropped_count.inc(len(batch))
+            metrics_aggregator.incr('data_loss_count', len(batch))
+            return
+        prom_tick_batch_size.observe(len(batch))
+        prom_tick_flush_latency.observe(perf_counter() - start_time)
+        if saved:
+            history_cache.invalidate("prices", {symbol for _, symbol, _ in batch})
+        if self.bars is not None:
+            self._write_bars(self.bars.add_rows(batch))
+
+    def _write_or_spool(self, kind: str, rows: list, write) -> bool:
+        """
+        Write rows to the database, or to the spool while it holds earlier
+        writes or when the database is unreachable. True if the database has them.
+        """
+        if self.spool is not None and self.spool.append_if_active(kind, {"rows": rows}):
+            return False
+        try:
+            write(rows, bind=self.bind)
+            return True
+        except Exception as e:
+            if self.spool is None or not is_unavailable(e):
+                raise
+            logger.warning("Database unavailable, spooling %d %s: %s", len(rows), kind, e)
+            self.spool.append(kind, {"rows": rows})
+            return False
+
+    def _append_to_store(self, batch: list) -> None:
+        try:
+            self.store.append_rows(batch)
+        except OSError as e:
+            # The database still gets the batch; only a store-only writer loses it
+            if not self.save_to_db:
+                raise
+            logger.error("Failed to append %d price ticks to the tick store: %s", len(batch), e)
+            prom_error_count.inc()
+
+    def _write_bars(self, bars: list) -> None:
+        if not bars:
+            return
+        try:
+            if self._write_or_spool("bars", [bar.as_row() for bar in bars], DatabaseManager.upsert_price_bars):
+                history_cache.invalidate("price_bars", {bar.symbol for bar in bars})
+        except Exception as e:
+            # The raw ticks are saved, so `python -m app.services.bars` can rebuild these
+            logger.error("Failed to upsert %d price bars: %s", len(bars), e)
+            prom_error_count.inc()
+
+
+class AsyncTickWriter:
+    """
+    asyncio counterpart of TickWriter for the async ingestion mode.
+
+    Ticks go into a bounded asyncio.Queue and a task on the same event loop
+    flushes them through the async engine with the same size/time policy.
+    """
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, bind=None, bars: Optional[BarAggregator] = None,
+                 store: Optional[TickStore] = None, save_to_db: bool = True, spool: Optional[Spool] = None):
+        if bind is None:
+            from app.core.async_db import async_engine
+            bind = async_engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.bind = bind
+        self.bars = bars
+        self.store = store
+        self.save_to_db = save_to_db
+        self.spool = spool
+        self._queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Must be called from the event loop that will run ingestion."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, wap_price: float, timestamp: Optional[datetime] = None, symbol: Optional[str] = None) -> bool:
+        try:
+            self._queue.put_nowait((timestamp or datetime.utcnow(), symbol, wap_price))
+        except asyncio.QueueFull:
+            prom_tick_dropped_count.inc()
+            metrics_aggregator.incr('data_loss_count')
+            return False
+        prom_tick_queue_depth.set(self._queue.qsize())
+        return True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(_STOP), timeout)
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error("Async tick writer did not drain within %ss; pending ticks may be lost.", timeout)
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _STOP:
+                await self._flush(batch)
+                if self.bars is not None:
+                    await self._write_bars(self.bars.drain())
+                if self.store is not None:
+                    self.store.close()
+                return
+            if item is not None:
+                if not batch:
+                    deadline = loop.time() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            await self._flush(batch)
+            batch = []
+            deadline = None
+
+    async def _flush(self, batch: list) -> None:
+        prom_tick_queue_depth.set(self._queue.qsize())
+        if not batch:
+            return
+        start_time = perf_counter()
+        saved = False
+        try:
+            if self.store is not None:
+                # Plain file appends; off the event loop all the same
+                await asyncio.get_running_loop().run_in_executor(None, self._append_to_store, batch)
+            if self.save_to_db:
+                saved = await self._write_or_spool("ticks", batch, DatabaseManager.bulk_save_price_ticks_async)
+        except Exception as e:
+            logger.error("Failed to flush %d price ticks: %s", len(batch), e)
+            prom_error_count.inc()
+            prom_tick_dropped_count.inc(len(batch))
+            metrics_aggregator.incr('data_loss_count', len(batch))
+            return
+        prom_tick_batch_size.observe(len(batch))
+        prom_tick_flush_latency.observe(perf_counter() - start_time)
+        if saved:
+            history_cache.invalidate("prices", {symbol for _, symbol, _ in batch})
+        if self.bars is not None:
+            await self._write_bars(self.bars.add_rows(batch))
+
+    _append_to_store = TickWriter._append_to_store
+
+    async def _write_or_spool(self, kind: str, rows: list, write) -> bool:
+        """Like TickWriter._write_or_spool, with the spool's file writes kept off the event loop."""
+        loop = asyncio.get_running_loop()
+        if self.spool is not None and self.spool.active and \
+                await loop.run_in_executor(None, self.spool.append_if_active, kind, {"rows": rows}):
+            return False
+        try:
+            await write(rows, bind=self.bind)
+            return True
+        except Exception as e:
+            if self.spool is None or not is_unavailable(e):
+                raise
+            logger.warning("Database unavailable, spooling %d %s: %s", len(rows), kind, e)
+            await loop.run_in_executor(None, self.spool.append, kind, {"rows": rows})
+            return False
+
+    async def _write_bars(self, bars: list) -> None:
+        if not bars:
+            return
+        try:
+            if await self._write_or_spool("bars", [bar.as_row() for bar in bars],
+                                          DatabaseManager.upsert_price_bars_async):
+                history_cache.invalidate("price_bars", {bar.symbol for bar in bars})
+        except Exception as e:
+            logger.error("Failed to upsert %d price bars: %s", len(bars), e)
+            prom_error_count.inc()
@@ -0,0 +1,100 @@
+
+
+import os
+import logging
+import zipfile
+from datetime import datetime, timedelta
+from time import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.db import SessionLocal
+from app.models.models import Order, Price
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolHistory(NamedTuple):
+    """
+    What a symbol needs to resume: recent prices (oldest first), its open
+    order, and the volume of each price where it is known (NaN or None when
+    it is not, e.g. prices loaded from the database).
+    """
+    prices: np.ndarray
+    open_order_id: Optional[int]
+    volumes: Optional[np.ndarray] = None
+
+
+def load_db_history(symbols: Iterable[str], limit: int, max_age: float = 0.0,
+                    session_factory=SessionLocal) -> Dict[str, SymbolHistory]:
+    """
+    The latest `limit` WAP ticks of every symbol, oldest first, and each
+    symbol's open order, in one query apiece rather than two per symbol.
+    Prices are ranked per symbol with ROW_NUMBER() over
+    ix_prices_symbol_timestamp; `max_age` bounds how much of it is scanned.
+    The prices table has no volumes, so they are left unknown.
+    """
+    symbols = list(symbols)
+    query = select(
+        Price.symbol, Price.wap, Price.timestamp, Price.id,
+        func.row_number().over(partition_by=Price.symbol,
+                               order_by=(Price.timestamp.desc(), Price.id.desc())).label("rank")
+    ).where(Price.symbol.in_(symbols))
+    if max_age > 0:
+        query = query.where(Price.timestamp >= datetime.utcnow() - timedelta(seconds=max_age))
+    ranked = query.subquery()
+    prices = {symbol: [] for symbol in symbols}
+    open_orders = (select(Order.symbol, func.max(Order.id))
+                   .where(Order.symbol.in_(symbols), Order.status == "open").group_by(Order.symbol))
+    with session_factory() as session:
+        rows = session.execute(select(ranked.c.symbol, ranked.c.wap).where(ranked.c.rank <= limit)
+                               .order_by(ranked.c.symbol, ranked.c.timestamp, ranked.c.id))
+        for symbol, wap in rows:
+            prices[symbol].append(wap)
+        order_ids = dict(session.execute(open_orders).all())
+    return {symbol: SymbolHistory(np.array(prices[symbol], dtype=np.float64), order_ids.get(symbol))
+            for symbol in symbols}
+
+
+def save_state_snapshot(path: str, histories: Dict[str, SymbolHistory]) -> None:
+    """
+    Write histories to a compact .npz file. The file is written under a
+    temporary name and then renamed, so a crash never leaves a partial snapshot.
+    """
+    arrays = {"saved_at": np.float64(time())}
+    for symbol, history in histories.items():
+        arrays[f"prices.{symbol}"] = history.prices
+        arrays[f"order.{symbol}"] = np.int64(-1 if history.open_order_id is None else history.open_order_id)
+        if history.volumes is not None:
+            arrays[f"volumes.{symbol}"] = history.volumes
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_state_snapshot(path: str, max_age: float = 0.0) -> Optional[Dict[str, SymbolHistory]]:
+    """Histories from a snapshot file, or None if it is missing, unreadable or older than `max_age`."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            age = time() - float(data["saved_at"])
+            if max_age > 0 and age > max_age:
+                logger.info("Ignoring state snapshot %s: %.0fs old.", path, age)
+                return None
+            histories = {}
+            for key in data.files:
+                if key.startswith("prices."):
+                    symbol = key[len("prices."):]
+                    order_id = int(data[f"order.{symbol}"])
+                    volumes = data[f"volumes.{symbol}"].astype(np.float64) \
+                        if f"volumes.{symbol}" in data.files else None
+                    histories[symbol] = SymbolHistory(data[key].astype(np.float64),
+                                                      None if order_id < 0 else order_id, volumes)
+            return histories
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        logger.warning("Could not read state snapshot %s: %s", path, e)
+        return None
@@ -0,0 +1,125 @@
+
+
+import asyncio
+import logging
+from time import perf_counter
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+
+from app.core.metrics_aggregator import metrics_aggregator
+from app.core.tracing import NO_TRACE
+from app.core.async_db import AsyncSessionLocal
+from app.core.metrics import prom_error_count
+from app.websocket.config import Config
+from app.websocket.websocket_handler import WebSocketHandler
+from app.websocket.symbol_state import SymbolState
+from app.services.tick_store import TickStore
+from app.services.tick_writer import AsyncTickWriter
+from app.services.bars import BarAggregator
+
+logger = logging.getLogger(__name__)
+
+class AsyncWebSocketHandler(WebSocketHandler):
+    """
+    Runs the same pipeline as WebSocketHandler on the asyncio event loop.
+
+    Decoding, book updates, WAP and indicator kernels run on a single worker
+    thread (so per-symbol state is never touched concurrently), while ticks
+    and signals go through the async DB engine. Counters are aggregated
+    locally and flushed to Redis off the event loop.
+    """
+    def __init__(self, config: Config):
+        super().__init__(config, tick_writer=AsyncTickWriter(
+            max_queue_size=config.TICK_QUEUE_MAX_SIZE,
+            batch_size=config.TICK_BATCH_SIZE,
+            flush_interval=config.TICK_FLUSH_INTERVAL,
+            bars=BarAggregator(config.BAR_RESOLUTIONS) if config.BAR_RESOLUTIONS else None,
+            store=TickStore(config.TICK_STORE_PATH) if config.TICK_STORE_PATH else None,
+            save_to_db=not (config.TICK_STORE_PATH and config.TICK_STORE_ONLY)
+        ), use_receive_queue=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-cpu")
+
+    async def on_message_async(self, message: str) -> None:
+        start_time = perf_counter()
+        trace = self.tracer.begin()
+        if self.recorder is not None:
+            self.recorder.record_message(message)
+        try:
+            await self._process_message_async(message, trace)
+        except Exception as e:
+            logger.error("Failed to process websocket message: %s", e)
+            metrics_aggregator.incr('error_count')
+            prom_error_count.inc()
+        finally:
+            self._update_metrics(start_time)
+            trace.mark("metrics")
+            self.tracer.finish(trace)
+        if self._state_snapshot_due(start_time):
+            # Symbol state belongs to the CPU worker, so the snapshot is taken there
+            self._executor.submit(self.save_state)
+
+    async def _process_message_async(self, message: str, trace=NO_TRACE) -> None:
+        loop = asyncio.get_running_loop()
+        state, wap_price = await loop.run_in_executor(self._executor, self._decode_and_update, message, trace)
+        if wap_price is None:
+            return
+
+        self.tick_writer.submit(wap_price, symbol=state.symbol)
+        processor = state.signal_processor
+        fast, slow = processor.rule.inputs(state.price_manager.features)
+        self.feed.publish_tick(state.symbol, wap_price, fast, slow)
+        trace.mark("tick")
+        if processor.is_actionable(wap_price, fast, slow) and \
+                not await self._spool_signal(processor, wap_price, fast, slow):
+            try:
+                async with AsyncSessionLocal.begin() as session:
+                    signal_data = await session.run_sync(processor.apply_signal, wap_price, fast, slow)
+            except IntegrityError:
+                processor.on_order_conflict()
+            except Exception as e:
+                processor.order_state.invalidate()
+                if not await self._spool_signal(processor, wap_price, fast, slow, e):
+                    raise
+            else:
+                if signal_data is not None:
+                    processor.on_signal_committed(signal_data)
+        trace.mark("signal")
+
+    async def _spool_signal(self, processor, wap_price: float, fast, slow, error: Optional[Exception] = None) -> bool:
+        if processor.spool is None or (error is None and not processor.spool.active):
+            return False
+        # Spool appends are synced to disk, so they run off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, processor.spool_signal, wap_price, fast, slow, error)
+
+    def _decode_and_update(self, message: str, trace=NO_TRACE) -> Tuple[Optional[SymbolState], Optional[float]]:
+        # Time until the executor picks the message up
+        trace.mark("dispatch")
+        state, data = self._decode(message)
+        trace.mark("decode")
+        if state is None:
+            return None, None
+        trace.symbol = state.symbol
+        return state, state.update_book(data, trace)
+
+    async def warm_start_async(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.warm_start)
+
+    async def on_error_async(self, error: Exception) -> None:
+        logger.error("WebSocket error: %s", error)
+        metrics_aggregator.incr('error_count')
+        prom_error_count.inc()
+
+    async def aclose(self) -> None:
+        """Drain the async tick writer and release the CPU worker."""
+        loop = asyncio.get_running_loop()
+        await self.tick_writer.stop()
+        await loop.run_in_executor(None, self._close_spool)
+        # The CPU worker owns the symbol states, so it writes the last snapshot before it is shut down
+        await loop.run_in_executor(self._executor, self.save_state)
+        await loop.run_in_executor(None, self._executor.shutdown, True)
+        await loop.run_in_executor(None, metrics_aggregator.stop)
+        self.tracer.close()
+        if self.recorder is not None:
+            self.recorder.close()
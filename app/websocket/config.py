@@ -1,15 +1,62 @@
 
 
 from dataclasses import dataclass
+from typing import Tuple
+from app.config import (
+    RECORD_PATH as DEFAULT_RECORD_PATH, STATE_SNAPSHOT_PATH as DEFAULT_STATE_SNAPSHOT_PATH,
+    TICK_STORE_PATH as DEFAULT_TICK_STORE_PATH, SPOOL_PATH as DEFAULT_SPOOL_PATH
+)
 
 @dataclass
 class Config:
     """Configuration settings for WebSocket ingestion."""
-    WS_URL: str = "wss://stream.binance.com:9443/ws/btcusdt@depth"
+    SYMBOLS: Tuple[str, ...] = ("BTCUSDT",) # Symbols multiplexed over one combined-stream connection
+    WS_BASE_URL: str = "wss://stream.binance.com:9443"
+    WS_URL: str = ""                 # Defaults to the combined stream for SYMBOLS
     RECONNECT_DELAY: int = 5         # Seconds to wait before reconnecting
     PING_INTERVAL: int = 20          # Ping interval for the WebSocket
     PING_TIMEOUT: int = 10           # Ping timeout
     SHORT_WINDOW: int = 50           # SMA short window length
     LONG_WINDOW: int = 200           # SMA long window length
     WAP_LEVELS: int = 5              # Number of orderbook levels for WAP calculation
-    PRICE_HISTORY_MAX_LEN: int = 201 # Maximum length of price history (deque)
+    PRICE_HISTORY_MAX_LEN: int = 201 # Maximum length of price history (ring buffer)
+    SMA_COMPENSATED: bool = True     # Kahan-compensated running sums for SMAs
+    INDICATORS: Tuple[str, ...] = () # Extra streaming indicators, e.g. "ema:20", "bollinger:20:2", "rsi:14"
+    SIGNAL_FAST: str = ""            # Fast crossover feature (defaults to "sma:<SHORT_WINDOW>")
+    SIGNAL_SLOW: str = ""            # Slow crossover feature (defaults to "sma:<LONG_WINDOW>")
+    SNAPSHOT_URL: str = "https://api.binance.com/api/v3/depth?symbol={symbol}&limit=1000"
+    SNAPSHOT_FIXTURE: str = ""       # Local depth snapshot JSON used instead of SNAPSHOT_URL ({symbol} is substituted)
+    SNAPSHOT_RETRY_DELAY: float = 1.0 # Minimum seconds between snapshot fetch attempts
+    ORDER_BOOK_CAPACITY: int = 2000  # Maximum price levels kept per book side, per symbol
+    DEPTH_BUFFER_MAX_LEN: int = 1000 # Diff events buffered while (re)syncing the book
+    RECEIVE_QUEUE_SIZE: int = 10000  # Received messages awaiting processing (0 processes inline)
+    RECEIVE_QUEUE_POLICY: str = "coalesce" # Overflow policy: "block", "drop_oldest" or "coalesce"
+    FAST_DEPTH_DECODER: bool = True  # Parse depth levels straight into float64 buffers (falls back to json.loads)
+    TICK_QUEUE_MAX_SIZE: int = 10000 # Pending price ticks before new ones are dropped
+    TICK_BATCH_SIZE: int = 500       # Price ticks per bulk insert
+    TICK_FLUSH_INTERVAL: float = 0.5 # Max seconds a tick waits before being flushed
+    BAR_RESOLUTIONS: Tuple[int, ...] = (1, 60, 3600) # OHLC bar lengths in seconds rolled up into price_bars (empty disables)
+    TICK_STORE_PATH: str = DEFAULT_TICK_STORE_PATH # Also append ticks to the memory-mapped tick store in this directory
+    TICK_STORE_ONLY: bool = False    # Write ticks to TICK_STORE_PATH instead of the prices table (bars still go to price_bars)
+    SPOOL_PATH: str = DEFAULT_SPOOL_PATH # Spool DB writes here while the database is unavailable ({symbols} is substituted; "" disables)
+    SPOOL_SEGMENT_BYTES: int = 16 << 20 # Spool segment file size before rotating
+    SPOOL_REPLAY_INTERVAL: float = 1.0 # Seconds between attempts to replay the spool into the database
+    TRACE_SAMPLE_RATE: float = 0.0  # Fraction of messages written to TRACE_PATH as span timelines
+    TRACE_PATH: str = ""             # JSON-lines file for sampled traces ({symbols} is substituted)
+    SLOW_MESSAGE_THRESHOLD: float = 0.05 # Log the stage breakdown of messages slower than this many seconds (0 disables)
+    RECORD_PATH: str = DEFAULT_RECORD_PATH # Append raw messages and snapshots to this gzip file ({symbols} is substituted)
+    WARM_START: bool = True          # Rehydrate price history and open orders on startup
+    WARM_START_MAX_AGE: float = 300.0 # Ignore saved history older than this many seconds (0 keeps any age)
+    STATE_SNAPSHOT_PATH: str = DEFAULT_STATE_SNAPSHOT_PATH # Price history snapshot file ({symbols} is substituted); the prices table is used without it
+    STATE_SNAPSHOT_INTERVAL: float = 60.0 # Seconds between state snapshots (one is also written on close)
+
+    def __post_init__(self):
+        self.SYMBOLS = tuple(symbol.upper() for symbol in self.SYMBOLS)
+        if not self.WS_URL:
+            streams = "/".join(f"{symbol.lower()}@depth" for symbol in self.SYMBOLS)
+            self.WS_URL = f"{self.WS_BASE_URL}/stream?streams={streams}"
+        self.SIGNAL_FAST = self.SIGNAL_FAST or f"sma:{self.SHORT_WINDOW}"
+        self.SIGNAL_SLOW = self.SIGNAL_SLOW or f"sma:{self.LONG_WINDOW}"
+        # Make sure the indicators behind the signal features are computed
+        rule_specs = (name.split(".")[0] for name in (self.SIGNAL_FAST, self.SIGNAL_SLOW))
+        self.INDICATORS = tuple(dict.fromkeys((*self.INDICATORS, *rule_specs)))
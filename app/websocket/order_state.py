@@ -4,17 +4,40 @@ from threading import Lock
 from typing import Optional
 
 class OrderState:
-    """Thread-safe management of the current order ID."""
+    """
+    Thread-safe cache of the symbol's open order ID.
+
+    The signal processor seeds it from the database once (`synced` is False
+    until then) and writes it through after every successful open or close,
+    so crossovers need no read queries. `invalidate()` makes the next signal
+    reload it, e.g. after another instance won a conflicting write.
+    """
     def __init__(self):
         self._current_order_id: Optional[int] = None
+        self._synced = False
         self._lock = Lock()
-    
+
     @property
     def current_order_id(self) -> Optional[int]:
         with self._lock:
             return self._current_order_id
-    
+
     @current_order_id.setter
     def current_order_id(self, value: Optional[int]):
         with self._lock:
             self._current_order_id = value
+
+    @property
+    def synced(self) -> bool:
+        with self._lock:
+            return self._synced
+
+    def seed(self, order_id: Optional[int]) -> None:
+        """Record the open order as just read from (or written to) the database."""
+        with self._lock:
+            self._current_order_id = order_id
+            self._synced = True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._synced = False
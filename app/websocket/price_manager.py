@@ -1,29 +1,60 @@
 
 
-from collections import deque
 import numpy as np
-from app.services.indicator import calculate_sma
+from app.services.streaming_indicators import FeatureEngine
 import logging
-from app.core.redis_client import redis_client
+from app.core.metrics_aggregator import metrics_aggregator
 
 
 logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of floats: the newest `capacity` values, pushed in O(1) without allocating."""
+    def __init__(self, capacity: int):
+        self._buf = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # next write position
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, value: float) -> None:
+        self._buf[self._head] = value
+        self._head = (self._head + 1) % len(self._buf)
+        self._count = min(self._count + 1, len(self._buf))
+
+    def values(self) -> np.ndarray:
+        """Return a chronological copy of the retained values."""
+        if self._count < len(self._buf):
+            return self._buf[:self._count].copy()
+        return np.concatenate((self._buf[self._head:], self._buf[:self._head]))
+
+
 class PriceManager:
-    """Maintains a history of price values and computes SMAs."""
-    def __init__(self, max_len: int):
-        self.price_history = deque(maxlen=max_len)
+    """Maintains a history of price values and computes the streaming indicators."""
+    def __init__(self, max_len: int, compensated: bool = True, indicators=()):
+        # The history is only kept for warm-start snapshots; indicators come from the feature engine
+        self.prices = RingBuffer(max_len)
+        self.volumes = RingBuffer(max_len)
+        self.features = FeatureEngine(indicators, compensated=compensated)
     
-    def add_price(self, price: float) -> None:
+    @property
+    def price_history(self) -> np.ndarray:
+        # Chronological copy of the retained prices
+        return self.prices.values()
+
+    @property
+    def volume_history(self) -> np.ndarray:
+        # The volume of each retained price, NaN where it was unknown
+        return self.volumes.values()
+    
+    def add_price(self, price: float, volume: float = 1.0) -> None:
         if price is None or price <= 0 or not np.isfinite(price) \
             or np.isnan(price):
             logger.error("Invalid price value: %s", price)
-            redis_client.incr('data_loss_count')
+            metrics_aggregator.incr('data_loss_count')
             return
-        self.price_history.append(price)
-    
-    def calculate_smas(self, short_window: int, long_window: int) -> (np.ndarray, np.ndarray):
-        # Returns tuple: (sma_short, sma_long)
-        return (
-            calculate_sma(self.price_history, short_window),
-            calculate_sma(self.price_history, long_window)
-        )
+        self.prices.push(price)
+        self.volumes.push(volume)
+        self.features.update(price, volume)
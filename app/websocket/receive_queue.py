@@ -0,0 +1,132 @@
+
+
+import re
+import json
+import threading
+from collections import deque
+from time import perf_counter
+from typing import Optional, Tuple, Union
+
+from app.core.metrics import (
+    prom_receive_queue_depth, prom_receive_queue_wait,
+    prom_receive_dropped_count, prom_receive_coalesced_count
+)
+
+POLICIES = ("block", "drop_oldest", "coalesce")
+
+# Depth events carry the symbol as "s"; extracting it with a regex avoids a
+# full JSON decode on the receive thread.
+_SYMBOL_RE = re.compile(r'"s"\s*:\s*"([^"]+)"')
+
+
+def merge_depth_events(older: dict, newer: dict) -> dict:
+    """
+    Coalesce two consecutive diff depth events for the same symbol.
+    Level quantities are absolute, so keeping the newest quantity per price
+    level and spanning U..u of both events is equivalent to applying them in turn.
+    """
+    older_data, newer_data = older.get("data", older), newer.get("data", newer)
+    merged = dict(newer_data)
+    merged["U"] = older_data["U"]
+    for side in ("b", "a"):
+        levels = {price: qty for price, qty in older_data.get(side, [])}
+        levels.update((price, qty) for price, qty in newer_data.get(side, []))
+        merged[side] = [[price, qty] for price, qty in levels.items()]
+    if "data" in newer:
+        return {**newer, "data": merged}
+    return merged
+
+
+class ReceiveQueue:
+    """
+    Bounded hand-off between the websocket receive callback and the processing worker.
+
+    Overflow policies:
+      - "block": the receive thread waits for space (no data loss, reads stall).
+      - "drop_oldest": the oldest pending message is discarded.
+      - "coalesce": the new event is merged into the newest pending event of the
+        same symbol, so the book stays consistent while the backlog stays bounded.
+        Falls back to dropping the oldest message when that symbol has nothing pending.
+        The new event is decoded before taking the lock and merged into the
+        pending event's later updates; the pending event itself is decoded
+        and merged with them by `get`, outside the lock.
+    Dropping a diff event creates a sequence gap, which makes that book resync.
+    """
+    def __init__(self, maxsize: int = 10000, policy: str = "coalesce"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown receive queue policy '{policy}'; expected one of {POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = deque()
+        self._latest = {}  # symbol -> newest pending item, for "coalesce"
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, message: Union[str, dict]) -> None:
+        symbol = None
+        if self.policy == "coalesce" and isinstance(message, str):
+            match = _SYMBOL_RE.search(message)
+            symbol = match.group(1) if match else None
+        # [enqueued at, message, symbol, later events of the symbol merged into one dict]
+        item = [perf_counter(), message, symbol, None]
+        update = None
+        if symbol is not None and len(self._items) >= self.maxsize:
+            update = json.loads(message)
+
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._not_full.wait()
+                elif self.policy == "coalesce" and symbol in self._latest:
+                    # Rarely the queue only filled up after the check above
+                    self._coalesce(self._latest[symbol], update if update is not None else json.loads(message))
+                    return
+                else:
+                    self._forget(self._items.popleft())
+                    prom_receive_dropped_count.inc()
+            self._items.append(item)
+            if symbol is not None:
+                self._latest[symbol] = item
+            prom_receive_queue_depth.set(len(self._items))
+            self._not_empty.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Union[str, dict], float]]:
+        """
+        Return (message, seconds spent queued), or None on timeout or once
+        the queue is closed and drained.
+        """
+        with self._lock:
+            if not self._items and not self._closed:
+                self._not_empty.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._forget(item)
+            prom_receive_queue_depth.set(len(self._items))
+            self._not_full.notify()
+        message = item[1]
+        if item[3] is not None:
+            message = merge_depth_events(json.loads(message), item[3])
+        wait = perf_counter() - item[0]
+        prom_receive_queue_wait.observe(wait)
+        return message, wait
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def _forget(self, item: list) -> None:
+        if item[2] is not None and self._latest.get(item[2]) is item:
+            del self._latest[item[2]]
+
+    def _coalesce(self, item: list, update: dict) -> None:
+        item[3] = update if item[3] is None else merge_depth_events(item[3], update)
+        prom_receive_coalesced_count.inc()
@@ -0,0 +1,73 @@
+
+
+import gzip
+import json
+import logging
+import threading
+from time import time
+from typing import Callable, Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Record kinds; a record is one "<kind>\t<symbol>\t<received_at>\t<payload>" line
+MESSAGE = "m"
+SNAPSHOT = "s"
+
+
+class Record(NamedTuple):
+    kind: str
+    symbol: str
+    received_at: float
+    payload: str
+
+
+class DepthRecorder:
+    """
+    Appends raw websocket messages and the depth snapshots used to sync each
+    book to a gzip file, so a session can be replayed offline.
+
+    Messages are stored exactly as received. The file is append-only: every
+    session adds a new gzip member, which `read_recording` reads back as one
+    stream. A file cut short by a crash is readable up to the truncated tail.
+    """
+    def __init__(self, path: str, compresslevel: int = 6):
+        self.path = path
+        self._file = gzip.open(path, "at", encoding="utf-8", compresslevel=compresslevel)
+        self._lock = threading.Lock()
+
+    def record_message(self, message: str) -> None:
+        self._write(MESSAGE, "", message)
+
+    def record_snapshot(self, symbol: str, snapshot: dict) -> None:
+        self._write(SNAPSHOT, symbol, json.dumps(snapshot, separators=(",", ":")))
+
+    def wrap_snapshot_source(self, symbol: str, source: Callable[[], dict]) -> Callable[[], dict]:
+        """Return a snapshot source that records every snapshot it fetches."""
+        def fetch() -> dict:
+            snapshot = source()
+            self.record_snapshot(symbol, snapshot)
+            return snapshot
+        return fetch
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _write(self, kind: str, symbol: str, payload: str) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(f"{kind}\t{symbol}\t{time():.6f}\t{payload}\n")
+
+
+def read_recording(path: str) -> Iterator[Record]:
+    """Yield the records of a recording in the order they were written."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partially written last record
+                kind, symbol, received_at, payload = line[:-1].split("\t", 3)
+                yield Record(kind, symbol, float(received_at), payload)
+        except EOFError:
+            logger.warning("Recording %s ends with a truncated gzip member; stopping there.", path)
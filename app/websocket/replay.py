@@ -0,0 +1,184 @@
+
+
+import sys
+import json
+import argparse
+import dataclasses
+import logging
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base
+from app.core.live_feed import LiveFeed
+from app.core.metrics_aggregator import metrics_aggregator
+from app.models.models import TradingSignal
+from app.websocket.config import Config
+from app.websocket.recorder import MESSAGE, SNAPSHOT, read_recording
+from app.websocket.websocket_handler import WebSocketHandler
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingReader:
+    """
+    Iterates over the messages of a recording and serves its depth snapshots.
+
+    A snapshot is recorded when it is fetched, which is after the message that
+    triggered the fetch. When a book asks for a snapshot that has not been read
+    yet, the reader scans ahead for it and keeps the skipped messages, so the
+    book syncs on the same event as in the live session.
+    """
+    def __init__(self, path: str):
+        self._records = read_recording(path)
+        self._messages = deque()
+        self._snapshots: Dict[str, deque] = defaultdict(deque)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while not self._messages:
+            self._read(next(self._records))
+        return self._messages.popleft()
+
+    def source_for(self, symbol: str, fallback: Optional[Callable[[], dict]] = None) -> Callable[[], dict]:
+        def fetch() -> dict:
+            pending = self._snapshots[symbol]
+            while not pending:
+                record = next(self._records, None)
+                if record is None:
+                    break
+                self._read(record)
+            if pending:
+                return pending.popleft()
+            if fallback is not None:
+                return fallback()
+            raise LookupError(f"Recording has no further depth snapshot for {symbol}")
+        return fetch
+
+    def _read(self, record) -> None:
+        if record.kind == MESSAGE:
+            self._messages.append(record.payload)
+        elif record.kind == SNAPSHOT:
+            self._snapshots[record.symbol].append(json.loads(record.payload))
+
+
+class MemorySink:
+    """
+    Stands in for the database during replay. Price ticks are kept in a list;
+    orders and trading signals go to a private in-memory SQLite database so the
+    signal processor runs its usual queries unchanged.
+    """
+    def __init__(self):
+        self.ticks = []
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self._sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    # Tick writer interface
+    def start(self) -> None:
+        pass
+
+    def submit(self, wap_price: float, timestamp=None, symbol: Optional[str] = None) -> bool:
+        self.ticks.append((symbol, wap_price))
+        return True
+
+    def stop(self, timeout: float = None) -> None:
+        pass
+
+    @contextmanager
+    def session(self):
+        session = self._sessions()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def signals(self) -> List[dict]:
+        with self.session() as session:
+            rows = session.query(TradingSignal).order_by(TradingSignal.id).all()
+            return [json.loads(row.details) for row in rows]
+
+
+@dataclass
+class ReplayResult:
+    messages: int
+    seconds: float
+    ticks: int
+    signals: List[dict] = field(default_factory=list)
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds > 0 else 0.0
+
+
+class ReplayEngine:
+    """
+    Feeds a recording through the same pipeline as live ingestion
+    (WebSocketHandler -> order book -> indicators -> signal processor),
+    as fast as possible and without network access. Redis counters are
+    discarded and ticks and signals go to a private live feed with no
+    subscribers or Redis bridge, so a replay never shows up in the live
+    metrics or in the live stream.
+    """
+    def __init__(self, config: Config, path: str):
+        # Snapshots come from the recording, so a failed fetch can be retried immediately
+        self.config = dataclasses.replace(config, SNAPSHOT_RETRY_DELAY=0.0, RECEIVE_QUEUE_SIZE=0, RECORD_PATH="",
+                                          WARM_START=False, STATE_SNAPSHOT_PATH="", SPOOL_PATH="")
+        self.path = path
+
+    def run(self, limit: Optional[int] = None, sink: Optional[MemorySink] = None) -> ReplayResult:
+        sink = sink or MemorySink()
+        reader = RecordingReader(self.path)
+        messages = 0
+        with metrics_aggregator.detached():
+            handler = WebSocketHandler(self.config, tick_writer=sink, use_receive_queue=False, feed=LiveFeed())
+            for state in handler.symbols.values():
+                fallback = state.book_sync.snapshot_source if self.config.SNAPSHOT_FIXTURE else None
+                state.book_sync.snapshot_source = reader.source_for(state.symbol, fallback)
+                state.signal_processor.session_factory = sink.session
+            try:
+                start_time = perf_counter()
+                for message in reader:
+                    handler.handle_message(message)
+                    messages += 1
+                    if limit is not None and messages >= limit:
+                        break
+                seconds = perf_counter() - start_time
+            finally:
+                handler.close()
+        return ReplayResult(messages, seconds, len(sink.ticks), sink.signals())
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded depth stream through the ingestion pipeline.")
+    parser.add_argument("recording", help="gzip recording written with RECORD_PATH")
+    parser.add_argument("--symbols", nargs="+", default=list(Config.SYMBOLS), help="symbols to process")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many messages")
+    parser.add_argument("--signals", action="store_true", help="print every signal as a JSON line")
+    args = parser.parse_args(argv)
+
+    result = ReplayEngine(Config(SYMBOLS=tuple(args.symbols)), args.recording).run(limit=args.limit)
+    print(f"messages: {result.messages}")
+    print(f"seconds: {result.seconds:.3f}")
+    print(f"messages/sec: {result.messages_per_second:,.0f}")
+    print(f"ticks: {result.ticks}")
+    print(f"signals: {len(result.signals)}")
+    if args.signals:
+        for signal in result.signals:
+            sys.stdout.write(json.dumps(signal) + "\n")
+
+
+if __name__ == "__main__":
+    main()
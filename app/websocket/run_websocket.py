@@ -1,29 +1,44 @@
 
 
-import time
+import threading
 import websocket
 from app.websocket.config import Config
 from app.websocket.websocket_handler import WebSocketHandler
 
-def run_websocket():
+_stop_event = threading.Event()
+_ws_app = None
+
+def run_websocket(config: Config = None, handler: WebSocketHandler = None):
     """Main entry point for running the WebSocket client."""
-    config = Config()
-    handler = WebSocketHandler(config)
+    global _ws_app
+    config = config or Config()
+    handler = handler or WebSocketHandler(config)
     
-    while True:
-        try:
-            ws_app = websocket.WebSocketApp(
-                config.WS_URL,
-                on_message=handler.on_message,
-                on_error=handler.on_error,
-                on_close=handler.on_close
-            )
-            ws_app.on_open = handler.on_open
-            ws_app.run_forever(
-                ping_interval=config.PING_INTERVAL,
-                ping_timeout=config.PING_TIMEOUT
-            )
-        except Exception as e:
-            print(f"WebSocket connection error: {e}")
-        time.sleep(config.RECONNECT_DELAY)
-        print("Attempting to reconnect to WebSocket...")
+    try:
+        handler.warm_start()
+        while not _stop_event.is_set():
+            try:
+                _ws_app = websocket.WebSocketApp(
+                    config.WS_URL,
+                    on_message=handler.on_message,
+                    on_error=handler.on_error,
+                    on_close=handler.on_close
+                )
+                _ws_app.on_open = handler.on_open
+                _ws_app.run_forever(
+                    ping_interval=config.PING_INTERVAL,
+                    ping_timeout=config.PING_TIMEOUT
+                )
+            except Exception as e:
+                print(f"WebSocket connection error: {e}")
+            if _stop_event.wait(config.RECONNECT_DELAY):
+                break
+            print("Attempting to reconnect to WebSocket...")
+    finally:
+        handler.close()
+
+def stop_websocket():
+    """Ask the ingestion loop to exit; pending ticks are flushed by the handler."""
+    _stop_event.set()
+    if _ws_app is not None:
+        _ws_app.close()
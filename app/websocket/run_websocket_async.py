@@ -0,0 +1,36 @@
+
+
+import asyncio
+import logging
+import websockets
+from app.websocket.config import Config
+from app.websocket.async_websocket_handler import AsyncWebSocketHandler
+
+logger = logging.getLogger(__name__)
+
+async def run_websocket_async():
+    """asyncio entry point for the WebSocket client; runs until cancelled."""
+    config = Config()
+    handler = AsyncWebSocketHandler(config)
+
+    try:
+        await handler.warm_start_async()
+        while True:
+            try:
+                async with websockets.connect(
+                    config.WS_URL,
+                    ping_interval=config.PING_INTERVAL,
+                    ping_timeout=config.PING_TIMEOUT
+                ) as ws:
+                    handler.on_open(ws)
+                    async for message in ws:
+                        await handler.on_message_async(message)
+                handler.on_close(ws, ws.close_code, ws.close_reason)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await handler.on_error_async(e)
+            await asyncio.sleep(config.RECONNECT_DELAY)
+            logger.info("Attempting to reconnect to WebSocket...")
+    finally:
+        await handler.aclose()
@@ -0,0 +1,175 @@
+
+
+import zlib
+import queue
+import dataclasses
+import logging
+import threading
+import multiprocessing
+import multiprocessing.synchronize
+from time import monotonic
+from typing import Dict, List, Optional, Sequence
+
+from app.core.metrics import registry, metrics_view
+from app.websocket.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Below this many symbols per worker, hashing leaves some workers idle and
+# others with several symbols, so symbols are dealt out round-robin instead
+ROUND_ROBIN_BELOW = 4
+
+def shard_symbols(symbols: Sequence[str], workers: int) -> List[List[str]]:
+    """
+    Assign symbols to workers by a stable hash (CRC32), so a symbol lands on
+    the same worker across restarts. With only a few symbols per worker they
+    are dealt round-robin in sorted order, which is just as stable for a given
+    symbol list and keeps the shards even. Empty shards are dropped.
+    """
+    shards = [[] for _ in range(max(1, workers))]
+    if len(symbols) < len(shards) * ROUND_ROBIN_BELOW:
+        for index, symbol in enumerate(sorted(symbols, key=str.upper)):
+            shards[index % len(shards)].append(symbol)
+    else:
+        for symbol in symbols:
+            shards[zlib.crc32(symbol.upper().encode()) % len(shards)].append(symbol)
+    return [shard for shard in shards if shard]
+
+
+def _worker_main(worker_id: str, config: Config, metrics_queue, stop_event, report_interval: float) -> None:
+    """Entry point of a worker process: ingests its symbols and reports metrics."""
+    # Spawned processes start with an unconfigured root logger
+    logging.basicConfig(level=logging.INFO)
+    from app.core.warmup import warmup_kernels
+    from app.websocket.run_websocket import run_websocket, stop_websocket
+
+    def report_metrics():
+        while not stop_event.wait(report_interval):
+            try:
+                metrics_queue.put_nowait((worker_id, list(registry.collect())))
+            except queue.Full:
+                pass
+
+    def watch_stop():
+        stop_event.wait()
+        stop_websocket()
+
+    threading.Thread(target=report_metrics, name="metrics-reporter", daemon=True).start()
+    threading.Thread(target=watch_stop, name="stop-watcher", daemon=True).start()
+    warmup_kernels()
+    logger.info("Ingestion worker %s started for %s.", worker_id, ", ".join(config.SYMBOLS))
+    run_websocket(config)
+
+
+class IngestionSupervisor:
+    """
+    Runs ingestion in N worker processes, each owning its own connection,
+    order books and indicator state for a hash-assigned subset of symbols.
+    Workers push periodic metric snapshots that are merged into /prometheus.
+
+    A worker that dies is restarted after `restart_delay` seconds, doubling
+    with each consecutive failure up to `max_restart_delay`. A worker that
+    ran for `stable_after` seconds starts over at the shortest delay. After
+    `max_restarts` failures in a row (e.g. a bad config or an import error
+    at startup) it is given up on, with a critical log, instead of being
+    respawned forever; `failed` lists those workers.
+    """
+    def __init__(self, config: Config, workers: int, report_interval: float = 5.0, restart_delay: float = 1.0,
+                 max_restart_delay: float = 60.0, max_restarts: int = 5, stable_after: float = 60.0,
+                 target=_worker_main):
+        self.config = config
+        self.report_interval = report_interval
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.max_restarts = max_restarts
+        self.stable_after = stable_after
+        self.shards = shard_symbols(config.SYMBOLS, min(workers, len(config.SYMBOLS)))
+        self.failed: List[str] = []
+        self._target = target
+        self._ctx = multiprocessing.get_context("spawn")
+        self._metrics_queue = self._ctx.Queue(maxsize=1000)
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._stop_events: Dict[str, multiprocessing.synchronize.Event] = {}
+        self._started_at: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._restart_at: Dict[str, float] = {}
+        self._monitor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        for index, symbols in enumerate(self.shards):
+            logger.info("Ingestion worker %d: %s", index, ", ".join(symbols))
+            self._spawn(str(index), symbols)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="ingestion-supervisor", daemon=True)
+        self._monitor.start()
+
+    def stop(self, timeout: float = 15.0) -> None:
+        self._stopping.set()
+        for worker_id, stop_event in self._stop_events.items():
+            if self._processes[worker_id].is_alive():
+                stop_event.set()
+        for worker_id, process in self._processes.items():
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning("Worker %s did not exit in %ss; terminating.", worker_id, timeout)
+                process.terminate()
+            metrics_view.remove_worker(worker_id)
+        if self._monitor is not None:
+            self._monitor.join(timeout)
+
+    def _spawn(self, worker_id: str, symbols: List[str]) -> None:
+        # WS_URL is cleared so each worker derives its own combined-stream URL
+        worker_config = dataclasses.replace(self.config, SYMBOLS=tuple(symbols), WS_URL="")
+        # Each worker gets a fresh stop event: a worker killed while waiting on
+        # an event leaves it with a sleeper that never wakes, and set() on it
+        # would then block forever
+        stop_event = self._ctx.Event()
+        process = self._ctx.Process(
+            target=self._target,
+            args=(worker_id, worker_config, self._metrics_queue, stop_event, self.report_interval),
+            name=f"ingestion-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._stop_events[worker_id] = stop_event
+        self._started_at[worker_id] = monotonic()
+
+    def _monitor_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                worker_id, families = self._metrics_queue.get(timeout=1.0)
+                metrics_view.update_worker(worker_id, families)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error("Failed to read worker metrics: %s", e)
+
+            for index, symbols in enumerate(self.shards):
+                if not self._stopping.is_set():
+                    self._check_worker(str(index), symbols)
+
+    def _check_worker(self, worker_id: str, symbols: List[str]) -> None:
+        """Schedule a dead worker's restart with backoff, and spawn it once the delay has passed."""
+        if worker_id in self.failed or self._processes[worker_id].is_alive():
+            return
+        now = monotonic()
+        restart_at = self._restart_at.get(worker_id)
+        if restart_at is None:
+            if now - self._started_at[worker_id] >= self.stable_after:
+                self._failures[worker_id] = 0
+            failures = self._failures[worker_id] = self._failures.get(worker_id, 0) + 1
+            exitcode = self._processes[worker_id].exitcode
+            if failures > self.max_restarts:
+                logger.critical("Ingestion worker %s (%s) exited (code %s) after %d restarts in a row; "
+                                "giving up on it.", worker_id, ", ".join(symbols), exitcode, self.max_restarts)
+                self.failed.append(worker_id)
+                metrics_view.remove_worker(worker_id)
+                return
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** (failures - 1))
+            logger.error("Ingestion worker %s exited (code %s); restarting in %.1fs (attempt %d of %d).",
+                         worker_id, exitcode, delay, failures, self.max_restarts)
+            self._restart_at[worker_id] = restart_at = now + delay
+        if now >= restart_at:
+            del self._restart_at[worker_id]
+            self._spawn(worker_id, symbols)
@@ -0,0 +1,77 @@
+
+
+from typing import Optional, Union
+import logging
+import numpy as np
+
+from app.core.metrics_aggregator import metrics_aggregator
+from app.core.tracing import NO_TRACE
+from app.websocket.config import Config
+from app.websocket.price_manager import PriceManager
+from app.websocket.order_state import OrderState
+from app.services.signal_processor import SignalProcessor
+from app.services.indicator import calculate_wap, calculate_depth_volume
+from app.services.order_book import DepthUpdate, OrderBook, OrderBookSync, snapshot_source_from_config
+from app.services.warm_start import SymbolHistory
+
+logger = logging.getLogger(__name__)
+
+class SymbolState:
+    """All per-symbol ingestion state: order book, indicators, order and signals."""
+    def __init__(self, config: Config, symbol: str):
+        self.config = config
+        self.symbol = symbol
+        self.price_manager = PriceManager(
+            config.PRICE_HISTORY_MAX_LEN,
+            compensated=config.SMA_COMPENSATED,
+            indicators=config.INDICATORS
+        )
+        self.order_state = OrderState()
+        self.signal_processor = SignalProcessor(config, self.price_manager, self.order_state, symbol=symbol)
+        self.order_book = OrderBook(config.ORDER_BOOK_CAPACITY)
+        self.book_sync = OrderBookSync(
+            self.order_book,
+            snapshot_source_from_config(config, symbol),
+            max_buffer=config.DEPTH_BUFFER_MAX_LEN,
+            retry_delay=config.SNAPSHOT_RETRY_DELAY
+        )
+
+    def update_book(self, data: Union[dict, DepthUpdate], trace=NO_TRACE) -> Optional[float]:
+        """
+        Apply one diff event and update the indicators.
+        This is the CPU-bound part of the pipeline; it returns the new WAP,
+        or None when there is no tick to publish.
+        """
+        if not self.book_sync.on_diff(data, trace):
+            # Still syncing, stale event, or a gap that triggered a resync
+            return None
+
+        if not (self.order_book.bid_count and self.order_book.ask_count):
+            logger.warning("Orderbook data incomplete for %s: no bid/ask available.", self.symbol)
+            metrics_aggregator.incr('data_loss_count')
+            return None
+
+        # Book ladders are preallocated and zero-padded, so they are read in place
+        wap_price = calculate_wap(self.order_book.bids, self.order_book.asks, levels=self.config.WAP_LEVELS)
+        volume = calculate_depth_volume(self.order_book.bids, self.order_book.asks, self.config.WAP_LEVELS)
+        trace.mark("wap")
+        # Indicators are computed once per tick into the shared feature vector
+        self.price_manager.add_price(wap_price, volume)
+        trace.mark("indicators")
+        return wap_price
+
+    def restore(self, history: SymbolHistory) -> None:
+        """
+        Replay saved prices through the indicators without evaluating signals,
+        so the first live tick is compared against the last restored one
+        instead of starting from empty windows.
+        """
+        # Without stored volumes, volume-weighted indicators start from the first live tick
+        volumes = history.volumes if history.volumes is not None else np.full(len(history.prices), np.nan)
+        for price, volume in zip(history.prices, volumes):
+            self.price_manager.add_price(float(price), float(volume))
+        self.order_state.current_order_id = history.open_order_id
+
+    def history(self) -> SymbolHistory:
+        return SymbolHistory(self.price_manager.price_history, self.order_state.current_order_id,
+                             self.price_manager.volume_history)
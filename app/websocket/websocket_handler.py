@@ -1,80 +1,214 @@
 
 
 import json
-import time
 import logging
+import threading
 import websocket
-import numpy as np
 from time import perf_counter
+from typing import Optional, Tuple, Union
+from sqlalchemy.exc import SQLAlchemyError
 
-from app.core.redis_client import redis_client
+from app.core.jit import NUMBA_AVAILABLE
+from app.core.live_feed import LiveFeed, live_feed
+from app.core.metrics_aggregator import metrics_aggregator
+from app.core.tracing import NO_TRACE, PipelineTracer
 from app.core.metrics import prom_message_count, prom_latency, prom_error_count
-from app.websocket.price_manager import PriceManager
-from app.websocket.order_state import OrderState
 from app.websocket.config import Config
-from app.services.signal_processor import SignalProcessor
-from app.services.database_manager import DatabaseManager
-from app.services.indicator import calculate_wap
+from app.websocket.symbol_state import SymbolState
+from app.websocket.receive_queue import ReceiveQueue
+from app.websocket.recorder import DepthRecorder
+from app.services.spool import Spool, SpoolReplayer
+from app.services.tick_store import TickStore
+from app.services.tick_writer import TickWriter
+from app.services.bars import BarAggregator
+from app.services.depth_decoder import DepthDecoder
+from app.services.order_book import DepthUpdate
+from app.services.warm_start import load_db_history, load_state_snapshot, save_state_snapshot
 
 logger = logging.getLogger(__name__)
 
 class WebSocketHandler:
-    """Handles WebSocket connection and message processing."""
-    def __init__(self, config: Config):
+    """Handles WebSocket connection and demultiplexes messages into per-symbol state."""
+    def __init__(self, config: Config, tick_writer=None, use_receive_queue: bool = True,
+                 feed: Optional[LiveFeed] = None):
         self.config = config
-        self.price_manager = PriceManager(config.PRICE_HISTORY_MAX_LEN)
-        self.order_state = OrderState()
-        self.signal_processor = SignalProcessor(config, self.price_manager, self.order_state)
+        self.symbols = {symbol: SymbolState(config, symbol) for symbol in config.SYMBOLS}
+        # Ticks and signals go to API clients through the process-wide feed unless another is given
+        self.feed = feed or live_feed
+        for state in self.symbols.values():
+            state.signal_processor.feed = self.feed
+        self.tick_writer = tick_writer or TickWriter(
+            max_queue_size=config.TICK_QUEUE_MAX_SIZE,
+            batch_size=config.TICK_BATCH_SIZE,
+            flush_interval=config.TICK_FLUSH_INTERVAL,
+            bars=BarAggregator(config.BAR_RESOLUTIONS) if config.BAR_RESOLUTIONS else None,
+            store=TickStore(config.TICK_STORE_PATH) if config.TICK_STORE_PATH else None,
+            save_to_db=not (config.TICK_STORE_PATH and config.TICK_STORE_ONLY)
+        )
+        symbols = "-".join(config.SYMBOLS).lower()
+        self.spool = self.spool_replayer = None
+        if config.SPOOL_PATH:
+            self.spool = Spool(config.SPOOL_PATH.format(symbols=symbols), config.SPOOL_SEGMENT_BYTES)
+            self.tick_writer.spool = self.spool
+            for state in self.symbols.values():
+                state.signal_processor.spool = self.spool
+            self.spool_replayer = SpoolReplayer(self.spool, interval=config.SPOOL_REPLAY_INTERVAL)
+            self.spool_replayer.start()
+        self.tick_writer.start()
+        # Only touched by the processing thread, whose buffers it reuses per message
+        # Without Numba the byte scanner runs as plain Python, slower than json.loads
+        self.decoder = DepthDecoder() if config.FAST_DEPTH_DECODER and NUMBA_AVAILABLE else None
+        metrics_aggregator.start()
+        self.tracer = PipelineTracer(config.TRACE_SAMPLE_RATE, config.TRACE_PATH.format(symbols=symbols),
+                                     config.SLOW_MESSAGE_THRESHOLD)
+        self.recorder = None
+        if config.RECORD_PATH:
+            self.recorder = DepthRecorder(config.RECORD_PATH.format(symbols=symbols))
+            for state in self.symbols.values():
+                sync = state.book_sync
+                sync.snapshot_source = self.recorder.wrap_snapshot_source(state.symbol, sync.snapshot_source)
+        self.state_snapshot_path = config.STATE_SNAPSHOT_PATH.format(symbols=symbols)
+        self._next_state_snapshot = perf_counter() + config.STATE_SNAPSHOT_INTERVAL
+        self.receive_queue = None
+        self._worker = None
+        if use_receive_queue and config.RECEIVE_QUEUE_SIZE > 0:
+            self.receive_queue = ReceiveQueue(config.RECEIVE_QUEUE_SIZE, config.RECEIVE_QUEUE_POLICY)
+            self._worker = threading.Thread(target=self._process_loop, name="ws-processor", daemon=True)
+            self._worker.start()
     
     def on_message(self, ws: websocket.WebSocketApp, message: str) -> None:
+        if self.recorder is not None:
+            self.recorder.record_message(message)
+        # The receive thread only enqueues, so slow processing never stalls socket reads
+        if self.receive_queue is not None:
+            self.receive_queue.put(message)
+        else:
+            self.handle_message(message)
+    
+    def _process_loop(self) -> None:
+        while True:
+            item = self.receive_queue.get()
+            if item is None:
+                return
+            self.handle_message(*item)
+    
+    def handle_message(self, message: Union[str, dict], queue_wait: float = 0.0) -> None:
         start_time = perf_counter()
+        trace = self.tracer.begin()
+        if queue_wait:
+            trace.add("queue", int(queue_wait * 1e9))
         try:
-            self._process_message(message)
+            self._process_message(message, trace)
         except Exception as e:
             logger.error("Failed to process websocket message: %s", e)
-            redis_client.incr('error_count')
+            metrics_aggregator.incr('error_count')
             prom_error_count.inc()
         finally:
             self._update_metrics(start_time)
+            trace.mark("metrics")
+            self.tracer.finish(trace)
+        if self._state_snapshot_due(start_time):
+            self.save_state()
     
-    def _process_message(self, message: str) -> None:
-        data = json.loads(message)
-        bids = data.get("b", [])
-        asks = data.get("a", [])
-        
-        if not (bids and asks):
-            logger.warning("Orderbook data incomplete: no bid/ask available.")
-            redis_client.incr('data_loss_count')
+    def _process_message(self, message: Union[str, dict], trace=NO_TRACE) -> None:
+        state, data = self._decode(message)
+        trace.mark("decode")
+        if state is None:
             return
-        
-        wap_price = self._calculate_prices(bids, asks)
+        trace.symbol = state.symbol
+        wap_price = state.update_book(data, trace)
         if wap_price is None:
-            redis_client.incr('data_loss_count')
             return
         
-        with DatabaseManager.get_session() as session:
-            DatabaseManager.save_price_tick(session, wap_price)
-            self.price_manager.add_price(wap_price)
-            sma_short, sma_long = self.price_manager.calculate_smas(
-                self.config.SHORT_WINDOW, self.config.LONG_WINDOW
-            )
-            self.signal_processor.process_signal(wap_price, sma_short, sma_long)
+        self.tick_writer.submit(wap_price, symbol=state.symbol)
+        processor = state.signal_processor
+        fast, slow = processor.rule.inputs(state.price_manager.features)
+        self.feed.publish_tick(state.symbol, wap_price, fast, slow)
+        trace.mark("tick")
+        processor.process_signal(wap_price, fast, slow)
+        trace.mark("signal")
     
-    def _calculate_prices(self, bids: list, asks: list) -> float:
-        bids, asks = np.array(bids, dtype=float), np.array(asks, dtype=float)
-        wap_price = calculate_wap(bids, asks, levels=self.config.WAP_LEVELS)
-        return wap_price
+    def _decode(self, message: Union[str, dict]) -> Tuple[Optional[SymbolState], Union[dict, DepthUpdate]]:
+        """
+        Decode a message and resolve its symbol state. Text goes through the
+        fast depth decoder when enabled; coalesced events arrive already
+        decoded, and anything the fast decoder rejects falls back to json.loads.
+        """
+        if self.decoder is not None and not isinstance(message, dict):
+            update = self.decoder.decode(message)
+            if update is not None:
+                state = self.symbols.get(update.symbol)
+                if state is None:
+                    logger.warning("Ignoring message for untracked symbol: %s", update.symbol)
+                return state, update
+        payload = message if isinstance(message, dict) else json.loads(message)
+        return self._route(payload)
+
+    def _route(self, payload: dict) -> Tuple[Optional[SymbolState], dict]:
+        """
+        Resolve the symbol state for a message.
+        Combined streams wrap events as {"stream": ..., "data": {...}}; raw
+        streams send the event itself. Both carry the symbol in `s`.
+        """
+        data = payload.get("data", payload)
+        state = self.symbols.get(str(data.get("s", "")).upper())
+        if state is None:
+            logger.warning("Ignoring message for untracked symbol: %s", data.get("s"))
+        return state, data
     
+    def warm_start(self) -> None:
+        """
+        Rehydrate each symbol's price history and open order before connecting.
+        The state snapshot is used when configured and fresh, the prices table
+        otherwise. If neither can be read, ingestion starts cold.
+        """
+        if not self.config.WARM_START:
+            return
+        started = perf_counter()
+        max_age = self.config.WARM_START_MAX_AGE
+        histories, source = None, "state snapshot"
+        if self.state_snapshot_path:
+            histories = load_state_snapshot(self.state_snapshot_path, max_age)
+        if histories is None:
+            source = "prices table"
+            try:
+                histories = load_db_history(self.symbols, self.config.PRICE_HISTORY_MAX_LEN, max_age)
+            except SQLAlchemyError as e:
+                logger.warning("Warm start skipped; could not read the database: %s", e)
+                return
+        for symbol, history in histories.items():
+            state = self.symbols.get(symbol)
+            if state is not None:
+                state.restore(history)
+        logger.info("Warm start from %s in %.1fms: %s", source, (perf_counter() - started) * 1000,
+                    ", ".join(f"{symbol}={len(history.prices)} prices" for symbol, history in histories.items()))
+
+    def save_state(self) -> None:
+        """Write the state snapshot; must run on the thread that updates the symbol states."""
+        if not self.state_snapshot_path:
+            return
+        try:
+            save_state_snapshot(self.state_snapshot_path,
+                                {symbol: state.history() for symbol, state in self.symbols.items()})
+        except OSError as e:
+            logger.warning("Could not write state snapshot %s: %s", self.state_snapshot_path, e)
+
+    def _state_snapshot_due(self, now: float) -> bool:
+        if not self.state_snapshot_path or now < self._next_state_snapshot:
+            return False
+        self._next_state_snapshot = now + self.config.STATE_SNAPSHOT_INTERVAL
+        return True
+
     def _update_metrics(self, start_time: float) -> None:
         elapsed = perf_counter() - start_time
-        redis_client.incr('message_count')
-        redis_client.incrbyfloat('latency_sum', elapsed)
+        metrics_aggregator.incr('message_count')
+        metrics_aggregator.incrbyfloat('latency_sum', elapsed)
         prom_message_count.inc()
         prom_latency.observe(elapsed)
     
     def on_error(self, ws: websocket.WebSocketApp, error: Exception) -> None:
         logger.error("WebSocket error: %s", error)
-        redis_client.incr('error_count')
+        metrics_aggregator.incr('error_count')
         prom_error_count.inc()
     
     def on_close(self, ws: websocket.WebSocketApp, close_status_code: int, close_msg: str) -> None:
@@ -82,3 +216,22 @@ class WebSocketHandler:
     
     def on_open(self, ws: websocket.WebSocketApp) -> None:
         logger.info("WebSocket connection established.")
+
+    def _close_spool(self) -> None:
+        # Whatever is still spooled stays on disk and is replayed on the next start
+        if self.spool is not None:
+            self.spool_replayer.stop()
+            self.spool.close()
+
+    def close(self) -> None:
+        """Drain background stages; called once ingestion has stopped."""
+        if self.receive_queue is not None:
+            self.receive_queue.close()
+            self._worker.join()
+        self.save_state()
+        self.tick_writer.stop()
+        self._close_spool()
+        metrics_aggregator.stop()
+        self.tracer.close()
+        if self.recorder is not None:
+            self.recorder.close()
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from time import perf_counter, perf_counter_ns, sleep
+
+import numpy as np
+
+from app.core.live_feed import LiveFeed
+
+
+def run_fanout(subscribers: int = 5000, events: int = 400, rate: float = 40.0, symbols: int = 4,
+               buffer_size: int = 256) -> dict:
+    """
+    Fan `events` ticks out to `subscribers` asyncio consumers in one process.
+    A publisher thread plays the ingestion thread at `rate` events per second
+    (the default is 4 symbols at Binance's 10 depth updates per second);
+    every subscriber takes all symbols and records the publish-to-receive
+    latency of each event. Reports deliveries per second and latency
+    percentiles in microseconds.
+    """
+    feed = LiveFeed(buffer_size)
+    names = [f"SYM{i}USDT" for i in range(symbols)]
+    pair = (100.0, 100.0)
+    latencies = np.zeros((subscribers, events), dtype=np.int64)
+
+    async def consume(index, subscription, done):
+        for i in range(events):
+            event = await subscription.get()
+            if event is None:
+                break
+            latencies[index, i] = perf_counter_ns() - int(event[1][event[1].rfind('"sent": ') + 8:-1])
+        done[index] = i + 1 if event is not None else i
+
+    def publish():
+        interval = 1.0 / rate
+        started = perf_counter()
+        for i in range(events):
+            delay = started + i * interval - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            feed.publish("tick", names[i % symbols], {"symbol": names[i % symbols], "wap": 100.0 + i,
+                                                      "sma_short": pair[0], "sma_long": pair[1],
+                                                      "sent": perf_counter_ns()})
+
+    async def main():
+        done = np.zeros(subscribers, dtype=np.int64)
+        tasks = [asyncio.create_task(consume(i, feed.subscribe(), done)) for i in range(subscribers)]
+        started = perf_counter()
+        publisher = threading.Thread(target=publish, name="fanout-publisher")
+        publisher.start()
+        await asyncio.gather(*tasks)
+        elapsed = perf_counter() - started
+        publisher.join()
+        return done, elapsed
+
+    done, elapsed = asyncio.run(main())
+    received = latencies[latencies > 0] / 1000.0
+    p50, p99, p999 = np.percentile(received, [50, 99, 99.9]) if len(received) else (np.nan,) * 3
+    return {
+        "subscribers": subscribers,
+        "events": events,
+        "rate": rate,
+        "delivered": int(done.sum()),
+        "evicted": int((done < events).sum()),
+        "deliveries_per_second": float(done.sum() / elapsed),
+        "p50_us": float(p50),
+        "p99_us": float(p99),
+        "p999_us": float(p999),
+    }
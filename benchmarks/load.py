@@ -0,0 +1,157 @@
+
+
+import asyncio
+import tempfile
+import threading
+from time import perf_counter_ns
+from typing import List, Optional
+
+import numpy as np
+from websockets.asyncio.server import serve
+
+from app.core.live_feed import LiveFeed
+from app.core.metrics import registry
+from app.core.metrics_aggregator import metrics_aggregator
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.run_websocket import run_websocket, stop_websocket
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.synthetic import DepthStream, interleave
+
+
+def stamp(message: str) -> str:
+    # Combined-stream messages end with "}}"; the send time goes into the event as "T"
+    return f'{message[:-2]},"T":{perf_counter_ns()}}}}}'
+
+
+def lost_messages() -> int:
+    """Messages the receive queue merged or dropped so far; they never reach handle_message."""
+    return int(sum(registry.get_sample_value(name) or 0.0 for name in
+                   ("ws_receive_coalesced_count_total", "ws_receive_dropped_count_total")))
+
+
+def sent_at(message) -> int:
+    if isinstance(message, dict):
+        # Coalesced events are already decoded and carry the newest event's stamp
+        return int(message.get("data", message)["T"])
+    return int(message[message.rfind('"T":') + 4:-2])
+
+
+class BurstServer:
+    """
+    Local stand-in for the Binance combined stream. Every client gets
+    `messages` in bursts of `burst`, paced to an average of `rate` messages
+    per second. Binance delivers depth@100ms updates for many symbols at about
+    the same moment, which this reproduces. The connection then stays open
+    until the server stops.
+    """
+    def __init__(self, messages: List[str], rate: float, burst: int = 1, host: str = "127.0.0.1"):
+        self.messages = messages
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.host = host
+        self.url: Optional[str] = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._stopped: Optional[asyncio.Event] = None
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._main(),),
+                                        name="burst-server", daemon=True)
+
+    def start(self) -> str:
+        self._thread.start()
+        self._ready.wait()
+        return self.url
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+
+    async def _main(self) -> None:
+        self._stopped = asyncio.Event()
+        async with serve(self._serve, self.host, 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            self.url = f"ws://{self.host}:{port}"
+            self._ready.set()
+            await self._stopped.wait()
+
+    async def _serve(self, ws) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i in range(0, len(self.messages), self.burst):
+            delay = start + i / self.rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for message in self.messages[i:i + self.burst]:
+                await ws.send(stamp(message))
+        await self._stopped.wait()
+
+
+class TimedHandler(WebSocketHandler):
+    """Records send-to-processed latency for every message it finishes."""
+    def __init__(self, config: Config, tick_writer, expected: int):
+        # A private feed, so benchmark ticks never reach the live stream or its Redis channel
+        super().__init__(config, tick_writer=tick_writer, feed=LiveFeed())
+        self.latencies = np.zeros(expected, dtype=np.int64)
+        self.processed = 0
+        self.done = threading.Event()
+        self._lost_before = lost_messages()
+
+    def handle_message(self, message, queue_wait: float = 0.0) -> None:
+        super().handle_message(message, queue_wait)
+        if self.processed < len(self.latencies):
+            self.latencies[self.processed] = perf_counter_ns() - sent_at(message)
+            self.processed += 1
+        if self.processed + self.lost() >= len(self.latencies):
+            self.done.set()
+
+    def lost(self) -> int:
+        return lost_messages() - self._lost_before
+
+
+def run_load(rate: float = 2000.0, count: int = 20000, burst: int = 50, symbols: int = 4,
+             policy: str = "coalesce", timeout: float = 120.0) -> dict:
+    """
+    Drive `run_websocket` end to end against a local BurstServer and report
+    send-to-processed latency percentiles in microseconds. `run_websocket`
+    cannot be restarted after `stop_websocket`, so run this once per process.
+    """
+    streams = [DepthStream(f"SYM{i}USDT", seed=i) for i in range(symbols)]
+    fixture_dir = tempfile.mkdtemp(prefix="bench-")
+    for stream in streams:
+        fixture = stream.write_snapshot(fixture_dir)
+    messages = interleave(streams, max(1, count // symbols))
+
+    server = BurstServer(messages, rate, burst)
+    config = Config(SYMBOLS=tuple(stream.symbol for stream in streams), WS_URL=server.start(),
+                    SNAPSHOT_FIXTURE=fixture, RECEIVE_QUEUE_POLICY=policy, RECORD_PATH="")
+    with metrics_aggregator.detached():
+        sink = MemorySink()
+        handler = TimedHandler(config, sink, len(messages))
+        for state in handler.symbols.values():
+            state.signal_processor.session_factory = sink.session
+        started = perf_counter_ns()
+        thread = threading.Thread(target=run_websocket, args=(config, handler), daemon=True)
+        thread.start()
+        completed = handler.done.wait(timeout)
+        elapsed = (perf_counter_ns() - started) / 1e9
+        stop_websocket()
+        thread.join(30)
+        server.stop()
+
+    latencies = handler.latencies[:handler.processed] / 1000.0
+    p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9]) if len(latencies) else (np.nan,) * 3
+    return {
+        "rate": rate,
+        "burst": burst,
+        "symbols": symbols,
+        "policy": policy,
+        "sent": len(messages),
+        "processed": handler.processed,
+        "coalesced_or_dropped": handler.lost(),
+        "completed": completed,
+        "messages_per_second": handler.processed / elapsed if elapsed > 0 else 0.0,
+        "p50_us": float(p50),
+        "p99_us": float(p99),
+        "p999_us": float(p999),
+        "max_us": float(latencies.max()) if len(latencies) else float("nan"),
+    }
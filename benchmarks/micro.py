@@ -0,0 +1,114 @@
+
+
+import gc
+import json
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter_ns
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.core.live_feed import LiveFeed
+from app.core.metrics_aggregator import metrics_aggregator
+from app.services.depth_decoder import DepthDecoder
+from app.services.indicator import calculate_sma, calculate_wap
+from app.services.order_book import DepthUpdate
+from app.services.streaming_indicators import create_indicator
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.synthetic import DepthStream
+
+
+def measure(name: str, op: Callable[[int], None], count: int, warmup: int = 1000) -> dict:
+    """
+    Time `op(i)` for i in range(count) and report ns/op plus Python heap use.
+
+    Allocations are measured in a separate, shorter pass under tracemalloc,
+    because tracing slows every allocation down. Memory allocated inside Numba
+    kernels is not visible to tracemalloc.
+    """
+    for i in range(warmup):
+        op(i)
+    gc.collect()
+    gc.disable()
+    try:
+        start = perf_counter_ns()
+        for i in range(count):
+            op(i)
+        elapsed = perf_counter_ns() - start
+
+        traced = min(count, 1000)
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        for i in range(traced):
+            op(i)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        net_blocks = sys.getallocatedblocks() - blocks
+    finally:
+        gc.enable()
+    return {
+        "name": name,
+        "ns_per_op": elapsed / count,
+        "net_blocks_per_op": max(net_blocks, 0) / traced,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_micro(count: int = 20000) -> List[Dict]:
+    """Benchmark each stage of the ingestion hot path on synthetic depth data."""
+    stream = DepthStream(levels=50)
+    fixture_dir = tempfile.mkdtemp(prefix="bench-")
+    config = Config(SNAPSHOT_FIXTURE=stream.write_snapshot(fixture_dir), RECEIVE_QUEUE_SIZE=0, RECORD_PATH="")
+    half = max(count // 2, 1)
+    # One sync message, then fresh events for the timed and traced passes of two stages
+    messages = stream.messages(1 + 2 * (half + min(half, 1000)))
+    events = [json.loads(message)["data"] for message in messages]
+    results = []
+
+    with metrics_aggregator.detached():
+        sink = MemorySink()
+        handler = WebSocketHandler(config, tick_writer=sink, use_receive_queue=False, feed=LiveFeed())
+        state = handler.symbols[stream.symbol]
+        state.signal_processor.session_factory = sink.session
+        try:
+            handler._process_message(messages[0])  # sync the book from the snapshot
+            book = state.order_book
+
+            results.append(measure("json.loads", lambda i: json.loads(messages[i % len(messages)]), count))
+
+            # Real-size payloads: BTCUSDT depth@100ms events carry tens of level changes
+            wide = DepthStream(changes=60, seed=2).messages(1000)
+            results.append(measure("decode_json_np", lambda i: DepthUpdate.from_event(json.loads(wide[i % 1000])["data"]), count))
+            decoder = DepthDecoder()
+            results.append(measure("decode_fast", lambda i: decoder.decode(wide[i % 1000]), count))
+            results.append(measure("calculate_wap", lambda i: calculate_wap(book.bids, book.asks, config.WAP_LEVELS), count))
+
+            history = list(100.0 + np.random.default_rng(1).normal(0, 1, config.PRICE_HISTORY_MAX_LEN))
+            results.append(measure("calculate_sma", lambda i: calculate_sma(history, config.SHORT_WINDOW), count))
+
+            sma, out = create_indicator(f"sma:{config.LONG_WINDOW}"), np.zeros(1)
+            results.append(measure("SMAIndicator.update", lambda i: sma.update(100.0 + (i % 7), 1.0, out, 0), count))
+
+            features = state.price_manager.features
+            results.append(measure("FeatureEngine.update", lambda i: features.update(100.0 + (i % 7)), count))
+
+            # Consumes fresh, correctly sequenced events on every call
+            offset = iter(range(1, len(events)))
+            results.append(measure("SymbolState.update_book", lambda i: state.update_book(events[next(offset)]), half, warmup=0))
+            results.append(measure("_process_message", lambda i: handler._process_message(messages[next(offset)]), half, warmup=0))
+
+            # Alternate open/close crossovers so every call takes the database path
+            short_up, long_up = np.array([99.0, 101.0]), np.array([100.0, 100.0])
+            short_down = np.array([101.0, 99.0])
+            processor = state.signal_processor
+
+            def signal(i):
+                processor.process_signal(100.0, short_up if i % 2 == 0 else short_down, long_up)
+            results.append(measure("SignalProcessor.process_signal", signal, min(count, 2000), warmup=100))
+        finally:
+            handler.close()
+    return results
@@ -0,0 +1,123 @@
+
+
+import os
+import sys
+import json
+import argparse
+import platform
+from typing import Dict, List
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics where a larger value is a regression, compared against the baseline
+MICRO_METRICS = ("ns_per_op",)
+LOAD_METRICS = ("p50_us", "p99_us", "p999_us")
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[dict]:
+    """
+    Compare a run with the stored baseline. Returns one row per metric
+    with the relative change; rows slower than `threshold` are regressions.
+    """
+    rows = []
+    base_micro = {row["name"]: row for row in baseline.get("micro", [])}
+    for row in current.get("micro", []):
+        base = base_micro.get(row["name"])
+        for metric in MICRO_METRICS:
+            if base and base.get(metric):
+                rows.append(_row(row["name"], metric, base[metric], row[metric], threshold))
+    if current.get("load") and baseline.get("load"):
+        for metric in LOAD_METRICS:
+            if baseline["load"].get(metric):
+                rows.append(_row("end_to_end", metric, baseline["load"][metric], current["load"][metric], threshold))
+    return rows
+
+
+def comparable(current: Dict, baseline: Dict) -> bool:
+    """Whether the baseline was recorded with the same Python version and CPU architecture."""
+    return all(current.get(key) == baseline.get(key) for key in ("python", "machine"))
+
+
+def _row(name: str, metric: str, base: float, value: float, threshold: float) -> dict:
+    change = value / base - 1.0
+    return {"name": name, "metric": metric, "baseline": base, "current": value,
+            "change": change, "regression": change > threshold}
+
+
+def format_report(current: Dict, rows: List[dict]) -> str:
+    lines = [f"{'stage':<32}{'ns/op':>12}{'blocks/op':>11}{'peak KiB':>10}"]
+    for row in current.get("micro", []):
+        lines.append(f"{row['name']:<32}{row['ns_per_op']:>12,.0f}{row['net_blocks_per_op']:>11.2f}{row['peak_kib']:>10.1f}")
+    load = current.get("load")
+    if load:
+        lines.append("")
+        lines.append(f"end to end: {load['processed']}/{load['sent']} messages at {load['rate']:,.0f}/s "
+                     f"(bursts of {load['burst']}, {load['symbols']} symbols), {load['messages_per_second']:,.0f} msg/s")
+        lines.append(f"latency us: p50 {load['p50_us']:,.0f}  p99 {load['p99_us']:,.0f}  "
+                     f"p999 {load['p999_us']:,.0f}  max {load['max_us']:,.0f}")
+    fanout = current.get("fanout")
+    if fanout:
+        lines.append("")
+        lines.append(f"fan-out: {fanout['events']} events at {fanout['rate']:,.0f}/s to {fanout['subscribers']:,} "
+                     f"subscribers, {fanout['deliveries_per_second']:,.0f} deliveries/s, {fanout['evicted']} evicted")
+        lines.append(f"latency us: p50 {fanout['p50_us']:,.0f}  p99 {fanout['p99_us']:,.0f}  "
+                     f"p999 {fanout['p999_us']:,.0f}")
+    if rows:
+        lines.append("")
+        lines.append(f"{'vs baseline':<32}{'metric':>12}{'change':>10}")
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            lines.append(f"{row['name']:<32}{row['metric']:>12}{row['change']:>+10.1%}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion hot path.")
+    parser.add_argument("--count", type=int, default=20000, help="operations per micro benchmark")
+    parser.add_argument("--load", action="store_true", help="also run the end-to-end load test")
+    parser.add_argument("--rate", type=float, default=2000.0, help="load test messages per second")
+    parser.add_argument("--burst", type=int, default=50, help="load test messages per burst")
+    parser.add_argument("--messages", type=int, default=20000, help="load test message count")
+    parser.add_argument("--symbols", type=int, default=4, help="load test symbols")
+    parser.add_argument("--fanout", type=int, metavar="SUBSCRIBERS",
+                        help="also fan live ticks out to this many in-process stream subscribers")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit 1 on a regression; only use with a baseline saved on the same machine")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    from benchmarks.micro import run_micro
+    current = {"python": platform.python_version(), "machine": platform.machine(), "micro": run_micro(args.count)}
+    if args.load:
+        from benchmarks.load import run_load
+        current["load"] = run_load(args.rate, args.messages, args.burst, args.symbols)
+    if args.fanout:
+        from benchmarks.fanout import run_fanout
+        current["fanout"] = run_fanout(args.fanout)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold)
+    print(format_report(current, rows))
+    if rows and not comparable(current, baseline):
+        print(f"\nnote: the baseline was recorded on Python {baseline.get('python')} ({baseline.get('machine')}); "
+              f"run --save-baseline on this machine before comparing timings")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+    # Timings only compare on the machine the baseline was saved on, so failing is opt-in
+    regressed = any(row["regression"] for row in rows) and comparable(current, baseline)
+    return 1 if args.fail_on_regression and regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+
+
+import json
+import os
+import numpy as np
+from typing import List
+
+
+class DepthStream:
+    """
+    Generates a consistent Binance-style depth snapshot and the diff events
+    that follow it for one symbol: a random-walk mid price, a ladder of
+    `levels` price levels per side, and contiguous U/u update ids.
+    """
+    def __init__(self, symbol: str = "BTCUSDT", levels: int = 20, changes: int = 10,
+                 mid: float = 30000.0, tick: float = 0.01, seed: int = 0):
+        self.symbol = symbol.upper()
+        self.levels = levels
+        self.changes = changes
+        self.mid = mid
+        self.tick = tick
+        self.update_id = 1000
+        self._rng = np.random.default_rng(seed)
+
+    def snapshot(self) -> dict:
+        return {
+            "lastUpdateId": self.update_id,
+            "bids": [[f"{self.mid - (i + 1) * self.tick:.2f}", "1.00000000"] for i in range(self.levels)],
+            "asks": [[f"{self.mid + (i + 1) * self.tick:.2f}", "1.00000000"] for i in range(self.levels)],
+        }
+
+    def write_snapshot(self, directory: str) -> str:
+        """Write the snapshot as `<symbol>.json` and return the SNAPSHOT_FIXTURE pattern."""
+        with open(os.path.join(directory, f"{self.symbol}.json"), "w") as f:
+            json.dump(self.snapshot(), f)
+        return os.path.join(directory, "{symbol}.json")
+
+    def event(self) -> dict:
+        rng = self._rng
+        self.mid += rng.normal(0.0, 2.0) * self.tick
+        offsets = rng.integers(1, self.levels + 1, size=self.changes)
+        quantities = rng.exponential(1.0, size=self.changes)
+        # Roughly one change in ten removes its level
+        quantities[rng.random(self.changes) < 0.1] = 0.0
+        bids, asks = [], []
+        for offset, qty, is_bid in zip(offsets, quantities, rng.random(self.changes) < 0.5):
+            price = self.mid - offset * self.tick if is_bid else self.mid + offset * self.tick
+            (bids if is_bid else asks).append([f"{price:.2f}", f"{qty:.8f}"])
+        first_id = self.update_id + 1
+        self.update_id += int(rng.integers(1, 4))
+        return {"e": "depthUpdate", "s": self.symbol, "U": first_id, "u": self.update_id, "b": bids, "a": asks}
+
+    def messages(self, count: int) -> List[str]:
+        """Combined-stream messages, as received from /stream?streams=..."""
+        stream = f"{self.symbol.lower()}@depth"
+        return [json.dumps({"stream": stream, "data": self.event()}, separators=(",", ":")) for _ in range(count)]
+
+
+def interleave(streams: List[DepthStream], count: int) -> List[str]:
+    """`count` messages per stream, round-robin across symbols."""
+    per_stream = [stream.messages(count) for stream in streams]
+    return [message for group in zip(*per_stream) for message in group]
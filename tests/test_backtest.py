@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.models import Price
+from app.services.backtest import (
+    SMASweep, crossover_signals, load_db_prices, sweep_sma_crossovers, window_grid
+)
+
+
+def reference_backtest(prices, short, long):
+    # Straightforward per-tick loop mirroring SignalProcessor's crossover rules
+    position, entry, realized, trades, prev = False, 0.0, 0.0, 0, None
+    for t in range(long - 1, len(prices)):
+        diff = prices[t + 1 - short:t + 1].mean() - prices[t + 1 - long:t + 1].mean()
+        if prev is not None:
+            if not position and diff > 0 and prev <= 0:
+                position, entry, trades = True, prices[t], trades + 1
+            elif position and diff < 0 and prev >= 0:
+                position, realized = False, realized + prices[t] - entry
+        prev = diff
+    unrealized = prices[-1] - entry if position else 0.0
+    return trades, realized, unrealized
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    return 30000.0 + np.cumsum(rng.normal(0.0, 5.0, 5000))
+
+
+def test_sweep_matches_reference_loop(prices):
+    result = sweep_sma_crossovers(prices, [3, 5, 20], [10, 50])
+    assert len(result.shorts) == 5  # (20, 10) is skipped
+    for i, (short, long) in enumerate(zip(result.shorts, result.longs)):
+        trades, realized, unrealized = reference_backtest(prices, short, long)
+        assert result.trades[i] == trades
+        assert result.realized_pnl[i] == pytest.approx(realized, abs=1e-6)
+        assert result.unrealized_pnl[i] == pytest.approx(unrealized, abs=1e-6)
+
+
+def test_chunking_does_not_change_results(prices):
+    whole = sweep_sma_crossovers(prices, [3, 5, 20], [10, 50])
+    chunked = sweep_sma_crossovers(prices, [3, 5, 20], [10, 50], chunk_size=7)
+    np.testing.assert_array_equal(whole.trades, chunked.trades)
+    np.testing.assert_allclose(whole.total_pnl, chunked.total_pnl, atol=1e-6)
+    assert chunked.ticks == len(prices)
+
+
+def test_crossover_signals_alternate_and_match_sweep(prices):
+    signals = crossover_signals(prices, 5, 50)
+    assert list(signals[:, 1][:4]) == [1, -1, 1, -1]
+    sweep = SMASweep(window_grid([5], [50]))
+    sweep.update(prices)
+    assert (signals[:, 1] == 1).sum() == sweep.result().trades[0]
+
+
+def test_grid_rejects_invalid_pairs():
+    assert window_grid([10, 50], [20, 50]).tolist() == [[10, 20], [10, 50]]
+    with pytest.raises(ValueError):
+        SMASweep(np.array([[50, 20]]))
+
+
+def test_load_db_prices_streams_in_timestamp_order():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Price.__table__.insert(), [
+            {"timestamp": start + timedelta(seconds=9 - i), "symbol": "BTCUSDT", "wap": float(9 - i)}
+            for i in range(10)
+        ] + [{"timestamp": start, "symbol": "ETHUSDT", "wap": -1.0}])
+
+    chunks = list(load_db_prices("BTCUSDT", bind=engine, chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert np.concatenate(chunks).tolist() == [float(i) for i in range(10)]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.models import Price, PriceBar
+from app.services.bars import BarAggregator, backfill_bars, to_microseconds
+from app.services.tick_writer import TickWriter
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def random_ticks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.uniform(0, 7200, count))
+    return [START + timedelta(seconds=float(offset)) for offset in offsets], 100 + rng.normal(0, 1, count).cumsum()
+
+
+def reference_bars(times, prices, resolution):
+    bars = {}
+    for time, price in zip(to_microseconds(times), prices):
+        bucket = int(time // (resolution * 1_000_000))
+        if bucket not in bars:
+            bars[bucket] = [price, price, price, price, 0]
+        bar = bars[bucket]
+        bar[1], bar[2], bar[3], bar[4] = max(bar[1], price), min(bar[2], price), price, bar[4] + 1
+    return bars
+
+
+def fetch_bars(engine, resolution):
+    with engine.connect() as conn:
+        rows = conn.execute(PriceBar.__table__.select().where(PriceBar.resolution == resolution)
+                            .order_by(PriceBar.bucket_start)).fetchall()
+    return {row.bucket_start: (row.open, row.high, row.low, row.close, row.tick_count) for row in rows}
+
+
+def test_bars_match_reference_across_batches():
+    times, prices = random_ticks(5000)
+    aggregator = BarAggregator((1, 60, 3600))
+    bars = []
+    for cut in np.array_split(np.arange(len(prices)), 17):
+        bars += aggregator.add("BTCUSDT", to_microseconds([times[i] for i in cut]), prices[cut])
+    bars += aggregator.drain()
+    for resolution in (1, 60, 3600):
+        built = {bar.bucket: [bar.open, bar.high, bar.low, bar.close, bar.ticks]
+                 for bar in bars if bar.resolution == resolution}
+        assert built == reference_bars(times, prices, resolution)
+
+
+def test_tick_writer_upserts_bars_and_merges_after_restart(memory_engine):
+    times, prices = random_ticks(400, seed=1)
+    for part in (slice(0, 150), slice(150, None)):   # a restart in the middle of open bars
+        writer = TickWriter(batch_size=64, flush_interval=60.0, bind=memory_engine, bars=BarAggregator((60, 3600)))
+        writer.start()
+        for time, price in zip(times[part], prices[part]):
+            writer.submit(float(price), timestamp=time, symbol="BTCUSDT")
+        writer.stop()
+
+    for resolution in (60, 3600):
+        reference = reference_bars(times, prices, resolution)
+        stored = fetch_bars(memory_engine, resolution)
+        assert len(stored) == len(reference)
+        for (bucket, bar), (bucket_start, row) in zip(sorted(reference.items()), stored.items()):
+            assert bucket_start == datetime(1970, 1, 1) + timedelta(seconds=bucket * resolution)
+            assert row == pytest.approx(tuple(bar))
+
+
+def test_backfill_rebuilds_bars_and_is_repeatable(memory_engine):
+    times, prices = random_ticks(3000, seed=2)
+    with memory_engine.begin() as conn:
+        conn.execute(Price.__table__.insert(), [
+            {"timestamp": time, "symbol": "BTCUSDT", "wap": float(price)} for time, price in zip(times, prices)])
+    for _ in range(2):
+        backfill_bars(["BTCUSDT"], (1, 60), bind=memory_engine, chunk_size=251)
+    for resolution in (1, 60):
+        stored = fetch_bars(memory_engine, resolution)
+        assert list(stored.values()) == [pytest.approx(tuple(bar)) for _, bar in
+                                         sorted(reference_bars(times, prices, resolution).items())]
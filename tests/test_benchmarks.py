@@ -0,0 +1,34 @@
+import json
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.run import comparable, compare
+from benchmarks.synthetic import DepthStream
+
+
+def test_synthetic_stream_keeps_the_book_in_sync(tmp_path):
+    stream = DepthStream(levels=10, seed=3)
+    config = Config(SNAPSHOT_FIXTURE=stream.write_snapshot(str(tmp_path)), RECEIVE_QUEUE_SIZE=0)
+    messages = stream.messages(200)
+    events = [json.loads(message)["data"] for message in messages]
+    assert all(b["U"] == a["u"] + 1 for a, b in zip(events, events[1:]))
+
+    handler = WebSocketHandler(config, tick_writer=MemorySink())
+    try:
+        for message in messages:
+            handler._process_message(message)
+        assert handler.symbols["BTCUSDT"].book_sync.synced
+        assert len(handler.tick_writer.ticks) == 200
+    finally:
+        handler.close()
+
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    baseline = {"micro": [{"name": "calculate_wap", "ns_per_op": 100.0}, {"name": "json.loads", "ns_per_op": 1000.0}],
+                "load": {"p50_us": 100.0, "p99_us": 1000.0, "p999_us": 2000.0}}
+    current = {"micro": [{"name": "calculate_wap", "ns_per_op": 130.0}, {"name": "json.loads", "ns_per_op": 900.0}],
+               "load": {"p50_us": 100.0, "p99_us": 1100.0, "p999_us": 5000.0}}
+    regressions = {(row["name"], row["metric"]) for row in compare(current, baseline, 0.2) if row["regression"]}
+    assert regressions == {("calculate_wap", "ns_per_op"), ("end_to_end", "p999_us")}
+    assert comparable({"python": "3.11.7", "machine": "x86_64"}, {"python": "3.11.7", "machine": "x86_64"})
+    assert not comparable({"python": "3.9.18", "machine": "x86_64"}, {"python": "3.11.7", "machine": "x86_64"})
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, InstrumentedQueuePool, UnitOfWork, create_pooled_engine, engine_options
+from app.core.metrics import registry
+from app.models.models import Price
+
+
+def sample(name, pool):
+    return registry.get_sample_value(name, {"pool": pool}) or 0.0
+
+
+def test_unit_of_work_reuses_one_session_and_connection(tmp_path):
+    engine = create_pooled_engine(f"sqlite:///{tmp_path / 'app.db'}", "test-uow")
+    Base.metadata.create_all(bind=engine)
+    checkouts, commits = [], []
+    event.listen(engine, "checkout", lambda *args: checkouts.append(1))
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    unit_of_work = UnitOfWork(sessionmaker(bind=engine, expire_on_commit=False))
+
+    with unit_of_work() as session:
+        session.add(Price(symbol="BTCUSDT", wap=1.0))
+        with unit_of_work() as nested:
+            assert nested is session
+            nested.add(Price(symbol="BTCUSDT", wap=2.0))
+    assert len(checkouts) == 1 and len(commits) == 1, "A nested unit must join the outer transaction"
+    assert sample("db_pool_checked_out", "test-uow") == 0
+    assert sample("db_pool_checkout_seconds_count", "test-uow") >= 1
+
+    # A failure in a nested block rolls the whole unit back; the session is reused afterwards
+    with pytest.raises(RuntimeError):
+        with unit_of_work() as again:
+            assert again is session
+            again.add(Price(symbol="BTCUSDT", wap=3.0))
+            with unit_of_work():
+                raise RuntimeError("boom")
+    with unit_of_work() as session:
+        assert sorted(session.execute(text("SELECT wap FROM prices")).scalars()) == [1.0, 2.0]
+
+
+def test_pool_options_and_checkout_timeouts(tmp_path):
+    options = engine_options("postgresql://user:pw@db/app", "test-read", pool_size=3, read_only=True)
+    assert options["poolclass"] is InstrumentedQueuePool and options["pool_size"] == 3
+    assert options["pool_pre_ping"] and options["pool_timeout"] > 0
+    assert "default_transaction_read_only=on" in options["connect_args"]["options"]
+    assert engine_options("postgresql+asyncpg://db/app", "async", is_async=True)["connect_args"][
+        "prepared_statement_cache_size"] > 0
+    assert "poolclass" not in engine_options("sqlite:///app.db", "test")
+
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(str(tmp_path / "pool.db")), pool_size=1,
+                                 max_overflow=0, timeout=0.05, logging_name="test-pool")
+    connection = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    connection.close()
+    pool.connect().close()
+    assert sample("db_pool_timeout_count_total", "test-pool") == 1
+    assert sample("db_pool_wait_seconds_count", "test-pool") == 3
+    assert sample("db_pool_wait_seconds_sum", "test-pool") >= 0.05
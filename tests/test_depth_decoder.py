@@ -0,0 +1,64 @@
+import json
+import numpy as np
+import pytest
+from app.services.depth_decoder import DepthDecoder
+from app.services.order_book import DepthUpdate
+from benchmarks.synthetic import DepthStream
+
+
+def assert_same(update, event):
+    expected = DepthUpdate.from_event(event)
+    assert (update.first_id, update.last_id, update.symbol) == (expected.first_id, expected.last_id, expected.symbol)
+    np.testing.assert_array_equal(update.bids, expected.bids)
+    np.testing.assert_array_equal(update.asks, expected.asks)
+
+
+def test_matches_json_path_on_combined_and_raw_messages():
+    decoder = DepthDecoder()
+    stream = DepthStream(changes=40, seed=5)
+    for message in stream.messages(200):
+        event = json.loads(message)["data"]
+        assert_same(decoder.decode(message), event)
+        assert_same(decoder.decode(json.dumps(event, indent=1)), event)
+
+
+def test_prices_parse_exactly_like_float():
+    rng = np.random.default_rng(11)
+    values = [f"{price:.{decimals}f}" for price, decimals in
+              zip(rng.uniform(0, 200000, 2000), rng.integers(0, 9, 2000))]
+    values += ["0.00000001", "0.10000000", "123456.78901234", "0", "5."]
+    levels = [[value, value] for value in values]
+    message = json.dumps({"e": "depthUpdate", "s": "btcusdt", "U": 1, "u": 2, "b": levels, "a": []})
+    update = DepthDecoder(capacity=8).decode(message)
+    assert update.symbol == "BTCUSDT"
+    assert update.bids[:, 0].tolist() == [float(value) for value in values]
+
+
+def test_skips_unused_fields_and_tricky_strings():
+    message = ('{"stream":"btcusdt@depth","data":{"e":"depthUpdate","E":1700000000000,'
+               '"note":"has \\"s\\":\\"X\\", and [\\"b\\"]","s":"BTCUSDT","U":10,"u":12,'
+               '"b":[["100.5","1.25"]],"a":[]}}')
+    update = DepthDecoder().decode(message)
+    assert (update.symbol, update.first_id, update.last_id) == ("BTCUSDT", 10, 12)
+    assert update.bids.tolist() == [[100.5, 1.25]]
+    assert update.asks.shape == (0, 2)
+
+
+@pytest.mark.parametrize("message", [
+    '{"s":"BTCUSDT","U":1,"b":[],"a":[]}',                                   # missing u
+    '{"s":"BTCUSDT","U":1,"u":2,"b":[["1.0e3","1"]],"a":[]}',                 # exponent
+    '{"s":"BTCUSDT","U":1,"u":2,"b":[["12345678901234567","1"]],"a":[]}',    # too many digits
+    '{"s":"BTCUSDT","U":1,"u":2,"b":[["1","1"]',                              # truncated
+    'not json',
+])
+def test_rejects_what_it_cannot_parse(message):
+    assert DepthDecoder().decode(message) is None
+
+
+def test_views_are_reused_and_copy_detaches():
+    decoder = DepthDecoder()
+    first = decoder.decode('{"s":"BTCUSDT","U":1,"u":1,"b":[["1","1"]],"a":[]}')
+    kept = first.copy()
+    decoder.decode('{"s":"BTCUSDT","U":2,"u":2,"b":[["2","2"]],"a":[]}')
+    assert first.bids.tolist() == [[2.0, 2.0]]
+    assert kept.bids.tolist() == [[1.0, 1.0]]
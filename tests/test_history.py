@@ -0,0 +1,120 @@
+import json
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from app.core.cache import TTLCache, history_cache
+from app.core.db import Base
+from app.models.models import Price
+from app.services.bars import BarAggregator, backfill_bars, to_microseconds
+from app.services.history import HistoryQuery, read_page
+from app.services.tick_writer import TickWriter
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def memory_engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr("app.services.history.read_engine", engine)
+    history_cache.clear()
+    return engine
+
+
+def insert_ticks(engine, count, seed=0):
+    rng = np.random.default_rng(seed)
+    # Pairs of ticks share a timestamp, so pages must break ties on id
+    rows = [{"timestamp": START + timedelta(seconds=float(i // 2) * 7.5), "symbol": ("BTCUSDT", "ETHUSDT")[i % 3 == 0],
+             "wap": float(100 + rng.normal())} for i in range(count)]
+    with engine.begin() as conn:
+        conn.execute(Price.__table__.insert(), rows)
+    return rows
+
+
+def read_all(request, limit, bind):
+    items, cursor = [], None
+    while True:
+        page = read_page(request._replace(cursor=cursor), limit, bind)
+        items += page.items
+        if page.next_cursor is None:
+            return items
+        cursor = page.next_cursor
+
+
+def test_keyset_pages_cover_every_row_once(memory_engine):
+    rows = insert_ticks(memory_engine, 250)
+    btc = [row for row in rows if row["symbol"] == "BTCUSDT"]
+    ascending = read_all(HistoryQuery("prices", "BTCUSDT"), 40, memory_engine)
+    assert [item["wap"] for item in ascending] == [row["wap"] for row in btc]
+    descending = read_all(HistoryQuery("prices", descending=True), 33, memory_engine)
+    assert [item["wap"] for item in descending] == [row["wap"] for row in rows][::-1]
+    window = read_all(HistoryQuery("prices", "BTCUSDT", start=START + timedelta(minutes=2),
+                                   end=START + timedelta(minutes=5)), 10, memory_engine)
+    assert [item["wap"] for item in window] == [row["wap"] for row in btc
+                                                if START + timedelta(minutes=2) <= row["timestamp"] < START + timedelta(minutes=5)]
+
+
+def test_coarser_bars_are_merged_from_stored_bars(memory_engine):
+    rows = insert_ticks(memory_engine, 3000, seed=1)
+    backfill_bars(["BTCUSDT"], (60,), bind=memory_engine)
+    btc = [row for row in rows if row["symbol"] == "BTCUSDT"]
+    aggregator = BarAggregator((300,))
+    expected = aggregator.add("BTCUSDT", to_microseconds([row["timestamp"] for row in btc]),
+                              np.array([row["wap"] for row in btc])) + aggregator.drain()
+
+    for descending in (False, True):
+        bars = read_all(HistoryQuery("prices", "BTCUSDT", 300, descending=descending), 7, memory_engine)
+        if descending:
+            bars = bars[::-1]
+        assert [(bar["open"], bar["high"], bar["low"], bar["close"], bar["ticks"]) for bar in bars] == \
+            [pytest.approx((bar.open, bar.high, bar.low, bar.close, bar.ticks)) for bar in expected]
+        assert bars[0]["timestamp"] == expected[0].as_row()["bucket_start"].isoformat()
+
+
+def test_streaming_formats_and_cache_invalidation(memory_engine):
+    from app.main import app
+    client = TestClient(app)
+    insert_ticks(memory_engine, 90)
+
+    lines = [json.loads(line) for line in client.get("/prices?symbol=btcusdt&limit=50&format=ndjson").iter_lines()]
+    assert len(lines) == 51 and lines[-1]["next_cursor"]
+    rest = client.get(f"/prices?symbol=btcusdt&format=columnar&cursor={lines[-1]['next_cursor']}").iter_lines()
+    chunk, end = [json.loads(line) for line in rest]
+    assert chunk["rows"] == 60 - 50 and end == {"next_cursor": None}
+    assert set(chunk["columns"]) == {"timestamp", "symbol", "wap"}
+
+    latest = client.get("/prices?symbol=BTCUSDT&order=desc&limit=3").json()
+    hits = history_cache.hits
+    assert client.get("/prices?symbol=BTCUSDT&order=desc&limit=3").json() == latest
+    assert history_cache.hits == hits + 1
+
+    writer = TickWriter(batch_size=1, bind=memory_engine)
+    writer.start()
+    writer.submit(123.0, timestamp=START + timedelta(days=1), symbol="BTCUSDT")
+    writer.stop()
+    assert client.get("/prices?symbol=BTCUSDT&order=desc&limit=3").json()["items"][0]["wap"] == 123.0
+
+    assert client.get("/prices?resolution=7&symbol=BTCUSDT").status_code == 200
+    assert client.get("/prices?resolution=60").status_code == 400   # bars need a symbol
+    assert client.get("/prices?cursor=nope").status_code == 400
+    assert client.get("/signals?format=ndjson").text == '{"next_cursor": null}\n'
+
+
+def test_invalidation_is_rate_limited_to_the_ttl():
+    cache = TTLCache(ttl=0.2)
+    cache.set("page", 1, ("prices", "BTCUSDT"))
+    cache.set("other", 2, ("prices", "ETHUSDT"))
+    cache.invalidate("prices", ["BTCUSDT"])
+    assert cache.get("page") is None and cache.get("other") == 2
+    # A second write within the TTL leaves the fresh page alone; it expires by itself
+    cache.set("page", 3, ("prices", "BTCUSDT"))
+    cache.invalidate("prices", ["BTCUSDT"])
+    assert cache.get("page") == 3
+    time.sleep(0.2)
+    cache.set("page", 4, ("prices", "BTCUSDT"))
+    cache.invalidate("prices", ["BTCUSDT"])
+    assert cache.get("page") is None
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.api.endpoints.stream import sse_events
+from app.core.live_feed import LiveFeed, live_feed
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.fanout import run_fanout
+from benchmarks.synthetic import DepthStream
+
+
+def test_fanout_filters_and_evicts_slow_subscribers():
+    feed = LiveFeed(buffer_size=4)
+
+    async def main():
+        everything = feed.subscribe()
+        signals = feed.subscribe(["signal"])
+        eth = feed.subscribe(["tick"], ["ethusdt"])
+
+        def publish():
+            for i in range(3):
+                feed.publish_tick(("BTCUSDT", "ETHUSDT")[i % 2], 100.0 + i, [1.0, 2.0], [1.5, 2.5])
+            feed.publish_signal({"symbol": "BTCUSDT", "signal": "open", "price": 103.0})
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        thread.join()
+        received = [await everything.get() for _ in range(4)]
+        assert [topic for topic, _ in received] == ["tick"] * 3 + ["signal"]
+        assert json.loads(received[0][1])["sma_short"] == 2.0
+        assert json.loads((await signals.get())[1])["price"] == 103.0
+        assert json.loads((await eth.get())[1])["wap"] == 101.0
+
+        # `everything` keeps up; `signals` never reads and overflows its buffer of 4
+        for i in range(5):
+            feed.publish_signal({"symbol": "BTCUSDT", "signal": "close", "price": float(i)})
+            await asyncio.sleep(0)
+            assert (await everything.get())[0] == "signal"
+        await asyncio.sleep(0)
+        assert signals.evicted and await signals.get() is None
+        assert not everything.evicted and not eth.evicted
+
+        everything.close()
+        assert await everything.get() is None
+        assert feed._subscribers == [eth]
+
+    asyncio.run(main())
+
+
+def test_sse_framing_and_websocket_endpoint():
+    feed = LiveFeed(buffer_size=8)
+
+    async def sse():
+        subscription = feed.subscribe(["tick"])
+        events = sse_events(subscription, heartbeat=0.01)
+        assert await events.__anext__() == "retry: 1000\n\n"
+        assert await events.__anext__() == ": keep-alive\n\n"
+        feed.publish_tick("BTCUSDT", 100.0, [1.0, 1.0], [2.0, 2.0])
+        frame = await events.__anext__()
+        await events.aclose()
+        return frame, subscription
+
+    frame, subscription = asyncio.run(sse())
+    assert frame.startswith("event: tick\ndata: {")
+    assert subscription.closed
+
+    from app.main import app
+    client = TestClient(app)
+    with client.websocket_connect("/stream/ws?topics=tick&symbols=btcusdt") as ws:
+        live_feed.publish_tick("ETHUSDT", 1.0, [1.0, 1.0], [2.0, 2.0])
+        live_feed.publish_tick("BTCUSDT", 2.0, [1.0, 1.0], [2.0, 2.0])
+        assert ws.receive_json()["wap"] == 2.0
+    assert client.get("/stream/sse?topics=bogus").status_code == 400
+
+
+def test_handler_publishes_every_tick(tmp_path):
+    stream = DepthStream(levels=10, seed=5)
+    config = Config(SNAPSHOT_FIXTURE=stream.write_snapshot(str(tmp_path)), RECEIVE_QUEUE_SIZE=0)
+    messages = stream.messages(50)
+
+    async def main():
+        subscription = live_feed.subscribe(["tick"])
+        handler = WebSocketHandler(config, tick_writer=MemorySink())
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, lambda: [
+                handler._process_message(message) for message in messages])
+            ticks = [json.loads((await subscription.get())[1]) for _ in range(50)]
+        finally:
+            subscription.close()
+            handler.close()
+        return handler.tick_writer.ticks, ticks
+
+    written, published = asyncio.run(main())
+    assert [tick["wap"] for tick in published] == [wap for _, wap in written]
+
+
+def test_fanout_benchmark_delivers_to_every_subscriber():
+    result = run_fanout(subscribers=200, events=40, rate=400.0)
+    assert result["delivered"] == 200 * 40 and result["evicted"] == 0
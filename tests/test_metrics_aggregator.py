@@ -0,0 +1,113 @@
+import time
+from app.core.metrics_aggregator import MetricsAggregator
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def incrby(self, key, amount):
+        self.commands.append(("incrby", key, amount))
+
+    def incrbyfloat(self, key, amount):
+        self.commands.append(("incrbyfloat", key, amount))
+
+    def execute(self):
+        if self.client.fail:
+            raise ConnectionError("redis is down")
+        self.client.executed.append(self.commands)
+        for _, key, amount in self.commands:
+            self.client.values[key] = self.client.values.get(key, 0) + amount
+        if self.client.lose_reply:
+            raise TimeoutError("Timeout reading from socket")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.fail = False
+        self.lose_reply = False
+        self.executed = []
+        self.values = {}
+        self.transactions = []
+
+    def ping(self):
+        if self.fail:
+            raise ConnectionError("redis is down")
+        return True
+
+    def pipeline(self, transaction=True):
+        self.transactions.append(transaction)
+        return FakePipeline(self)
+
+
+def test_flush_sends_one_transactional_pipeline():
+    client = FakeRedis()
+    aggregator = MetricsAggregator(client, flush_interval=60.0)
+    for _ in range(100):
+        aggregator.incr('message_count')
+        aggregator.incrbyfloat('latency_sum', 0.5)
+    aggregator.incr('data_loss_count', 3)
+
+    assert client.executed == [], "Increments must not reach Redis before a flush"
+    assert aggregator.flush()
+    assert client.transactions == [True]
+    assert sorted(client.executed[0]) == [
+        ("incrby", 'data_loss_count', 3),
+        ("incrby", 'message_count', 100),
+        ("incrbyfloat", 'latency_sum', 50.0),
+    ]
+    assert aggregator.pending() == {}
+
+
+def test_failed_flush_keeps_counts_for_next_attempt():
+    client = FakeRedis()
+    client.fail = True
+    aggregator = MetricsAggregator(client, flush_interval=60.0)
+    aggregator.incr('error_count')
+    assert not aggregator.flush()
+
+    aggregator.incr('error_count')
+    client.fail = False
+    assert aggregator.flush()
+    assert client.values == {'error_count': 2}
+
+
+def test_ambiguous_flush_is_not_resent():
+    client = FakeRedis()
+    aggregator = MetricsAggregator(client, flush_interval=60.0)
+    aggregator.incr('message_count', 5)
+    # EXEC was applied but its reply was lost: re-sending would count the 5 twice
+    client.lose_reply = True
+    assert not aggregator.flush()
+    assert aggregator.pending() == {}
+
+    client.lose_reply = False
+    aggregator.incr('message_count')
+    assert aggregator.flush()
+    assert client.values == {'message_count': 6}
+
+
+def test_flush_every_wakes_background_flusher():
+    client = FakeRedis()
+    aggregator = MetricsAggregator(client, flush_interval=60.0, flush_every=10)
+    aggregator.start()
+    try:
+        for _ in range(10):
+            aggregator.incr('message_count')
+        for _ in range(100):
+            if client.values:
+                break
+            time.sleep(0.01)
+        assert client.values == {'message_count': 10}
+    finally:
+        aggregator.stop()
+
+
+def test_stop_flushes_pending_counts():
+    client = FakeRedis()
+    aggregator = MetricsAggregator(client, flush_interval=60.0)
+    aggregator.start()
+    aggregator.incr('message_count', 5)
+    aggregator.stop()
+    assert client.values == {'message_count': 5}
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pytest
+from app.services.order_book import OrderBook, OrderBookSync, FileSnapshotSource
+from app.services.indicator import calculate_wap
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "btcusdt_depth_snapshot.json")
+
+
+def diff(first_id, last_id, bids=(), asks=()):
+    return {"e": "depthUpdate", "U": first_id, "u": last_id, "b": list(bids), "a": list(asks)}
+
+
+@pytest.fixture
+def book():
+    return OrderBook(capacity=8)
+
+
+@pytest.fixture
+def sync(book):
+    return OrderBookSync(book, FileSnapshotSource(FIXTURE), retry_delay=0.0)
+
+
+def test_snapshot_sorted_best_first(book):
+    book.load_snapshot(FileSnapshotSource(FIXTURE)())
+    assert book.bid_count == 3 and book.ask_count == 3
+    assert list(book.bids[:3, 0]) == [100.0, 99.5, 99.0]
+    assert list(book.asks[:3, 0]) == [100.5, 101.0, 101.5]
+    assert not book.bids[3:].any(), "Unused ladder rows must stay zeroed"
+
+
+def test_level_insert_update_remove(book):
+    book.load_snapshot(FileSnapshotSource(FIXTURE)())
+    book.apply_updates(np.array([[99.75, 1.0], [100.0, 0.0], [99.0, 5.0]]), np.empty((0, 2)))
+    assert book.bid_count == 3
+    assert list(book.bids[:3, 0]) == [99.75, 99.5, 99.0]
+    assert book.bids[2, 1] == 5.0
+    assert not book.bids[3:].any()
+
+
+def test_full_ladder_keeps_best_levels():
+    book = OrderBook(capacity=2)
+    book.apply_updates(np.empty((0, 2)), np.array([[10.0, 1.0], [11.0, 1.0], [9.0, 1.0], [12.0, 1.0]]))
+    assert book.ask_count == 2
+    assert list(book.asks[:, 0]) == [9.0, 10.0]
+
+
+def test_wap_reads_top_levels_from_book(book):
+    book.load_snapshot(FileSnapshotSource(FIXTURE)())
+    wap = calculate_wap(book.bids, book.asks, levels=2)
+    expected = (100.0 * 2 + 99.5 * 3 + 100.5 * 1.5 + 101.0 * 2.5) / 9.0
+    assert abs(wap - expected) < 1e-9
+
+
+def test_sync_drops_stale_and_applies_bridging_event(sync, book):
+    assert not sync.on_diff(diff(990, 995, bids=[["1.0", "1.0"]]))
+    assert not sync.synced
+    assert sync.on_diff(diff(998, 1003, bids=[["100.25", "1.0"]]))
+    assert sync.synced
+    assert book.last_update_id == 1003
+    assert book.bids[0, 0] == 100.25
+    assert 1.0 not in book.bids[:book.bid_count, 0]
+
+
+def test_sync_applies_sequential_events_and_ignores_stale(sync, book):
+    sync.on_diff(diff(1001, 1002))
+    assert sync.on_diff(diff(1003, 1004, asks=[["100.50", "0"]]))
+    assert book.asks[0, 0] == 101.0
+    assert not sync.on_diff(diff(1000, 1004))
+    assert book.last_update_id == 1004
+
+
+def test_gap_triggers_resync(sync, book):
+    sync.on_diff(diff(1001, 1002))
+    assert sync.synced
+    assert not sync.on_diff(diff(1010, 1012))
+    # The fixture snapshot (id 1000) no longer bridges the stream, so the book stays unsynced
+    assert not sync.synced
+    assert book.bid_count == 0 and book.ask_count == 0
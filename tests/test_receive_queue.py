@@ -0,0 +1,92 @@
+import json
+import threading
+import pytest
+from app.websocket.receive_queue import ReceiveQueue, merge_depth_events
+from app.services.order_book import OrderBook, _as_levels
+
+
+def event(symbol, first_id, last_id, bids=(), asks=()):
+    return json.dumps({"stream": f"{symbol.lower()}@depth",
+                       "data": {"s": symbol, "U": first_id, "u": last_id, "b": list(bids), "a": list(asks)}})
+
+
+def drain(queue):
+    items = []
+    while True:
+        item = queue.get(timeout=0)
+        if item is None:
+            return items
+        items.append(item[0])
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        ReceiveQueue(10, "latest")
+
+
+def test_drop_oldest_keeps_newest_messages():
+    queue = ReceiveQueue(2, "drop_oldest")
+    for i in range(4):
+        queue.put(f"m{i}")
+    assert drain(queue) == ["m2", "m3"]
+
+
+def test_block_waits_for_space():
+    queue = ReceiveQueue(1, "block")
+    queue.put("first")
+    producer = threading.Thread(target=queue.put, args=("second",))
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive(), "Producer should block while the queue is full"
+    assert queue.get()[0] == "first"
+    producer.join(1.0)
+    assert queue.get()[0] == "second"
+
+
+def test_coalesce_merges_into_pending_event_of_same_symbol():
+    queue = ReceiveQueue(2, "coalesce")
+    queue.put(event("BTCUSDT", 1, 2, bids=[["10", "1"], ["9", "1"]]))
+    queue.put(event("ETHUSDT", 1, 2))
+    queue.put(event("BTCUSDT", 3, 4, bids=[["10", "0"], ["11", "2"]]))
+    items = drain(queue)
+    assert len(items) == 2
+    merged = items[0]["data"]
+    assert (merged["U"], merged["u"]) == (1, 4)
+    assert sorted(merged["b"]) == [["10", "0"], ["11", "2"], ["9", "1"]]
+    assert json.loads(items[1])["data"]["s"] == "ETHUSDT"
+
+
+def test_coalesce_decodes_outside_the_lock(monkeypatch):
+    queue = ReceiveQueue(1, "coalesce")
+    loads = json.loads
+
+    def unlocked_loads(text):
+        assert not queue._lock.locked(), "JSON decoded while holding the queue lock"
+        return loads(text)
+
+    monkeypatch.setattr("app.websocket.receive_queue.json.loads", unlocked_loads)
+    for i in range(4):
+        queue.put(event("BTCUSDT", 2 * i + 1, 2 * i + 2, asks=[[str(10 + i), "1"], ["10", str(i)]]))
+    [merged] = drain(queue)
+    assert (merged["data"]["U"], merged["data"]["u"]) == (1, 8)
+    assert sorted(merged["data"]["a"]) == [["10", "3"], ["11", "1"], ["12", "1"], ["13", "1"]]
+
+
+def test_merged_event_matches_sequential_application():
+    first = json.loads(event("BTCUSDT", 1, 2, bids=[["10", "1"], ["9", "1"]], asks=[["12", "1"]]))
+    second = json.loads(event("BTCUSDT", 3, 4, bids=[["10", "0"], ["11", "2"]], asks=[["12", "3"], ["13", "1"]]))
+
+    sequential, merged = OrderBook(8), OrderBook(8)
+    for e in (first, second):
+        sequential.apply_updates(_as_levels(e["data"]["b"]), _as_levels(e["data"]["a"]))
+    combined = merge_depth_events(first, second)["data"]
+    merged.apply_updates(_as_levels(combined["b"]), _as_levels(combined["a"]))
+    assert (sequential.bids == merged.bids).all() and (sequential.asks == merged.asks).all()
+
+
+def test_close_releases_consumer():
+    queue = ReceiveQueue(2)
+    queue.put("pending")
+    queue.close()
+    assert queue.get()[0] == "pending"
+    assert queue.get() is None
@@ -0,0 +1,86 @@
+import json
+import os
+import gzip
+from app.websocket.config import Config
+from app.websocket.recorder import MESSAGE, SNAPSHOT, read_recording
+from app.websocket.replay import MemorySink, ReplayEngine
+from app.websocket.websocket_handler import WebSocketHandler
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "btcusdt_depth_snapshot.json")
+
+
+def depth_messages(count):
+    # Bid size at the top level rises then falls, pushing WAP up and back down
+    messages = []
+    for i in range(count):
+        qty = 1.0 + (i if i < count // 2 else count - i)
+        messages.append(json.dumps({
+            "stream": "btcusdt@depth",
+            "data": {"e": "depthUpdate", "s": "BTCUSDT", "U": 1001 + i, "u": 1001 + i,
+                     "b": [["100.00", str(qty)]], "a": []}
+        }))
+    return messages
+
+
+def record_session(path, messages):
+    config = Config(SHORT_WINDOW=2, LONG_WINDOW=4, SNAPSHOT_FIXTURE=FIXTURE,
+                    RECEIVE_QUEUE_SIZE=0, RECORD_PATH=path)
+    sink = MemorySink()
+    handler = WebSocketHandler(config, tick_writer=sink)
+    handler.symbols["BTCUSDT"].signal_processor.session_factory = sink.session
+    for message in messages:
+        handler.on_message(None, message)
+    handler.close()
+    return sink
+
+
+def test_recording_is_append_only(tmp_path):
+    path = str(tmp_path / "depth.gz")
+    messages = depth_messages(6)
+    record_session(path, messages[:3])
+    record_session(path, messages[3:])
+
+    records = list(read_recording(path))
+    assert [r.payload for r in records if r.kind == MESSAGE] == messages
+    assert [r.symbol for r in records if r.kind == SNAPSHOT] == ["BTCUSDT", "BTCUSDT"]
+
+
+def test_truncated_recording_is_read_up_to_the_cut(tmp_path):
+    path = str(tmp_path / "depth.gz")
+    record_session(path, depth_messages(50))
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = str(tmp_path / "cut.gz")
+    with open(cut, "wb") as f:
+        f.write(data[:len(data) // 2])
+
+    with gzip.open(path, "rt") as f:
+        total = len(f.readlines())
+    assert 0 < len(list(read_recording(cut))) < total
+
+
+def test_replay_reproduces_live_session(tmp_path):
+    path = str(tmp_path / "depth.gz")
+    live = record_session(path, depth_messages(40))
+    assert live.signals(), "Test stream should produce crossovers"
+
+    result = ReplayEngine(Config(SHORT_WINDOW=2, LONG_WINDOW=4), path).run()
+    assert result.messages == 40
+    assert result.ticks == len(live.ticks)
+    assert result.messages_per_second > 0
+    strip = lambda signals: [{k: v for k, v in s.items() if k != "timestamp"} for s in signals]
+    assert strip(result.signals) == strip(live.signals())
+
+
+def test_replay_never_reaches_the_live_feed(tmp_path, monkeypatch):
+    from app.core.live_feed import live_feed
+    path = str(tmp_path / "depth.gz")
+    record_session(path, depth_messages(40))
+
+    # As if LIVE_FEED_REDIS_CHANNEL were set for the process running the replay
+    published = []
+    monkeypatch.setattr(live_feed, "redis_channel", "live")
+    monkeypatch.setattr(live_feed, "_forward", lambda *event: published.append(event))
+    result = ReplayEngine(Config(SHORT_WINDOW=2, LONG_WINDOW=4), path).run()
+    assert result.ticks and result.signals
+    assert published == []
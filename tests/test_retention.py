@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.models import Price
+from app.services.retention import (
+    PriceRetention, expire_partition_ddl, partition_ddl, partition_name, read_archive
+)
+
+TODAY = date(2024, 3, 1)
+
+
+def test_sqlite_expires_old_days_into_archives(tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    start = datetime.combine(TODAY - timedelta(days=40), datetime.min.time())
+    rows = [{"timestamp": start + timedelta(hours=6 * i), "symbol": ("BTCUSDT", "ETHUSDT")[i % 2], "wap": 100.0 + i}
+            for i in range(4 * 40)]
+    with engine.begin() as conn:
+        conn.execute(Price.__table__.insert(), rows)
+
+    job = PriceRetention(engine, retention_days=30, archive_dir=str(tmp_path), batch_size=3)
+    job.prepare(TODAY)
+    assert job.run(TODAY)["expired"] == [(TODAY - timedelta(days=40 - d)).isoformat() for d in range(10)]
+    assert job.expire(TODAY) == []
+
+    cutoff = datetime.combine(TODAY - timedelta(days=30), datetime.min.time())
+    with engine.connect() as conn:
+        assert conn.execute(select(func.min(Price.timestamp))).scalar() == cutoff
+        assert conn.execute(select(func.count(Price.id))).scalar() == 4 * 30
+
+    first_day = read_archive(str(tmp_path / f"prices_{start:%Y%m%d}.npz"))
+    assert list(first_day["timestamp"].astype(datetime)) == [row["timestamp"] for row in rows[:4]]
+    assert list(first_day["symbol"]) == [row["symbol"] for row in rows[:4]]
+    np.testing.assert_array_equal(first_day["wap"], [row["wap"] for row in rows[:4]])
+    assert len(list(tmp_path.glob("prices_*.npz"))) == 10
+
+
+def test_partition_ddl_attaches_one_day():
+    day = date(2024, 2, 29)
+    assert partition_name(day) == "prices_p20240229"
+    statements = partition_ddl(day)
+    assert statements[0].startswith("CREATE TABLE IF NOT EXISTS prices_p20240229 (LIKE prices")
+    # Rows of the day that landed in the default partition move in before the attach
+    assert statements[2] == ("WITH moved AS (DELETE FROM prices_default WHERE timestamp >= '2024-02-29' AND "
+                             "timestamp < '2024-03-01' RETURNING *) INSERT INTO prices_p20240229 SELECT * FROM moved")
+    assert "FOR VALUES FROM ('2024-02-29') TO ('2024-03-01')" in statements[3]
+    assert statements[-1].endswith("DROP CONSTRAINT prices_p20240229_bounds")
+
+
+def test_expired_partitions_are_detached_then_dropped():
+    name = "prices_p20240101"
+    assert expire_partition_ddl(name, (16, 2)) == [
+        f"ALTER TABLE prices DETACH PARTITION {name} CONCURRENTLY", f"DROP TABLE {name}"]
+    # Older servers detach too, rather than truncating a partition that stays attached forever
+    assert expire_partition_ddl(name, (13, 9)) == [f"ALTER TABLE prices DETACH PARTITION {name}", f"DROP TABLE {name}"]
+    # A concurrent detach cancelled by lock_timeout can only be finished with FINALIZE
+    assert expire_partition_ddl(name, (16, 2), pending=True) == [
+        f"ALTER TABLE prices DETACH PARTITION {name} FINALIZE", f"DROP TABLE {name}"]
+    # Detached by an earlier run that could not drop it
+    assert expire_partition_ddl(name, (16, 2), attached=False) == [f"DROP TABLE {name}"]
+
+
+class FakePostgres:
+    """Just enough of an Engine to record the statements the job runs against a PostgreSQL 16 catalog."""
+    def __init__(self, tables, partitions=(), default_days=()):
+        self.dialect = type("Dialect", (), {"name": "postgresql", "server_version_info": (16, 2)})()
+        self.tables = tables
+        self.partitions = list(partitions)
+        self.default_days = list(default_days)
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    def execution_options(self, **options):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement):
+        sql = str(statement)
+        self.statements.append(sql)
+        rows = self.tables if "FROM pg_class" in sql else [(1,)] if "pg_partitioned_table" in sql else []
+        values = self.partitions if "FROM pg_inherits" in sql else self.default_days if "prices_default" in sql else []
+        return type("Result", (), {"fetchall": lambda _: rows, "first": lambda _: rows[0] if rows else None,
+                                   "scalars": lambda _: iter(values)})()
+
+    def begin(self):
+        return self
+
+
+def test_expire_finishes_interrupted_detaches():
+    bind = FakePostgres([("prices_p20240101", True, True), ("prices_p20240102", True, False),
+                         ("prices_p20240103", False, False), ("prices_p20240301", True, False)])
+    job = PriceRetention(bind, retention_days=30)
+    assert job.expire(TODAY) == ["prices_p20240101", "prices_p20240102", "prices_p20240103"]
+    ddl = [sql for sql in bind.statements if sql.startswith(("ALTER", "DROP"))]
+    assert ddl == [
+        "ALTER TABLE prices DETACH PARTITION prices_p20240101 FINALIZE", "DROP TABLE prices_p20240101",
+        "ALTER TABLE prices DETACH PARTITION prices_p20240102 CONCURRENTLY", "DROP TABLE prices_p20240102",
+        "DROP TABLE prices_p20240103",
+    ]
+
+
+def test_days_in_the_default_partition_get_partitions_of_their_own():
+    # A spool replayed after a long outage put 2024-01-20 in the default partition
+    bind = FakePostgres([], partitions=["prices_p20240301", "prices_p20240302"], default_days=[date(2024, 1, 20)])
+    job = PriceRetention(bind, retention_days=30, days_ahead=1)
+    assert job.ensure_partitions(TODAY) == ["prices_p20240120"]
+    assert any(sql.startswith("WITH moved AS (DELETE FROM prices_default WHERE timestamp >= '2024-01-20'")
+               for sql in bind.statements)
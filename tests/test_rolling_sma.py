@@ -0,0 +1,53 @@
+from collections import deque
+import numpy as np
+import pytest
+from app.services.indicator import calculate_last_two_sma
+from app.services.streaming_indicators import create_indicator
+from app.websocket.price_manager import PriceManager, RingBuffer
+
+WINDOWS = (1, 7, 50, 200, 201)
+
+
+def random_walk(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return 30000.0 * np.exp(np.cumsum(rng.normal(0.0, 1e-3, n)))
+
+
+@pytest.mark.parametrize("compensated", [True, False])
+def test_sma_kernel_matches_numba_reference(compensated):
+    capacity = 201
+    indicators = {window: create_indicator(f"sma:{window}", compensated) for window in WINDOWS}
+    out = np.zeros(1)
+    history = deque(maxlen=capacity)
+
+    for step, price in enumerate(random_walk(20000)):
+        history.append(price)
+        for window, indicator in indicators.items():
+            indicator.update(price, 1.0, out, 0)
+            if step % 37 and step < 20000 - 5:
+                continue
+            if len(history) < window:
+                assert np.isnan(out[0]), f"window={window} step={step}"
+                continue
+            expected = calculate_last_two_sma(np.array(history, dtype=float), window)[1]
+            np.testing.assert_allclose(out[0], expected, rtol=1e-9, err_msg=f"window={window} step={step}")
+
+
+def test_price_manager_skips_invalid_prices():
+    manager = PriceManager(5, indicators=("sma:2",))
+    for price in [1.0, np.nan, 2.0, -1.0, 3.0]:
+        manager.add_price(price)
+    assert list(manager.price_history) == [1.0, 2.0, 3.0]
+    assert list(manager.features.previous) == [1.5]
+    assert list(manager.features.current) == [2.5]
+
+
+def test_ring_buffer_keeps_the_newest_values():
+    ring = RingBuffer(3)
+    assert len(ring) == 0 and list(ring.values()) == []
+    for value in (1.0, 2.0):
+        ring.push(value)
+    assert list(ring.values()) == [1.0, 2.0]
+    for value in (3.0, 4.0, 5.0, 6.0, 7.0):
+        ring.push(value)
+    assert len(ring) == 3 and list(ring.values()) == [5.0, 6.0, 7.0]
@@ -50,21 +50,25 @@ class DummyQuery:
     def __init__(self, items):
         self.items = items
 
-    def filter(self, condition):
-        """Simple filter implementation focusing on Order.status."""
-        filtered = []
-        status_check = str(condition)
-        for item in self.items:
-            if "status" in status_check:
-                if getattr(item, 'status', None) == "open":
-                    filtered.append(item)
-        print(str(status_check) + "-" * 20)
+    def filter(self, *conditions):
+        """Simple filter implementation for `Model.column == value` conditions."""
+        filtered = self.items
+        for condition in conditions:
+            key, value = condition.left.key, condition.right.value
+            filtered = [item for item in filtered if getattr(item, key, None) == value]
         return DummyQuery(filtered)
 
     def with_for_update(self, skip_locked=False):
         """Simulate row-level locking."""
         return self
 
+    def update(self, values, synchronize_session=None):
+        """Bulk UPDATE of the filtered rows; returns the matched row count."""
+        for item in self.items:
+            for key, value in values.items():
+                setattr(item, key, value)
+        return len(self.items)
+
     def first(self):
         """Return the first item or None."""
         return self.items[0] if self.items else None
@@ -172,6 +176,7 @@ def test_signal_processor_duplicate_open(signal_processor, order_state, mock_db)
     """Test duplicate open signal handling."""
     # Create pre-existing open order
     existing_order = Order(
+        symbol="BTCUSDT",
         status="open",
         side="long",
         price=100.0,
@@ -313,4 +318,51 @@ def test_signal_processor_signal_details(signal_processor, order_state, mock_db)
     assert details['price'] == price, "Wrong price in details"
     assert details['sma_short'] == float(sma_short[-1]), "Wrong short SMA in details"
     assert details['sma_long'] == float(sma_long[-1]), "Wrong long SMA in details"
-    assert 'timestamp' in details, "Missing timestamp in details"
\ No newline at end of file
+    assert 'timestamp' in details, "Missing timestamp in details"
+
+
+def test_signal_processor_orders_are_per_symbol(config, price_manager, mock_db):
+    """An open order on one symbol does not block opening another symbol."""
+    btc = SignalProcessor(config, price_manager, OrderState(), symbol="BTCUSDT")
+    eth = SignalProcessor(config, price_manager, OrderState(), symbol="ETHUSDT")
+    sma_short = np.array([100.0, 105.0])
+    sma_long = np.array([100.0, 100.0])
+
+    btc.process_signal(110.0, sma_short, sma_long)
+    eth.process_signal(2000.0, sma_short, sma_long)
+    assert sorted(order.symbol for order in mock_db['orders']) == ["BTCUSDT", "ETHUSDT"]
+    assert [signal.symbol for signal in mock_db['signals']] == ["BTCUSDT", "ETHUSDT"]
+
+    eth.process_signal(1900.0, np.array([110.0, 90.0]), sma_long)
+    statuses = {order.symbol: order.status for order in mock_db['orders']}
+    assert statuses == {"BTCUSDT": "open", "ETHUSDT": "closed"}
+
+
+def test_cached_order_state_is_safe_across_instances(config, price_manager):
+    """Two instances share one database; stale caches are caught by the database, not by extra reads."""
+    from sqlalchemy import event
+    from app.websocket.replay import MemorySink
+    db = MemorySink()
+    selects = []
+    event.listen(db.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: selects.append(statement) if statement.startswith("SELECT") else None)
+    first = SignalProcessor(config, price_manager, OrderState(), session_factory=db.session)
+    second = SignalProcessor(config, price_manager, OrderState(), session_factory=db.session)
+    up = (np.array([100.0, 105.0]), np.array([100.0, 100.0]))
+    down = (np.array([110.0, 90.0]), np.array([100.0, 100.0]))
+
+    second.process_signal(90.0, *down)          # seeds the second cache: no open order
+    first.process_signal(110.0, *up)            # seeds, then opens
+    second.process_signal(111.0, *up)           # stale cache: the partial unique index rejects it
+    assert not second.order_state.synced
+    with db.session() as session:
+        assert session.query(Order).filter(Order.status == "open").count() == 1
+
+    selects.clear()
+    first.process_signal(95.0, *down)           # closes from the cache with no read query
+    assert not [statement for statement in selects if "FROM orders" in statement]
+    second.process_signal(94.0, *down)          # reloads, finds nothing left to close
+    with db.session() as session:
+        orders = session.query(Order).all()
+        assert [(order.status, order.close_price) for order in orders] == [("closed", 95.0)]
+        assert [signal.signal_type for signal in session.query(TradingSignal).order_by(TradingSignal.id)] == ["open", "close"]
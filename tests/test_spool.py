@@ -0,0 +1,164 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base
+from app.models.models import Order, Price, PriceBar, SpoolCheckpoint, TradingSignal
+from app.services.bars import BarAggregator
+from app.services.signal_processor import SignalProcessor
+from app.services.spool import Spool, SpoolReplayer, is_unavailable
+from app.services.tick_writer import TickWriter
+from app.websocket.config import Config
+from app.websocket.order_state import OrderState
+
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def down_engine(tmp_path):
+    # Connecting fails with OperationalError, like a database that is down
+    return create_engine(f"sqlite:///{tmp_path / 'missing' / 'app.db'}")
+
+
+def session_factory(engine):
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def factory():
+        session = Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    return factory
+
+
+def test_spool_rotates_and_stops_at_torn_tail(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=200, fsync=False)
+    assert not spool.active
+    assert not spool.append_if_active("ticks", {"rows": []})
+    for i in range(10):
+        spool.append("ticks", {"rows": [[datetime(2024, 1, 1, 0, 0, i), "BTCUSDT", 100.0 + i]]})
+    assert spool.active and spool.append_if_active("ticks", {"rows": []})
+    segments = spool.seal()
+    assert len(segments) > 1
+    with open(segments[-1], "ab") as f:
+        f.write(b"\x40\x00\x00\x00torn")
+
+    records = [record for path in segments for _, record in Spool.read(path)]
+    assert [record["rows"][0][2] for record in records[:10]] == [100.0 + i for i in range(10)]
+    assert records[0]["rows"][0][0] == "2024-01-01T00:00:00"
+
+    # A restarted writer finds the pending segments and appends after them
+    reopened = Spool(str(tmp_path), segment_bytes=200, fsync=False)
+    assert reopened.active and reopened.size_bytes == spool.size_bytes + 8
+    reopened.append("ticks", {"rows": []})
+    assert reopened.seal()[-1] > segments[-1]
+
+
+def test_ticks_and_bars_are_spooled_while_the_database_is_down(tmp_path, memory_engine, down_engine, monkeypatch):
+    spool = Spool(str(tmp_path), fsync=False)
+    writer = TickWriter(batch_size=5, flush_interval=60.0, bind=down_engine, bars=BarAggregator((1,)), spool=spool)
+    writer.start()
+    for i in range(12):
+        writer.submit(100.0 + i, timestamp=datetime(2024, 1, 1, 0, 0, i // 2), symbol="BTCUSDT")
+    writer.stop()
+    assert spool.active and spool.lag() >= 0.0
+
+    # Still down: nothing is lost and the spool stays active
+    replayer = SpoolReplayer(spool, bind=down_engine, session_factory=session_factory(down_engine))
+    assert not replayer.drain()
+    assert spool.active
+
+    # Every other replayed batch "crashes" after its commit but before the file checkpoint
+    real_checkpoint, calls = Spool.set_checkpoint, []
+
+    def crashing_checkpoint(path, offset):
+        calls.append(offset)
+        if len(calls) % 2:
+            raise RuntimeError("crashed")
+        real_checkpoint(path, offset)
+
+    monkeypatch.setattr(Spool, "set_checkpoint", staticmethod(crashing_checkpoint))
+    replayer = SpoolReplayer(spool, bind=memory_engine, session_factory=session_factory(memory_engine), batch_rows=4)
+    for attempt in range(20):
+        try:
+            assert replayer.drain()
+            break
+        except RuntimeError:
+            pass
+    assert len(calls) > 4
+    assert not spool.active and spool.size_bytes == 0 and not spool.segments()
+    with memory_engine.connect() as conn:
+        prices = conn.execute(Price.__table__.select().order_by(Price.id)).fetchall()
+        bars = conn.execute(PriceBar.__table__.select().order_by(PriceBar.bucket_start)).fetchall()
+    assert [row.wap for row in prices] == [100.0 + i for i in range(12)], \
+        "Replay must keep the original order and write each tick once"
+    assert prices[0].timestamp == datetime(2024, 1, 1)
+    assert [(bar.open, bar.close, bar.tick_count) for bar in bars] == \
+        [(100.0 + 2 * i, 101.0 + 2 * i, 2) for i in range(6)]
+    with memory_engine.connect() as conn:
+        assert not conn.execute(SpoolCheckpoint.__table__.select()).fetchall()
+
+
+def test_signals_are_spooled_and_replayed_against_current_orders(tmp_path, memory_engine, down_engine):
+    spool = Spool(str(tmp_path), fsync=False)
+    order_state = OrderState()
+    processor = SignalProcessor(Config(), None, order_state, symbol="BTCUSDT",
+                                session_factory=session_factory(down_engine), spool=spool)
+    rising, falling = (np.array([9.0, 11.0]), np.array([10.0, 10.0])), (np.array([11.0, 9.0]), np.array([10.0, 10.0]))
+    processor.process_signal(100.0, *rising)
+    assert spool.active and not order_state.synced
+    # The database is back, but writes keep going to the spool until it is replayed
+    processor.session_factory = session_factory(memory_engine)
+    processor.process_signal(101.0, *falling)
+    processor.process_signal(102.0, *falling)   # a second close, which replay skips
+    with memory_engine.connect() as conn:
+        assert not conn.execute(TradingSignal.__table__.select()).fetchall()
+
+    assert SpoolReplayer(spool, bind=memory_engine, session_factory=session_factory(memory_engine)).drain()
+    with memory_engine.connect() as conn:
+        signals = conn.execute(TradingSignal.__table__.select().order_by(TradingSignal.id)).fetchall()
+        orders = conn.execute(Order.__table__.select()).fetchall()
+    assert [(signal.signal_type, signal.price) for signal in signals] == [("open", 100.0), ("close", 101.0)]
+    assert len(orders) == 1 and orders[0].status == "closed" and orders[0].close_price == 101.0
+    assert orders[0].created_at == signals[0].timestamp, "Replay keeps the time of the crossover"
+
+    # Direct writes resume, with the order state reloaded from the database
+    processor.process_signal(103.0, *rising)
+    with memory_engine.connect() as conn:
+        assert conn.execute(Order.__table__.select().where(Order.status == "open")).fetchone().price == 103.0
+
+    # Without a spool the failure still surfaces to the caller
+    processor.spool, processor.session_factory = None, session_factory(down_engine)
+    with pytest.raises(OperationalError):
+        processor.process_signal(104.0, *falling)
+
+
+class PgError(Exception):
+    def __init__(self, pgcode, message):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+def test_a_tick_without_a_partition_is_spooled_not_dropped():
+    missing = PgError("23514", 'no partition of relation "prices" found for row')
+    assert is_unavailable(IntegrityError("INSERT INTO prices", {}, missing))
+    # Other constraint violations are the data's fault
+    assert not is_unavailable(IntegrityError("INSERT", {}, PgError("23514", 'violates check constraint "wap_positive"')))
+    assert not is_unavailable(IntegrityError("INSERT", {}, PgError("23505", "duplicate key value")))
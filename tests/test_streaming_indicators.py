@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from app.services.streaming_indicators import FeatureEngine, create_indicator
+from app.services.signal_rules import CrossoverRule
+from app.websocket.config import Config
+
+
+def random_walk(n, seed=11):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0, 5e-3, n)))
+
+
+def reference_ema(prices, period):
+    value = prices[0]
+    for price in prices[1:]:
+        value += 2.0 / (period + 1.0) * (price - value)
+    return value
+
+
+def reference_rsi(prices, period):
+    changes = np.diff(prices)
+    gains, losses = np.clip(changes, 0, None), np.clip(-changes, 0, None)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def test_indicators_match_reference():
+    prices = random_walk(3000)
+    volumes = np.random.default_rng(5).uniform(0.5, 2.0, len(prices))
+    engine = FeatureEngine(("sma:20", "ema:20", "wma:20", "bollinger:20:2", "rsi:14", "vwap:30"))
+    for price, volume in zip(prices, volumes):
+        engine.update(price, volume)
+
+    window = prices[-20:]
+    weights = np.arange(1, 21)
+    assert engine.get("sma:20") == pytest.approx(window.mean(), rel=1e-9)
+    assert engine.get("ema:20") == pytest.approx(reference_ema(prices, 20), rel=1e-9)
+    assert engine.get("wma:20") == pytest.approx((window * weights).sum() / weights.sum(), rel=1e-9)
+    assert engine.get("bollinger:20:2.middle") == pytest.approx(window.mean(), rel=1e-9)
+    assert engine.get("bollinger:20:2.upper") == pytest.approx(window.mean() + 2 * window.std(), rel=1e-6)
+    assert engine.get("bollinger:20:2.lower") == pytest.approx(window.mean() - 2 * window.std(), rel=1e-6)
+    assert engine.get("rsi:14") == pytest.approx(reference_rsi(prices, 14), rel=1e-9)
+    assert engine.get("vwap:30") == pytest.approx(
+        (prices[-30:] * volumes[-30:]).sum() / volumes[-30:].sum(), rel=1e-9)
+
+
+def test_features_are_nan_until_warm():
+    engine = FeatureEngine(("sma:3", "rsi:3"))
+    for price in (1.0, 2.0):
+        engine.update(price)
+        assert np.isnan(engine.get("sma:3"))
+    engine.update(3.0)
+    assert engine.get("sma:3") == 2.0
+    assert np.isnan(engine.get("rsi:3"))
+    engine.update(4.0)
+    assert engine.get("rsi:3") == 100.0
+
+
+def test_unknown_volumes_skip_volume_weighted_indicators():
+    engine = FeatureEngine(("sma:2", "vwap:2"))
+    for price in (1.0, 2.0, 3.0):
+        engine.update(price, np.nan)
+    assert engine.get("sma:2") == 2.5 and np.isnan(engine.get("vwap:2"))
+    engine.update(4.0, 2.0)
+    engine.update(6.0, 1.0)
+    assert engine.get("vwap:2") == pytest.approx(14.0 / 3.0)
+
+
+def test_unknown_indicator_rejected():
+    with pytest.raises(ValueError):
+        create_indicator("macd:12:26")
+
+
+def test_crossover_rule_reads_previous_and_current():
+    engine = FeatureEngine(("sma:1", "sma:3"))
+    rule = CrossoverRule("sma:1", "sma:3")
+    for price in (10.0, 10.0, 10.0, 13.0):
+        engine.update(price)
+    fast, slow = rule.inputs(engine)
+    assert list(fast) == [10.0, 13.0]
+    assert list(slow) == [10.0, 11.0]
+
+
+def test_config_adds_signal_indicators():
+    config = Config(INDICATORS=("ema:20",), SIGNAL_SLOW="bollinger:20:2.middle")
+    assert config.SIGNAL_FAST == "sma:50"
+    assert config.INDICATORS == ("ema:20", "sma:50", "bollinger:20:2")
+
+
+def test_sma_compensation_follows_the_setting():
+    prices = 1e6 * np.exp(np.cumsum(np.random.default_rng(3).normal(0.0, 1e-2, 50000)))
+    errors = {}
+    for compensated in (True, False):
+        engine = FeatureEngine(("sma:10",), compensated=compensated)
+        assert engine.indicators[0].compensated is compensated
+        for price in prices:
+            engine.update(price)
+        errors[compensated] = abs(engine.get("sma:10") - prices[-10:].mean())
+    assert errors[True] < errors[False], "SMA_COMPENSATED must reach the SMA indicator"
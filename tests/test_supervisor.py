@@ -0,0 +1,104 @@
+import os
+import random
+import time
+
+from prometheus_client import CollectorRegistry, Counter, generate_latest
+from app.core.metrics import ShardedMetricsView, metrics_view
+from app.websocket.config import Config
+from app.websocket.supervisor import IngestionSupervisor, shard_symbols
+
+
+def test_shard_symbols_is_stable_and_complete():
+    symbols = [f"SYM{i}USDT" for i in range(100)]
+    shards = shard_symbols(symbols, 4)
+    shuffled = random.Random(3).sample(symbols, len(symbols))
+    assert shuffled != symbols
+    assert [sorted(shard) for shard in shards] == [sorted(shard) for shard in shard_symbols(shuffled, 4)]
+    assert sorted(s for shard in shards for s in shard) == sorted(symbols)
+    assert len(shards) == 4
+    assert all(len(shard) > 10 for shard in shards)
+
+
+def test_shard_symbols_drops_empty_shards():
+    assert shard_symbols(["BTCUSDT"], 8) == [["BTCUSDT"]]
+
+
+def test_few_symbols_are_spread_round_robin():
+    shards = shard_symbols(["SOLUSDT", "BTCUSDT", "ETHUSDT", "BNBUSDT", "XRPUSDT"], 4)
+    assert shards == [["BNBUSDT", "XRPUSDT"], ["BTCUSDT"], ["ETHUSDT"], ["SOLUSDT"]]
+
+
+def make_registry(count):
+    registry = CollectorRegistry()
+    Counter("ws_message_count", "messages", registry=registry).inc(count)
+    return registry
+
+
+def test_metrics_view_merges_worker_snapshots():
+    view = ShardedMetricsView(make_registry(0))
+    assert b'ws_message_count_total 0.0' in generate_latest(view)
+
+    view.update_worker("0", list(make_registry(5).collect()))
+    view.update_worker("1", list(make_registry(7).collect()))
+    text = generate_latest(view).decode()
+    type_lines = [line for line in text.splitlines() if line.startswith("# TYPE")]
+    assert len(type_lines) == len(set(type_lines)), "Metric families were duplicated"
+    assert 'ws_message_count_total{worker="main"} 0.0' in text
+    assert 'ws_message_count_total{worker="0"} 5.0' in text
+    assert 'ws_message_count_total{worker="1"} 7.0' in text
+
+    view.remove_worker("0")
+    assert 'worker="0"' not in generate_latest(view).decode()
+
+
+def reporting_worker(worker_id, config, metrics_queue, stop_event, report_interval):
+    # Stands in for _worker_main: reports its pid as a metric until told to stop
+    registry = CollectorRegistry()
+    Counter("worker_pid", "pid", registry=registry).inc(os.getpid())
+    while not stop_event.wait(report_interval):
+        metrics_queue.put((worker_id, list(registry.collect())))
+
+
+def crashing_worker(worker_id, config, metrics_queue, stop_event, report_interval):
+    raise SystemExit(3)
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def worker_pid(worker_id):
+    text = generate_latest(metrics_view).decode()
+    line = next((line for line in text.splitlines()
+                 if line.startswith("worker_pid_total") and f'worker="{worker_id}"' in line), None)
+    return int(float(line.split()[-1])) if line else None
+
+
+def test_supervisor_restarts_dead_workers_and_merges_their_metrics():
+    supervisor = IngestionSupervisor(Config(SYMBOLS=("BTCUSDT", "ETHUSDT")), 2, report_interval=0.05,
+                                     restart_delay=0.1, target=reporting_worker)
+    supervisor.start()
+    try:
+        wait_for(lambda: worker_pid("0") and worker_pid("1"))
+        victim = supervisor._processes["0"]
+        assert worker_pid("0") == victim.pid
+        victim.kill()
+        wait_for(lambda: supervisor._processes["0"] is not victim and worker_pid("0") == supervisor._processes["0"].pid)
+        assert supervisor._processes["1"].is_alive() and not supervisor.failed
+    finally:
+        supervisor.stop(timeout=5.0)
+    assert worker_pid("0") is None and worker_pid("1") is None
+
+
+def test_supervisor_gives_up_on_a_worker_that_keeps_crashing():
+    supervisor = IngestionSupervisor(Config(SYMBOLS=("BTCUSDT",)), 1, restart_delay=0.05, max_restarts=2,
+                                     target=crashing_worker)
+    supervisor.start()
+    try:
+        wait_for(lambda: supervisor.failed == ["0"])
+        assert supervisor._failures["0"] == 3
+    finally:
+        supervisor.stop(timeout=5.0)
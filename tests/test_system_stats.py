@@ -0,0 +1,60 @@
+import threading
+import time
+from unittest.mock import patch
+
+import psutil
+
+from app.core.system_stats import SystemStatsSampler
+
+
+def test_sampler_tracks_ingestion_threads_and_averages():
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            sum(range(1000))
+
+    thread = threading.Thread(target=busy, name="ws-processor", daemon=True)
+    thread.start()
+    sampler = SystemStatsSampler(interval=0.05, history=1.0)
+    try:
+        sampler.start()
+        time.sleep(0.5)
+    finally:
+        sampler.stop()
+        stop.set()
+        thread.join()
+
+    latest = sampler.latest()
+    assert latest.ingestion_threads == 1
+    assert latest.ingestion_cpu_percent > 10
+    assert latest.rss_bytes > 0 and latest.threads >= 2
+    averages = sampler.averages({"1m": 60})
+    assert set(averages) == {"1m"}
+    assert averages["1m"]["ingestion_threads"] == 1
+
+    # In process mode the threads live in the workers, so the fields are not reported
+    untracked = SystemStatsSampler(interval=0.05, track_ingestion=False)
+    sample = untracked.sample()
+    assert sample.ingestion_threads is None and sample.ingestion_cpu_percent is None
+    assert "ingestion_threads" not in untracked.averages({"1m": 60})["1m"]
+
+
+def test_metrics_endpoint_serves_from_the_snapshot():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.redis_client import redis_client
+
+    client = TestClient(app)
+    with patch("psutil.cpu_percent", wraps=psutil.cpu_percent) as cpu_percent, \
+            patch.object(redis_client, "get", side_effect=AssertionError("one MGET expected")):
+        start = time.perf_counter()
+        response = client.get("/metrics", params={"averages": "true"})
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert elapsed < 0.5
+    assert all(call.kwargs.get("interval") is None for call in cpu_percent.call_args_list)
+    data = response.json()
+    assert data["process"]["rss_bytes"] > 0
+    assert data["error_count"] >= 0
+    assert "averages" in data
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.main import app
+from app.models.models import Price
+from app.services.backtest import load_store_prices
+from app.services.tick_store import TickStore, to_microseconds
+from app.services.tick_writer import TickWriter
+
+START = datetime(2024, 1, 1)
+
+
+def random_ticks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    times = to_microseconds(START) + np.sort(rng.integers(0, 3600 * 1_000_000, count))
+    return times, 100 + rng.normal(0, 1, count).cumsum()
+
+
+def test_range_scans_are_memory_mapped_and_exact(tmp_path):
+    times, waps = random_ticks(5000)
+    store = TickStore(str(tmp_path), segment_ticks=700, index_stride=16)
+    for cut in np.array_split(np.arange(len(waps)), 9):
+        store.append("BTCUSDT", times[cut], waps[cut])
+    assert len(store.segments("BTCUSDT")) == 8
+
+    reader = TickStore(str(tmp_path), index_stride=16)
+    for start, end in [(None, None), (times[123], times[4321]), (times[700], times[1400] + 1),
+                       (times[-1] + 1, None), (None, times[0])]:
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times < end
+        parts = list(reader.scan("BTCUSDT", start, end))
+        assert all(isinstance(part, np.memmap) for part in parts)
+        ticks = reader.read("BTCUSDT", start, end)
+        np.testing.assert_array_equal(ticks["timestamp"], times[mask])
+        np.testing.assert_array_equal(ticks["wap"], waps[mask])
+    assert len(reader.read("BTCUSDT", limit=1234)) == 1234
+    assert len(reader.read("ETHUSDT")) == 0
+
+
+def test_reopening_cuts_partial_records_and_keeps_order(tmp_path):
+    times, waps = random_ticks(300, seed=1)
+    store = TickStore(str(tmp_path), segment_ticks=1000, index_stride=8)
+    store.append("BTCUSDT", times[:200], waps[:200])
+    store.close()
+    with open(store.segments("BTCUSDT")[-1][1], "ab") as f:
+        f.write(b"\x01" * 5)   # a write cut short by a crash
+
+    store = TickStore(str(tmp_path), segment_ticks=1000, index_stride=8)
+    store.append("BTCUSDT", [times[150]], [1.0])   # a late tick keeps the last timestamp
+    store.append("BTCUSDT", times[200:], waps[200:])
+    ticks = store.read("BTCUSDT")
+    np.testing.assert_array_equal(ticks["timestamp"], np.concatenate((times[:200], [times[199]], times[200:])))
+    np.testing.assert_array_equal(ticks["wap"], np.concatenate((waps[:200], [1.0], waps[200:])))
+    assert len(store.read("BTCUSDT", times[250])) == np.count_nonzero(times >= times[250])
+
+
+def test_tick_writer_can_write_to_the_store_only(tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    writer = TickWriter(batch_size=50, bind=engine, store=TickStore(str(tmp_path)), save_to_db=False)
+    writer.start()
+    for i in range(120):
+        writer.submit(100.0 + i, timestamp=START + timedelta(seconds=i), symbol=("BTCUSDT", "ETHUSDT")[i % 2])
+    writer.stop()
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count(Price.id))).scalar() == 0
+    prices = np.concatenate(list(load_store_prices(str(tmp_path), "ETHUSDT", START + timedelta(seconds=100))))
+    np.testing.assert_array_equal(prices, 100.0 + np.arange(101, 120, 2))
+
+
+def test_ticks_endpoint_rejects_symbols_outside_the_store(tmp_path, monkeypatch):
+    store = TickStore(str(tmp_path / "store"))
+    store.append("BTCUSDT", np.array([1, 2]), np.array([100.0, 101.0]))
+    store.close()
+    monkeypatch.setattr("app.api.endpoints.ticks.TICK_STORE_PATH", str(tmp_path / "store"))
+    client = TestClient(app)
+
+    assert client.get("/ticks/btcusdt").json()["wap"] == [100.0, 101.0]
+    for symbol in ("%2E%2E", "..%5Coutside", "BTC.USDT", "BTC_USDT"):
+        response = client.get(f"/ticks/{symbol}")
+        assert response.status_code == 400, symbol
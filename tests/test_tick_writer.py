@@ -0,0 +1,78 @@
+from datetime import datetime
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.models import Price
+from app.services.tick_writer import TickWriter
+
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def fetch_prices(engine):
+    with engine.connect() as conn:
+        return conn.execute(Price.__table__.select()).fetchall()
+
+
+def test_tick_writer_drains_on_stop(memory_engine):
+    writer = TickWriter(batch_size=7, flush_interval=60.0, bind=memory_engine)
+    writer.start()
+    for i in range(20):
+        assert writer.submit(100.0 + i)
+    writer.stop()
+
+    rows = fetch_prices(memory_engine)
+    assert len(rows) == 20, "Pending ticks were not flushed on shutdown"
+    assert sorted(row.wap for row in rows) == [100.0 + i for i in range(20)]
+
+
+def test_tick_writer_flushes_on_interval(memory_engine):
+    writer = TickWriter(batch_size=1000, flush_interval=0.05, bind=memory_engine)
+    writer.start()
+    try:
+        writer.submit(101.0, timestamp=datetime(2024, 1, 1))
+        for _ in range(100):
+            if fetch_prices(memory_engine):
+                break
+            time.sleep(0.02)
+        rows = fetch_prices(memory_engine)
+        assert len(rows) == 1, "Tick was not flushed after the flush interval"
+        assert rows[0].timestamp == datetime(2024, 1, 1)
+    finally:
+        writer.stop()
+
+
+def test_tick_writer_drops_when_full(memory_engine):
+    writer = TickWriter(max_queue_size=2, bind=memory_engine)  # not started, so nothing drains
+    assert writer.submit(1.0)
+    assert writer.submit(2.0)
+    assert not writer.submit(3.0), "Full queue should drop instead of blocking"
+
+
+def test_async_tick_writer_drains_on_stop():
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.services.tick_writer import AsyncTickWriter
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        writer = AsyncTickWriter(batch_size=4, flush_interval=60.0, bind=engine)
+        writer.start()
+        for i in range(10):
+            assert writer.submit(200.0 + i)
+        await writer.stop()
+        async with engine.connect() as conn:
+            rows = (await conn.execute(Price.__table__.select())).fetchall()
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(run())
+    assert sorted(row.wap for row in rows) == [200.0 + i for i in range(10)]
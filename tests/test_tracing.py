@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+from app.core.metrics import registry
+from app.core.tracing import MessageTrace, PipelineTracer
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "btcusdt_depth_snapshot.json")
+
+
+def depth(first_id, last_id, bids=()):
+    return json.dumps({"stream": "btcusdt@depth", "data": {
+        "e": "depthUpdate", "s": "BTCUSDT", "U": first_id, "u": last_id, "b": list(bids), "a": []}})
+
+
+def stage_count(stage, symbol="BTCUSDT"):
+    return registry.get_sample_value("ws_stage_latency_seconds_count", {"stage": stage, "symbol": symbol}) or 0.0
+
+
+def test_trace_laps_cover_the_whole_message():
+    trace = MessageTrace()
+    trace.add("queue", 5000)
+    trace.mark("decode")
+    trace.mark("apply")
+    assert [stage for stage, _ in trace.laps] == ["queue", "decode", "apply"]
+    assert trace.total_ns == 5000 + trace.last_ns - trace.started_ns
+
+
+def test_handler_records_stage_histograms_and_sampled_timelines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    config = Config(SNAPSHOT_FIXTURE=FIXTURE, RECEIVE_QUEUE_SIZE=0,
+                    TRACE_SAMPLE_RATE=0.5, TRACE_PATH=str(path))
+    expected = {"sync": 1, "apply": 3, "decode": 4, "wap": 4, "indicators": 4, "signal": 4}
+    before = {stage: stage_count(stage) for stage in expected}
+    handler = WebSocketHandler(config, tick_writer=MemorySink())
+    try:
+        for i in range(4):
+            handler.handle_message(depth(1001 + i, 1001 + i, bids=[["100.10", str(i + 1)]]), queue_wait=0.001)
+    finally:
+        handler.close()
+
+    for stage, count in before.items():
+        assert stage_count(stage) == count + expected[stage], stage
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    spans = lines[0]["spans"]
+    assert [span["stage"] for span in spans] == [
+        "queue", "decode", "apply", "wap", "indicators", "tick", "signal", "metrics"]
+    assert spans[0]["duration_us"] == 1000.0
+    assert spans[1]["start_us"] == 1000.0
+    assert lines[0]["symbol"] == "BTCUSDT"
+
+
+def test_slow_messages_log_their_breakdown(caplog):
+    tracer = PipelineTracer(slow_threshold=0.001)
+    fast, slow = MessageTrace(), MessageTrace()
+    fast.add("decode", 10_000)
+    slow.add("decode", 10_000)
+    slow.add("signal", 5_000_000)
+    slow.symbol = "ETHUSDT"
+    with caplog.at_level(logging.WARNING, logger="app.core.tracing"):
+        tracer.finish(fast)
+        tracer.finish(slow)
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 1
+    assert "ETHUSDT" in messages[0] and "signal=5000.0us" in messages[0]
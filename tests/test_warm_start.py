@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.models import Order, Price
+from app.services.warm_start import SymbolHistory, load_db_history, load_state_snapshot, save_state_snapshot
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.synthetic import DepthStream
+
+
+def test_db_history_takes_the_latest_fresh_rows_and_open_order():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Price.__table__.insert(), [
+            {"timestamp": now - timedelta(hours=2), "symbol": "BTCUSDT", "wap": 1.0},
+            *({"timestamp": now - timedelta(seconds=30 - i), "symbol": "BTCUSDT", "wap": 100.0 + i} for i in range(30)),
+            {"timestamp": now, "symbol": "ETHUSDT", "wap": 5.0},
+        ])
+        conn.execute(Order.__table__.insert(), [
+            {"symbol": "BTCUSDT", "status": "closed"}, {"symbol": "BTCUSDT", "status": "open"}])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    histories = load_db_history(["BTCUSDT", "ETHUSDT", "SOLUSDT"], limit=10, max_age=600,
+                                session_factory=sessionmaker(bind=engine))
+    assert len(statements) == 2, "One price query and one order query for all symbols"
+    assert histories["BTCUSDT"].prices.tolist() == [120.0 + i for i in range(10)]
+    assert histories["BTCUSDT"].open_order_id == 2
+    assert histories["ETHUSDT"].prices.tolist() == [5.0] and histories["ETHUSDT"].open_order_id is None
+    assert len(histories["SOLUSDT"].prices) == 0
+    everything = load_db_history(["BTCUSDT"], limit=100, session_factory=sessionmaker(bind=engine))
+    assert everything["BTCUSDT"].prices[0] == 1.0
+
+
+def test_restart_resumes_indicators_from_the_state_snapshot(tmp_path):
+    stream = DepthStream(levels=10, seed=7)
+    config = Config(SHORT_WINDOW=5, LONG_WINDOW=20, PRICE_HISTORY_MAX_LEN=21, INDICATORS=("ema:10", "vwap:10"),
+                    SNAPSHOT_FIXTURE=stream.write_snapshot(str(tmp_path)), RECEIVE_QUEUE_SIZE=0,
+                    STATE_SNAPSHOT_PATH=str(tmp_path / "{symbols}.npz"))
+    first = WebSocketHandler(config, tick_writer=MemorySink())
+    for message in stream.messages(60):
+        first.handle_message(message)
+    first.symbols["BTCUSDT"].order_state.current_order_id = 42
+    first.close()
+
+    second = WebSocketHandler(config, tick_writer=MemorySink())
+    try:
+        second.warm_start()
+        before, after = first.symbols["BTCUSDT"], second.symbols["BTCUSDT"]
+        np.testing.assert_array_equal(after.price_manager.price_history, before.price_manager.price_history)
+        for feature in ("sma:5", "sma:20", "vwap:10"):
+            assert after.price_manager.features.get(feature) == pytest.approx(
+                before.price_manager.features.get(feature), rel=1e-12)
+        assert after.order_state.current_order_id == 42
+    finally:
+        second.close()
+
+
+def test_stale_or_corrupt_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / "state.npz")
+    assert load_state_snapshot(path) is None
+    save_state_snapshot(path, {"BTCUSDT": SymbolHistory(np.array([1.0, 2.0]), None)})
+    assert load_state_snapshot(path)["BTCUSDT"].prices.tolist() == [1.0, 2.0]
+    assert load_state_snapshot(path)["BTCUSDT"].volumes is None
+    assert load_state_snapshot(path, max_age=1e-9) is None
+    with open(path, "wb") as f:
+        f.write(b"PK\x03\x04 truncated")
+    assert load_state_snapshot(path) is None
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from app.core.metrics import registry
+from app.core.warmup import KERNELS, warmup_kernels
+from app.services import indicator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_warmup_times_online_kernels_and_exports_gauges():
+    timings = warmup_kernels()
+    assert set(timings) == {name for name, _, online in KERNELS if online}
+    for name, seconds in timings.items():
+        assert registry.get_sample_value("startup_kernel_warmup_seconds", {"kernel": name}) == seconds
+    assert registry.get_sample_value("startup_import_seconds") > 0
+    assert registry.get_sample_value("startup_kernel_signatures", {"source": "cache"}) is not None
+
+
+@pytest.mark.parametrize("levels", [None, 1, 3, 10])
+def test_numpy_fallbacks_match_kernels(levels):
+    rng = np.random.default_rng(levels or 0)
+    bids, asks = rng.uniform(1, 100, (5, 2)), rng.uniform(1, 100, (4, 2))
+    assert indicator._wap_numpy(bids, asks, levels) == pytest.approx(indicator.calculate_wap(bids, asks, levels))
+    assert indicator._depth_volume_numpy(bids, asks, levels) == pytest.approx(
+        indicator.calculate_depth_volume(bids, asks, levels))
+    prices = rng.uniform(1, 100, 12)
+    np.testing.assert_allclose(indicator._last_two_sma_numpy(prices, levels or 12),
+                               indicator.calculate_last_two_sma(prices, levels or 12))
+
+
+def test_pipeline_runs_without_numba(tmp_path):
+    script = f"""
+import sys
+sys.modules["numba"] = None
+from app.core.jit import NUMBA_AVAILABLE
+from app.core.warmup import warmup_kernels
+from app.websocket.config import Config
+from app.websocket.replay import MemorySink
+from app.websocket.websocket_handler import WebSocketHandler
+from benchmarks.synthetic import DepthStream
+
+assert not NUMBA_AVAILABLE
+warmup_kernels(include_offline=True)
+stream = DepthStream(levels=10, seed=3)
+handler = WebSocketHandler(Config(SNAPSHOT_FIXTURE=stream.write_snapshot({str(tmp_path)!r}), RECEIVE_QUEUE_SIZE=0),
+                           tick_writer=MemorySink())
+try:
+    assert handler.decoder is None
+    for message in stream.messages(50):
+        handler._process_message(message)
+    assert handler.symbols["BTCUSDT"].book_sync.synced
+    assert len(handler.tick_writer.ticks) == 50
+finally:
+    handler.close()
+"""
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
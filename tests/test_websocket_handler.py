@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from app.websocket.config import Config
+from app.websocket.websocket_handler import WebSocketHandler
+from app.services.tick_writer import TickWriter
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "btcusdt_depth_snapshot.json")
+
+
+class RecordingTickWriter(TickWriter):
+    """Keeps submitted ticks in memory instead of starting a writer thread."""
+    def __init__(self):
+        super().__init__()
+        self.ticks = []
+
+    def start(self):
+        pass
+
+    def submit(self, wap_price, timestamp=None, symbol=None):
+        self.ticks.append((symbol, wap_price))
+        return True
+
+
+@pytest.fixture
+def handler():
+    config = Config(SYMBOLS=("btcusdt", "ethusdt"), SNAPSHOT_FIXTURE=FIXTURE)
+    handler = WebSocketHandler(config, tick_writer=RecordingTickWriter())
+    yield handler
+    handler.close()
+
+
+def combined(symbol, first_id, last_id, bids=(), asks=()):
+    return json.dumps({
+        "stream": f"{symbol.lower()}@depth",
+        "data": {"e": "depthUpdate", "s": symbol, "U": first_id, "u": last_id, "b": list(bids), "a": list(asks)}
+    })
+
+
+def test_combined_stream_url():
+    config = Config(SYMBOLS=("btcusdt", "ethusdt"))
+    assert config.SYMBOLS == ("BTCUSDT", "ETHUSDT")
+    assert config.WS_URL == "wss://stream.binance.com:9443/stream?streams=btcusdt@depth/ethusdt@depth"
+
+
+def test_messages_are_routed_per_symbol(handler):
+    handler._process_message(combined("BTCUSDT", 1001, 1002, bids=[["100.25", "1.0"]]))
+    handler._process_message(combined("ETHUSDT", 1001, 1002, asks=[["100.25", "3.0"]]))
+
+    btc, eth = handler.symbols["BTCUSDT"], handler.symbols["ETHUSDT"]
+    assert btc.order_book.bids[0, 0] == 100.25
+    assert eth.order_book.asks[0, 0] == 100.25
+    assert eth.order_book.bids[0, 0] == 100.0
+    assert [symbol for symbol, _ in handler.tick_writer.ticks] == ["BTCUSDT", "ETHUSDT"]
+
+
+def test_raw_stream_payload_and_unknown_symbol(handler):
+    raw = json.dumps({"e": "depthUpdate", "s": "BTCUSDT", "U": 1001, "u": 1002, "b": [], "a": []})
+    handler._process_message(raw)
+    handler._process_message(combined("XRPUSDT", 1001, 1002))
+    assert [symbol for symbol, _ in handler.tick_writer.ticks] == ["BTCUSDT"]
+
+
+def test_on_message_hands_off_to_processing_worker(handler):
+    handler.on_message(None, combined("BTCUSDT", 1001, 1002, bids=[["100.25", "1.0"]]))
+    handler.on_message(None, combined("BTCUSDT", 1003, 1004, bids=[["100.30", "1.0"]]))
+    handler.close()
+    assert len(handler.tick_writer.ticks) == 2
+    assert handler.symbols["BTCUSDT"].order_book.bids[0, 0] == 100.30